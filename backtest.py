@@ -0,0 +1,324 @@
+# backtest.py — replay the live entry/exit rules over candle history (no API calls unless fetching)
+#
+# Indicators are computed once for the whole history with the array kernels,
+# every entry filter that does not depend on trading state is evaluated for
+# all bars at once, and only the bars that pass are walked in order to apply
+# the stateful rules (open position, cooldown, last direction).  Each trade's
+# exit is found with a vectorised scan of the bars after entry.
+#
+# Decisions are taken at bar close with the same inputs the loop uses: the
+# close as price, RSI of the previous bar, ATR/ADX/EMA200/Supertrend/SMAs of
+# the current bar.  The live loop also polls inside a forming candle, so live
+# entries can come earlier than the bar-close entries simulated here.
+import argparse
+import math
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+import indicator_arrays as ia
+from kline_store import COLUMNS, interval_to_ms, parse_kline_rows
+from strategy_upgrade import BUY, SELL, Guard, Params, StrategyUpgrade
+from timeframes import trend_series
+
+INTRABAR_POLICIES = ("sl_first", "tp_first", "open")
+
+
+@dataclass
+class BacktestConfig:
+    """Execution rules of main.py (constants of the same names there)."""
+    tp_atr: float = 1.2
+    sl_atr: float = 0.8
+    min_atr: float = 0.001             # MIN_ATR
+    min_tp_percent: float = 0.75       # MIN_TP_PERCENT
+    min_range_pct: float = 1.5         # entry needs price_range > this
+    spike_atr: float = 1.8             # skip bars moving more than this many ATRs
+    adx_floor: float = 20.0            # place_order refuses below this ADX
+    cooldown_seconds: int = 600        # COOLDOWN_PERIOD
+    tolerance: float = 0.0005          # TOLERANCE on TP/SL checks
+    leverage: float = 10               # LEVERAGE
+    trade_portion: float = 0.60        # TRADE_PORTION
+    initial_balance: float = 100.0
+    fee_rate: float = 0.0              # per side, fraction of notional
+    intrabar: str = "sl_first"         # bar touching both TP and SL: sl_first | tp_first | open (nearest to open wins)
+    warmup: int = 200                  # first bar evaluated (KLINE_WINDOW of history)
+
+
+# ---------- data ----------
+def candles_from_rows(rows) -> Dict[str, np.ndarray]:
+    """(timestamp, open, high, low, close, volume) rows -> dict of float arrays."""
+    data = np.asarray(rows, dtype=float).reshape(-1, len(COLUMNS))
+    return {name: data[:, i].copy() for i, name in enumerate(COLUMNS)}
+
+
+def load_csv(path: str) -> Dict[str, np.ndarray]:
+    """CSV with timestamp (or time/open_time, s or ms), open, high, low, close[, volume] columns."""
+    import pandas as pd
+    df = pd.read_csv(path)
+    df.columns = [c.strip().lower() for c in df.columns]
+    ts_col = next(c for c in ("timestamp", "time", "open_time") if c in df.columns)
+    ts = pd.to_numeric(df[ts_col], errors="coerce")
+    if ts.isna().any():
+        ts = pd.Series(pd.to_datetime(df[ts_col], utc=True).astype("int64") // 1_000_000)
+    ts = ts.to_numpy(dtype=float)
+    if len(ts) and ts.max() < 1e11:
+        ts = ts * 1000
+    candles = {"timestamp": ts}
+    for name in COLUMNS[1:]:
+        candles[name] = df[name].to_numpy(dtype=float) if name in df.columns else np.zeros(len(df))
+    order = np.argsort(candles["timestamp"], kind="stable")
+    return {k: v[order] for k, v in candles.items()}
+
+
+def fetch_history(client, symbol: str, interval: str, start_ms: int, end_ms: Optional[int] = None,
+                  page_limit: int = 1000) -> Dict[str, np.ndarray]:
+    """Page klines forward from `start_ms` through an ExchangeClient (public endpoint)."""
+    end_ms = int(end_ms if end_ms is not None else time.time() * 1000)
+    step = interval_to_ms(interval)
+    rows: Dict[float, tuple] = {}
+    cursor = int(start_ms)
+    while cursor < end_ms:
+        response = client.request("GET", "/openApi/swap/v2/quote/klines", signed=False,
+                                  params={"symbol": symbol, "interval": interval, "limit": page_limit,
+                                          "startTime": cursor, "endTime": end_ms})
+        page = parse_kline_rows(response.get("data", [])) if response else []
+        if not page:
+            break
+        rows.update((r[0], r) for r in page)
+        cursor = int(page[-1][0]) + step
+    return candles_from_rows([rows[k] for k in sorted(rows)])
+
+
+def synthetic_candles(n: int, interval: str = "15m", seed: int = 0, start_price: float = 0.2,
+                      volatility: float = 0.004, start_ms: int = 1_700_000_000_000) -> Dict[str, np.ndarray]:
+    """Random-walk OHLCV candles with trending stretches, for tests and benchmarks."""
+    rng = np.random.default_rng(seed)
+    drift = np.repeat(rng.normal(0, volatility / 4, n // 96 + 1), 96)[:n]
+    close = start_price * np.exp(np.cumsum(rng.normal(drift, volatility)))
+    open_ = np.concatenate(([start_price], close[:-1]))
+    wick = rng.uniform(0, volatility, (2, n))
+    return {"timestamp": start_ms + np.arange(n, dtype=float) * interval_to_ms(interval),
+            "open": open_,
+            "high": np.maximum(open_, close) * (1 + wick[0]),
+            "low": np.minimum(open_, close) * (1 - wick[1]),
+            "close": close,
+            "volume": rng.uniform(1e5, 1e6, n)}
+
+
+# ---------- features ----------
+def compute_features(candles: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Every per-bar input of the entry decision, one array per field."""
+    high, low, close = candles["high"], candles["low"], candles["close"]
+    prev = np.concatenate(([np.nan], close[:-1]))
+    prev3 = np.concatenate(([np.nan] * 3, close[:-3]))
+    rsi = ia.rsi(close, 14)
+    _, direction = ia.supertrend(high, low, close, 10, 3)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct3 = np.where(np.isnan(prev3), 0.0, (close - prev3) / prev3 * 100)
+    return {
+        "price": close,
+        "prev": prev,
+        "pct3": pct3,
+        "atr": ia.wilder_atr(high, low, close, 14),
+        "ema200": ia.ema(close, 200),
+        "rsi": np.concatenate(([np.nan], rsi[:-1])),     # the loop reads the last closed bar's RSI
+        "adx": ia.adx(high, low, close, 14),
+        "supertrend": np.where(direction > 0, 1, -1),
+        "sma3": ia.sma(close, 3), "sma5": ia.sma(close, 5), "sma7": ia.sma(close, 7),
+        "range": ia.price_range_percent(close, 20),
+    }
+
+
+def entry_signals(f: Dict[str, np.ndarray], p: Params, g: Guard, cfg: BacktestConfig) -> Dict[str, np.ndarray]:
+    """StrategyUpgrade.decide_many/pre_trade_many plus the loop's filters, for all bars.
+
+    Returns boolean "buy"/"sell" arrays; the same-direction block, cooldown
+    and open-position checks depend on trading state and are left to the walk.
+    """
+    strategy = StrategyUpgrade(p, g)
+    price, atr, adx = f["price"], f["atr"], f["adx"]
+    move = np.abs(price - f["prev"])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cols = dict(f, spike=move > 1.8 * atr)
+        dec = strategy.decide_many(cols)
+        buy_ok, _ = strategy.pre_trade_many(cols, BUY)
+        sell_ok, _ = strategy.pre_trade_many(cols, SELL)
+
+        atr_val = np.maximum(atr, cfg.min_atr)
+        tp_buy = np.round(price + atr_val * cfg.tp_atr, 5)
+        tp_sell = np.round(price - atr_val * cfg.tp_atr, 5)
+        common = ((f["range"] > cfg.min_range_pct) & (dec["est_tp_percent"] >= p.min_tp_percent)
+                  & ~(move > atr * cfg.spike_atr) & (adx >= cfg.adx_floor))
+        buy = common & (dec["side"] == BUY) & buy_ok & ((tp_buy - price) / price * 100 >= cfg.min_tp_percent)
+        sell = common & (dec["side"] == SELL) & sell_ok & ((price - tp_sell) / price * 100 >= cfg.min_tp_percent)
+    return {"buy": buy, "sell": sell}
+
+
+def calculate_tp_sl(entry_price: float, atr_value: float, direction: str, cfg: BacktestConfig):
+    """main.calculate_tp_sl with the configured ATR multiples."""
+    if direction == "BUY":
+        tp = entry_price + atr_value * cfg.tp_atr
+        sl = entry_price - atr_value * cfg.sl_atr
+    else:
+        tp = entry_price - atr_value * cfg.tp_atr
+        sl = entry_price + atr_value * cfg.sl_atr
+    return round(tp, 5), round(sl, 5)
+
+
+# ---------- simulation ----------
+def _first_hit(candles, start: int, side: str, tp: float, sl: float, tol: float) -> int:
+    """Index of the first bar at or after `start` touching TP or SL, or -1."""
+    high, low = candles["high"], candles["low"]
+    n = len(high); chunk = 256
+    while start < n:
+        stop = min(n, start + chunk)
+        if side == "BUY":
+            hit = (high[start:stop] >= tp - tol) | (low[start:stop] <= sl + tol)
+        else:
+            hit = (low[start:stop] <= tp + tol) | (high[start:stop] >= sl - tol)
+        if hit.any():
+            return start + int(hit.argmax())
+        start = stop; chunk *= 4
+    return -1
+
+
+def _resolve_exit(candles, j: int, side: str, tp: float, sl: float, cfg: BacktestConfig):
+    """(result, price, ambiguous) for bar j, which touches TP, SL or both."""
+    o, h, l = candles["open"][j], candles["high"][j], candles["low"][j]
+    tol = cfg.tolerance
+    if side == "BUY":
+        tp_hit, sl_hit = h >= tp - tol, l <= sl + tol
+        if o >= tp - tol: return "TP", o, False           # gapped through TP
+        if o <= sl + tol: return "SL", o, False
+    else:
+        tp_hit, sl_hit = l <= tp + tol, h >= sl - tol
+        if o <= tp + tol: return "TP", o, False
+        if o >= sl - tol: return "SL", o, False
+    if tp_hit and sl_hit:
+        if cfg.intrabar == "tp_first":
+            first = "TP"
+        elif cfg.intrabar == "open":
+            first = "TP" if abs(o - tp) < abs(o - sl) else "SL"
+        else:
+            first = "SL"
+        return first, tp if first == "TP" else sl, True
+    return ("TP", tp, False) if tp_hit else ("SL", sl, False)
+
+
+def run_backtest(candles: Dict[str, np.ndarray], params: Params = Params(), guard: Guard = Guard(),
+                 config: Optional[BacktestConfig] = None, interval: str = "15m",
+                 features: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, Any]:
+    """Simulate the bot over `candles`; returns {"trades": [...], "stats": {...}}."""
+    cfg = config or BacktestConfig()
+    if cfg.intrabar not in INTRABAR_POLICIES:
+        raise ValueError(f"intrabar must be one of {INTRABAR_POLICIES}")
+    f = features if features is not None else compute_features(candles)
+    if params.require_h1_alignment and "h1_trend" not in f:
+        f = dict(f, h1_trend=trend_series(candles, interval, "1h"))   # a Python walk: only when the filter is on
+    sig = entry_signals(f, params, guard, cfg)
+    n = len(candles["close"])
+    step = interval_to_ms(interval)
+    close_ms = candles["timestamp"] + step
+    cooldown_ms = cfg.cooldown_seconds * 1000
+
+    candidates = np.flatnonzero(sig["buy"] | sig["sell"])
+    candidates = candidates[candidates >= max(cfg.warmup - 1, 3)]
+    trades: List[Dict[str, Any]] = []
+    balance = cfg.initial_balance
+    last_trade_ms = -math.inf
+    last_direction = None
+    k = 0
+    while k < len(candidates):
+        i = int(candidates[k]); k += 1
+        now = close_ms[i]
+        side = "BUY" if sig["buy"][i] else "SELL"
+        # the loop never repeats the last direction, which also covers decide()'s SameDir block
+        if now - last_trade_ms < cooldown_ms or last_direction == side:
+            continue
+
+        entry = float(candles["close"][i])
+        atr_val = max(float(f["atr"][i]), cfg.min_atr)
+        tp, sl = calculate_tp_sl(entry, atr_val, side, cfg)
+        quantity = round(balance * cfg.trade_portion * cfg.leverage / entry, 2)
+        last_trade_ms = now
+
+        j = _first_hit(candles, i + 1, side, tp, sl, cfg.tolerance)
+        if j < 0:
+            j = n - 1; result, exit_price, ambiguous = "END", float(candles["close"][j]), False
+        else:
+            result, exit_price, ambiguous = _resolve_exit(candles, j, side, tp, sl, cfg)
+            exit_price = float(exit_price)
+
+        sign = 1 if side == "BUY" else -1
+        fees = (entry + exit_price) * quantity * cfg.fee_rate
+        profit = sign * (exit_price - entry) * quantity - fees
+        balance += profit
+        trades.append({"side": side, "entry_index": i, "exit_index": j,
+                       "entry_time": int(now), "exit_time": int(close_ms[j]),
+                       "entry_price": entry, "exit_price": exit_price, "tp": tp, "sl": sl,
+                       "atr": atr_val, "quantity": quantity, "result": result,
+                       "profit": profit, "profit_pct": sign * (exit_price - entry) / entry * 100,
+                       "bars_held": j - i, "ambiguous": ambiguous, "balance": balance})
+
+        last_direction = side
+        last_trade_ms = close_ms[j]
+        k = int(np.searchsorted(candidates, j))           # the exit bar's close is the next decision point
+    return {"trades": trades, "stats": summarize(trades, cfg.initial_balance), "config": asdict(cfg)}
+
+
+def summarize(trades: List[Dict[str, Any]], initial_balance: float) -> Dict[str, Any]:
+    if not trades:
+        return {"trades": 0, "wins": 0, "losses": 0, "win_rate": 0.0, "net_profit": 0.0,
+                "return_pct": 0.0, "profit_factor": 0.0, "max_drawdown_pct": 0.0,
+                "avg_bars_held": 0.0, "ambiguous_bars": 0, "final_balance": initial_balance}
+    profit = np.array([t["profit"] for t in trades])
+    equity = np.concatenate(([initial_balance], [t["balance"] for t in trades]))
+    peak = np.maximum.accumulate(equity)
+    gross_win = profit[profit > 0].sum(); gross_loss = -profit[profit < 0].sum()
+    wins = int((profit > 0).sum())
+    return {
+        "trades": len(trades),
+        "wins": wins,
+        "losses": len(trades) - wins,
+        "tp_exits": sum(t["result"] == "TP" for t in trades),
+        "sl_exits": sum(t["result"] == "SL" for t in trades),
+        "win_rate": wins / len(trades) * 100,
+        "net_profit": float(profit.sum()),
+        "return_pct": (equity[-1] - initial_balance) / initial_balance * 100,
+        "profit_factor": float(gross_win / gross_loss) if gross_loss > 0 else math.inf,
+        "max_drawdown_pct": float(((peak - equity) / peak).max() * 100),
+        "avg_bars_held": float(np.mean([t["bars_held"] for t in trades])),
+        "ambiguous_bars": sum(t["ambiguous"] for t in trades),
+        "final_balance": float(equity[-1]),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Replay the bot's rules over candle history")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("csv", nargs="?", help="candles CSV (timestamp, open, high, low, close[, volume])")
+    src.add_argument("--synthetic", type=int, metavar="BARS", help="use a random walk of BARS candles")
+    ap.add_argument("--interval", default="15m")
+    ap.add_argument("--intrabar", choices=INTRABAR_POLICIES, default="sl_first")
+    ap.add_argument("--fee", type=float, default=0.0, help="fee per side as a fraction of notional")
+    ap.add_argument("--trades", help="write the trade list to this CSV")
+    args = ap.parse_args(argv)
+
+    candles = load_csv(args.csv) if args.csv else synthetic_candles(args.synthetic, args.interval)
+    started = time.perf_counter()
+    result = run_backtest(candles, config=BacktestConfig(intrabar=args.intrabar, fee_rate=args.fee),
+                          interval=args.interval)
+    elapsed = time.perf_counter() - started
+    print(f"📊 {len(candles['close'])} candles replayed in {elapsed:.3f}s")
+    for key, value in result["stats"].items():
+        print(f"  - {key}: {value:.4f}" if isinstance(value, float) else f"  - {key}: {value}")
+    if args.trades:
+        import pandas as pd
+        pd.DataFrame(result["trades"]).to_csv(args.trades, index=False)
+        print(f"💾 Trades written to {args.trades}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# bench.py — reproducible timings of the indicator and decision functions (no API calls)
+#
+# Every case runs on the same seeded random-walk candles (backtest.synthetic_candles)
+# at 200, 10k and 1M rows.  The regime script runs its checks at import time
+# (and references globals it never defines), so its functions are lifted out of
+# the source with `ast` and executed in a namespace holding only what they use.
+# main.py imports cleanly now, but its functions are lifted the same way so the
+# bench times exactly those functions without building the client, Flask app
+# and the rest of main's module state.
+# Results are written as JSON; pass a previous run with --baseline to get
+# per-case ratios and a non-zero exit status when something got slower.
+import argparse
+import ast
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from ta.momentum import RSIIndicator
+
+from backtest import compute_features, synthetic_candles
+from indicator_arrays import supertrend as supertrend_arrays
+from strategy_upgrade import StrategyUpgrade
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MAIN_PATH = os.path.join(HERE, "main.py")
+REGIME_PATH = os.path.join(HERE, "deepseek_python_20250917_9d645d 8080.py")
+
+DEFAULT_SIZES = (200, 10_000, 1_000_000)
+DECISION_CALLS = 10_000          # decide/pre_trade are per-bar scalars: time this many calls per size
+MAX_CASE_SECONDS = 3.0           # stop repeating a case once it has used this much time
+
+MAIN_FUNCTIONS = ("calculate_adx", "calculate_sma", "calculate_ema", "price_range_percent",
+                  "calculate_supertrend")
+
+
+# ---------- loading ----------
+def _is_literal(node: ast.AST) -> bool:
+    try:
+        ast.literal_eval(node)
+        return True
+    except ValueError:
+        return False
+
+
+def load_functions(path: str, namespace: Dict[str, Any], names: Optional[Tuple[str, ...]] = None,
+                   constants: bool = False) -> Dict[str, Any]:
+    """Execute selected top-level defs (and optionally literal assignments) of `path` in `namespace`."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    body = []
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and (names is None or node.name in names):
+            body.append(node)
+        elif constants and isinstance(node, ast.Assign) and _is_literal(node.value):
+            body.append(node)
+    exec(compile(ast.Module(body=body, type_ignores=[]), path, "exec"), namespace)
+    missing = set(names or ()) - set(namespace)
+    if missing:
+        raise RuntimeError(f"{os.path.basename(path)} no longer defines {sorted(missing)}")
+    return namespace
+
+
+def main_namespace() -> Dict[str, Any]:
+    return load_functions(MAIN_PATH, {"pd": pd, "np": np, "supertrend_arrays": supertrend_arrays},
+                          MAIN_FUNCTIONS)
+
+
+def regime_namespace() -> Dict[str, Any]:
+    # position_open/entry_price/current_atr are main.py globals the regime script reads
+    ns = {"pd": pd, "np": np, "time": time, "RSIIndicator": RSIIndicator,
+          "position_open": False, "entry_price": 0.0, "current_atr": 0.0}
+    return load_functions(REGIME_PATH, ns, constants=True)
+
+
+# ---------- timing ----------
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    fn()                                         # warm caches and lazy imports
+    times: List[float] = []
+    spent = 0.0
+    while len(times) < repeat and (spent < MAX_CASE_SECONDS or len(times) < 1):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        times.append(elapsed)
+        spent += elapsed
+    return {"repeats": len(times), "median_s": statistics.median(times), "min_s": min(times),
+            "max_s": max(times)}
+
+
+def decision_states(candles: Dict[str, np.ndarray], calls: int) -> List[Dict[str, Any]]:
+    """The dicts main.py passes to decide/pre_trade, built from the last `calls` bars."""
+    f = compute_features(candles)
+    n = len(candles["close"])
+    states = []
+    for i in range(max(0, n - calls), n):
+        states.append({"price": float(f["price"][i]), "prev": float(f["prev"][i]),
+                       "pct3": float(f["pct3"][i]), "atr": float(f["atr"][i]),
+                       "ema200": float(f["ema200"][i]), "rsi": float(f["rsi"][i]),
+                       "adx": float(f["adx"][i]), "supertrend": int(f["supertrend"][i]),
+                       "sma3": float(f["sma3"][i]), "sma5": float(f["sma5"][i]),
+                       "sma7": float(f["sma7"][i]), "range": float(f["range"][i]),
+                       "last_direction": None, "mins_since_last_trade": 9_999, "spike": False})
+    return states
+
+
+def build_cases(rows: int, seed: int) -> List[Tuple[str, Callable[[], Any], int]]:
+    """(name, zero-argument callable, calls per run) for one candle size."""
+    candles = synthetic_candles(rows, seed=seed)
+    df = pd.DataFrame({k: v for k, v in candles.items()})
+    close = df["close"]
+    m = main_namespace()
+    r = regime_namespace()
+
+    atr = float(np.nanmean(candles["high"][-14:] - candles["low"][-14:]))
+    price = float(close.iloc[-1])
+    rsi = float(RSIIndicator(close=close, window=14).rsi().iloc[-1]) if rows > 14 else 50.0
+    adx_series = m["calculate_adx"](df)
+    adx = float(adx_series.iloc[-1]) if len(adx_series) else 20.0
+    ema_50 = float(close.ewm(span=50, adjust=False).mean().iloc[-1])
+    ema_200 = float(close.ewm(span=200, adjust=False).mean().iloc[-1])
+    st_line, _ = m["calculate_supertrend"](df)
+    st_value = float(st_line.iloc[-1]) if len(st_line) else price
+    r["current_atr"] = atr
+
+    strategy = StrategyUpgrade()
+    features = compute_features(candles)
+    features["spike"] = np.abs(features["price"] - features["prev"]) > 1.8 * features["atr"]
+    states = decision_states(candles, DECISION_CALLS)
+    decisions = [strategy.decide(s) for s in states]
+
+    def run_decide():
+        for s in states:
+            strategy.decide(s)
+
+    def run_pre_trade():
+        for s, d in zip(states, decisions):
+            strategy.pre_trade(s, d["side"])
+
+    return [
+        ("calculate_adx", lambda: m["calculate_adx"](df), 1),
+        ("calculate_supertrend", lambda: m["calculate_supertrend"](df), 1),
+        ("calculate_ema", lambda: m["calculate_ema"](close, 200), 1),
+        ("calculate_sma", lambda: m["calculate_sma"](close, 20), 1),
+        ("price_range_percent", lambda: m["price_range_percent"](df), 1),
+        ("check_explosion_condition", lambda: r["check_explosion_condition"](df, atr), 1),
+        ("check_strategy_conditions",
+         lambda: r["check_strategy_conditions"](df, price, rsi, adx, ema_50, ema_200, st_value), 1),
+        ("StrategyUpgrade.decide", run_decide, len(states)),
+        ("StrategyUpgrade.pre_trade", run_pre_trade, len(states)),
+        ("StrategyUpgrade.decide_many", lambda: strategy.decide_many(features), rows),
+        ("StrategyUpgrade.pre_trade_many", lambda: strategy.pre_trade_many(features, 1), rows),
+    ]
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat: int = 7, seed: int = 0,
+                   only: Optional[List[str]] = None) -> Dict[str, Any]:
+    results = []
+    for rows in sizes:
+        for name, fn, calls in build_cases(rows, seed):
+            if only and name not in only:
+                continue
+            stats = measure(fn, repeat)
+            stats.update(name=name, rows=rows, calls=calls,
+                         per_call_us=stats["median_s"] / calls * 1e6)
+            results.append(stats)
+            print(f"{name:32s} rows={rows:>9,d}  median {stats['median_s'] * 1000:10.3f} ms"
+                  f"  ({stats['per_call_us']:.2f} µs/call, {stats['repeats']} runs)")
+    return {
+        "meta": {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+                 "machine": platform.machine(), "platform": platform.platform(), "seed": seed,
+                 "repeat": repeat, "created": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+
+
+# ---------- comparison ----------
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 1.2) -> List[Dict[str, Any]]:
+    """Median ratio current/baseline for every case present in both runs."""
+    before = {(r["name"], r["rows"]): r for r in baseline.get("results", [])}
+    rows = []
+    for r in current["results"]:
+        old = before.get((r["name"], r["rows"]))
+        if old is None or old["median_s"] <= 0:
+            continue
+        ratio = r["median_s"] / old["median_s"]
+        status = "slower" if ratio > threshold else ("faster" if ratio < 1 / threshold else "same")
+        rows.append({"name": r["name"], "rows": r["rows"], "baseline_s": old["median_s"],
+                     "current_s": r["median_s"], "ratio": ratio, "status": status})
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]], threshold: float):
+    print(f"\nvs baseline (threshold x{threshold}):")
+    for c in rows:
+        mark = {"slower": "❌", "faster": "✅"}.get(c["status"], "  ")
+        print(f"{mark} {c['name']:32s} rows={c['rows']:>9,d}  {c['baseline_s'] * 1000:10.3f} ms"
+              f" -> {c['current_s'] * 1000:10.3f} ms  x{c['ratio']:.2f}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark indicators and decision functions")
+    ap.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                    help="comma-separated candle counts")
+    ap.add_argument("--repeat", type=int, default=7)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--only", help="comma-separated case names")
+    ap.add_argument("--out", help="write results JSON here")
+    ap.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    ap.add_argument("--threshold", type=float, default=1.2,
+                    help="median ratio above which a case counts as a regression")
+    args = ap.parse_args(argv)
+
+    sizes = [int(float(s)) for s in args.sizes.split(",") if s.strip()]
+    only = [s.strip() for s in args.only.split(",")] if args.only else None
+    report = run_benchmarks(sizes, args.repeat, args.seed, only)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["comparison"] = compare(report, baseline, args.threshold)
+        report["meta"]["baseline"] = args.baseline
+        print_comparison(report["comparison"], args.threshold)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.out}")
+
+    regressions = [c for c in report.get("comparison", []) if c["status"] == "slower"]
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
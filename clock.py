@@ -0,0 +1,38 @@
+# clock.py — wall-clock and virtual time behind one interface (no API calls)
+#
+# The trading loop reads the time and sleeps only through a clock object, so
+# the same code can run in real time or in virtual time.  A VirtualClock never
+# blocks: sleep() just moves its time forward, which lets paper_trade.py
+# replay weeks of 15m trading in seconds with every cooldown and poll
+# interval honoured in simulated seconds.
+import threading
+import time
+
+
+class SystemClock:
+    """The real clock: time.time() and a blocking sleep."""
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class VirtualClock:
+    """Time that only moves when the program sleeps or calls advance()."""
+
+    def __init__(self, start: float = 0.0):
+        self._now = float(start)
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float):
+        self.advance(seconds)
+
+    def advance(self, seconds: float):
+        with self._lock:
+            self._now += max(0.0, float(seconds))
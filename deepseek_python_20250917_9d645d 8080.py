@@ -8,6 +8,7 @@ ATR_PCT_RANGE = (0.004, 0.05)
 EXPLOSION_ATR_MOVE = 2.2
 EXPLOSION_RANGE_MOVE = 2.5
 EXPLOSION_ATR_PCT_BOOST = 1.5
+EXPLOSION_BASELINE_BARS = 20
 ANTI_REENTRY_MIN_ATR = 0.25
 SPIKE_BLOCK_ATR = 1.8
 SL_MULT = 1.6
@@ -43,37 +44,29 @@ def calculate_bollinger_bands(df, period=20, std_dev=2):
     
     return upper_band, sma, lower_band
 
-def check_explosion_condition(df, current_atr):
-    """الكشف عن حالات الانفجار/الانهيار"""
+def explosion_baseline_sum(closes):
+    """مجموع 1/close لآخر 19 شمعة مغلقة — يُحسب مرة واحدة لكل شمعة"""
+    closes = np.asarray(closes, dtype=float)
+    if len(closes) < EXPLOSION_BASELINE_BARS:
+        return None
+    return float(np.sum(1.0 / closes[-EXPLOSION_BASELINE_BARS:-1]))
+
+def check_explosion_tick(price, prev_close, bar_high, bar_low, current_atr, baseline_sum):
+    """الكشف عن الانفجار/الانهيار على كل تيك بتكلفة ثابتة"""
     global explosion_detected, explosion_direction
     
-    if len(df) < 2:
-        return False, None
+    # ATR% للشمعة الحالية
+    current_atr_pct = current_atr / price
     
-    # حساب ATR% للشمعة الحالية
-    current_atr_pct = current_atr / df['close'].iloc[-1]
-    
-    # حساب متوسط ATR% لآخر 20 شمعة
-    if len(df) >= 20:
-        atr_values = []
-        for i in range(-20, 0):
-            if i + len(df) >= 0:
-                atr_val = AverageTrueRange(
-                    high=df['high'].iloc[i-14:i+1] if i-14 >= 0 else df['high'].iloc[:i+1],
-                    low=df['low'].iloc[i-14:i+1] if i-14 >= 0 else df['low'].iloc[:i+1],
-                    close=df['close'].iloc[i-14:i+1] if i-14 >= 0 else df['close'].iloc[:i+1],
-                    window=14
-                ).average_true_range().iloc[-1] if i+1 >= 14 else current_atr
-                atr_pct = atr_val / df['close'].iloc[i]
-                atr_values.append(atr_pct)
-        
-        avg_atr_pct = sum(atr_values) / len(atr_values) if atr_values else current_atr_pct
+    # متوسط ATR% لآخر 20 شمعة: كل شمعة مقاسة بـ ATR الحالي (سلوك النسخة السابقة)
+    if baseline_sum is not None:
+        avg_atr_pct = current_atr * (baseline_sum + 1.0 / price) / EXPLOSION_BASELINE_BARS
     else:
         avg_atr_pct = current_atr_pct
     
     # شروط الانفجار/الانهيار
-    price_move = abs(df['close'].iloc[-1] - df['close'].iloc[-2])
-    range_move = df['high'].iloc[-1] - df['low'].iloc[-1]
+    price_move = abs(price - prev_close)
+    range_move = bar_high - bar_low
     
     explosion_condition = (
         price_move >= EXPLOSION_ATR_MOVE * current_atr or
@@ -83,13 +76,25 @@ def check_explosion_condition(df, current_atr):
     
     if explosion_condition:
         explosion_detected = True
-        explosion_direction = "UP" if df['close'].iloc[-1] > df['close'].iloc[-2] else "DOWN"
+        explosion_direction = "UP" if price > prev_close else "DOWN"
         return True, explosion_direction
     
     explosion_detected = False
     explosion_direction = None
     return False, None
 
+def check_explosion_condition(df, current_atr):
+    """الكشف عن حالات الانفجار/الانهيار"""
+    if len(df) < 2:
+        return False, None
+    
+    closes = df['close'].to_numpy(dtype=float)
+    return check_explosion_tick(
+        closes[-1], closes[-2],
+        float(df['high'].iloc[-1]), float(df['low'].iloc[-1]),
+        current_atr, explosion_baseline_sum(closes)
+    )
+
 def check_strategy_conditions(df, current_price, rsi_value, adx_value, ema_50, ema_200, supertrend_trend):
     """فحص شروط الاستراتيجية الجديدة"""
     global last_loss_direction, loss_lock_count, explosion_detected, explosion_direction
@@ -0,0 +1,469 @@
+# exchange_client.py — one pooled, signed HTTP client for every BingX call
+#
+# All requests share a keep-alive `requests.Session`, so TCP+TLS setup is
+# paid once per pooled connection instead of once per call.  Every call gets
+# connect/read timeouts, idempotent calls are retried with jittered
+# exponential backoff, signing happens in exactly one place, and per-endpoint
+# latency is accounted for.  A RequestScheduler in front of the session hands
+# out request budget per endpoint class in strict priority order, so closing a
+# position never queues behind a burst of market-data calls.
+import hashlib
+import heapq
+import hmac
+import itertools
+import json
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+# (connect, read) seconds; the longest matching endpoint prefix wins
+DEFAULT_TIMEOUTS: Dict[str, Tuple[float, float]] = {
+    "": (3.05, 10.0),
+    "/openApi/swap/v2/quote/": (3.05, 5.0),
+    "/openApi/swap/v2/user/": (3.05, 8.0),
+    "/openApi/swap/v2/trade/": (3.05, 10.0),
+}
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Request priorities, most urgent first
+CLOSE, ENTRY, ACCOUNT, MARKET = 0, 1, 2, 3
+PRIORITY_NAMES = ("close", "entry", "account", "market")
+
+# Endpoint classes with their own budget: (requests per second, burst); the longest prefix wins
+DEFAULT_CLASS_LIMITS: Dict[str, Tuple[float, int]] = {
+    "": (5.0, 5),
+    "/openApi/swap/v2/quote/": (10.0, 10),
+    "/openApi/swap/v2/user/": (5.0, 5),
+    "/openApi/swap/v2/trade/": (5.0, 5),
+}
+# Global tokens a priority must leave untouched: market data can never drain the last ones a close needs
+DEFAULT_RESERVE = (0, 1, 2, 3)
+RATE_LIMIT_CODES = {100410}           # BingX "frequency limit" body code
+REMAINING_HEADERS = ("X-RateLimit-Remaining", "X-RateLimit-Requests-Remain")
+
+
+def default_priority(method: str, endpoint: str) -> int:
+    """Priority of a call nobody tagged: market data, account reads, or an entry order."""
+    if "/quote/" in endpoint:
+        return MARKET
+    if method == "GET" or "/user/" in endpoint:
+        return ACCOUNT
+    return ENTRY
+
+
+class RateLimiter:
+    """Token bucket shared by every caller of one client: `rate` requests/s, bursts up to `burst`."""
+
+    def __init__(self, rate: float = 10.0, burst: int = 10):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def feedback(self, endpoint: str, status: int, headers: Optional[Mapping[str, str]] = None, code: Any = None):
+        """Plain buckets ignore what the exchange says about its limits."""
+
+    def acquire(self, endpoint: str = "", priority: int = MARKET):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class BalanceCache:
+    """Last known available balance: refetched after `ttl` seconds or once invalidated.
+
+    Fills and closes call `invalidate`, optionally with a settle delay during
+    which the old value keeps being served (the exchange needs a moment to
+    book a close).  `refresh` always asks the exchange, for the moment right
+    before an order is sent.
+    """
+
+    def __init__(self, fetch: Callable[[], Optional[float]], ttl: float = 300.0,
+                 clock: Callable[[], float] = time.time):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.clock = clock
+        self.value: Optional[float] = None
+        self.fetched_at = 0.0
+        self.fetches = 0
+        self._stale = True
+        self._not_before = 0.0
+        self._generation = 0        # bumped by invalidate(); a fetch that overlaps one stays stale
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[float]:
+        """Cached balance, refetched only when expired or invalidated (and settled)."""
+        now = self.clock()
+        if (self._stale or now - self.fetched_at >= self.ttl) and now >= self._not_before:
+            self.refresh()
+        return self.value
+
+    def refresh(self) -> Optional[float]:
+        """Fetch now; returns the new balance, or None if the exchange did not answer.
+
+        If invalidate() ran while the request was in flight the answer may
+        predate the fill or close, so it is served but the cache stays stale.
+        """
+        with self._lock:
+            generation = self._generation
+        value = self.fetch()
+        with self._lock:
+            self.fetches += 1
+            if value is not None:
+                self.value = value
+                self.fetched_at = self.clock()
+                if self._generation == generation:
+                    self._stale = False
+        return value
+
+    def invalidate(self, settle: float = 0.0):
+        with self._lock:
+            self._generation += 1
+            self._stale = True
+            self._not_before = self.clock() + settle
+
+
+class _Bucket:
+    __slots__ = ("rate", "configured_rate", "burst", "tokens", "updated", "paused_until")
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = self.configured_rate = float(rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+        self.paused_until = 0.0
+
+    def refill(self, now: float):
+        start = max(self.updated, self.paused_until)     # nothing accrues while paused
+        if now > start:
+            self.tokens = min(self.burst, self.tokens + (now - start) * self.rate)
+        self.updated = max(self.updated, now)
+
+    def wait_for(self, need: float, now: float) -> float:
+        """Seconds until `need` tokens are available (0 when they are)."""
+        if now < self.paused_until:
+            return self.paused_until - now
+        return 0.0 if self.tokens >= need else (need - self.tokens) / self.rate
+
+
+class RequestScheduler:
+    """Priority-aware drop-in for RateLimiter: one global bucket plus one per endpoint class.
+
+    A request needs a token from its class bucket and from the global bucket,
+    where lower priorities must leave `reserve[priority]` tokens behind.
+    Waiters are served strictly by priority: while a more urgent request is
+    waiting for the global bucket or for the same class, a less urgent one
+    does not get a token even if one is free.  Rate-limit responses (HTTP
+    429, RATE_LIMIT_CODES, a low remaining-requests header) pause the class
+    and halve its rate; successful calls restore it step by step.
+
+    `clock` is the monotonic time source the buckets refill from; a waiting
+    request re-reads it at least every time its computed wait elapses.
+    """
+
+    def __init__(self, rate: float = 10.0, burst: int = 10,
+                 class_limits: Optional[Dict[str, Tuple[float, int]]] = None,
+                 reserve: Tuple[int, ...] = DEFAULT_RESERVE, min_rate: float = 0.5,
+                 clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        now = clock()
+        self.total = _Bucket(rate, burst, now)
+        limits = dict(class_limits or DEFAULT_CLASS_LIMITS)
+        limits.setdefault("", DEFAULT_CLASS_LIMITS[""])
+        self.classes = {prefix: _Bucket(r, b, now) for prefix, (r, b) in limits.items()}
+        self.reserve = reserve
+        self.min_rate = min_rate
+        self.granted = [0] * len(PRIORITY_NAMES)
+        self.waited = [0.0] * len(PRIORITY_NAMES)
+        self.throttled = 0
+        # optional observer: on_wait(priority_name, seconds) for every granted request
+        self.on_wait: Optional[Callable[[str, float], None]] = None
+        self._waiting: List[list] = []          # heap of [priority, seq, class prefix, blocked on]
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def class_of(self, endpoint: str) -> str:
+        return max((p for p in self.classes if endpoint.startswith(p)), key=len)
+
+    def acquire(self, endpoint: str = "", priority: int = MARKET):
+        """Block until `endpoint` may be called at `priority`."""
+        started = self.clock()
+        prefix = self.class_of(endpoint)
+        ticket = [priority, next(self._seq), prefix, None]
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    wait = self._try(ticket, self.clock())
+                    if wait == 0.0:
+                        break
+                    self._cond.wait(wait)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+            waited = self.clock() - started
+            self.granted[priority] += 1
+            self.waited[priority] += waited
+        if self.on_wait is not None:
+            self.on_wait(PRIORITY_NAMES[priority], waited)
+
+    def _try(self, ticket: list, now: float) -> Optional[float]:
+        """Take the tokens and return 0.0, or return how long to wait (None: until notified)."""
+        priority, _, prefix, _ = ticket
+        for other in self._waiting:
+            if other[0] < priority and (other[3] == "" or other[2] == prefix):
+                ticket[3] = None
+                return None
+        bucket = self.classes[prefix]
+        self.total.refill(now); bucket.refill(now)
+        wait = bucket.wait_for(1, now)
+        if wait:
+            ticket[3] = prefix
+            return wait
+        wait = self.total.wait_for(1 + self.reserve[priority], now)
+        if wait:
+            ticket[3] = ""                       # blocked on the global bucket
+            return wait
+        bucket.tokens -= 1
+        self.total.tokens -= 1
+        ticket[3] = None
+        return 0.0
+
+    def feedback(self, endpoint: str, status: int, headers: Optional[Mapping[str, str]] = None, code: Any = None):
+        """Adapt the class budget to what the exchange reported for one response."""
+        headers = headers or {}
+        remaining = None
+        for name in REMAINING_HEADERS:
+            if headers.get(name) is not None:
+                try:
+                    remaining = float(headers[name])
+                except ValueError:
+                    pass
+                break
+        limited = status == 429 or code in RATE_LIMIT_CODES
+        with self._cond:
+            bucket = self.classes[self.class_of(endpoint)]
+            now = self.clock()
+            if limited:
+                self.throttled += 1
+                retry_after = headers.get("Retry-After")
+                try:
+                    pause = float(retry_after) if retry_after is not None else 1.0 / bucket.rate
+                except ValueError:
+                    pause = 1.0 / bucket.rate
+                bucket.rate = max(self.min_rate, bucket.rate / 2)
+                bucket.tokens = 0.0
+                bucket.paused_until = max(bucket.paused_until, now + pause)
+            else:
+                if remaining is not None:
+                    bucket.refill(now)
+                    bucket.tokens = min(bucket.tokens, remaining)
+                if bucket.rate < bucket.configured_rate and 200 <= status < 300:
+                    bucket.rate = min(bucket.configured_rate, bucket.rate + bucket.configured_rate / 20)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "priorities": {name: {"granted": self.granted[i], "waited_s": round(self.waited[i], 3)}
+                               for i, name in enumerate(PRIORITY_NAMES)},
+                "classes": {prefix or "other": {"rate": b.rate, "configured_rate": b.configured_rate,
+                                                "tokens": round(b.tokens, 2)} for prefix, b in self.classes.items()},
+                "throttled": self.throttled,
+                "waiting": len(self._waiting),
+            }
+
+
+def _never_sent(error: Exception) -> bool:
+    """True when the connection failed before the request could reach the exchange."""
+    import requests
+    from urllib3.exceptions import NewConnectionError
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class ExchangeClient:
+    def __init__(self, base_url: str, api_key: Optional[str], api_secret: Optional[str],
+                 pool_size: int = 10, timeouts: Optional[Dict[str, Tuple[float, float]]] = None,
+                 max_retries: int = 3, backoff_base: float = 0.25, backoff_cap: float = 4.0,
+                 rate_limiter: Optional[RateLimiter] = None):
+        # rate_limiter: a RateLimiter or a RequestScheduler (anything with acquire/feedback)
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.rate_limiter = rate_limiter
+        # optional observer called per attempt: on_request(endpoint, seconds, outcome, code)
+        self.on_request: Optional[Callable[[str, float, str, Any], None]] = None
+        self.pool_size = pool_size
+        self._session = None
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The pooled requests.Session, created (and requests imported) on the first call."""
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size,
+                                          max_retries=0)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    # ---- signing ----
+    def signature(self, params: Dict[str, Any]) -> str:
+        query_string = "&".join([f"{key}={value}" for key, value in params.items()])
+        return hmac.new(self.api_secret.encode(), query_string.encode(), hashlib.sha256).hexdigest()
+
+    def sign(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Copy of `params` with timestamp and signature appended (in that order)."""
+        signed = dict(params or {})
+        signed.pop("signature", None)
+        signed["timestamp"] = str(int(time.time() * 1000))
+        signed["signature"] = self.signature(signed)
+        return signed
+
+    def timeout_for(self, endpoint: str) -> Tuple[float, float]:
+        best = max((p for p in self.timeouts if endpoint.startswith(p)), key=len)
+        return self.timeouts[best]
+
+    # ---- requests ----
+    def request(self, method: str, endpoint: str, params: Optional[Dict[str, Any]] = None,
+                data: Any = None, signed: bool = True, idempotent: Optional[bool] = None,
+                priority: Optional[int] = None):
+        """Send one API call and return the decoded JSON body, or None on failure.
+
+        GETs are retried on connection errors, timeouts, 429 and 5xx; other
+        methods only when the connection could not be established, since the
+        exchange may already have acted on a request that was sent.
+        `priority` (CLOSE/ENTRY/ACCOUNT/MARKET) defaults from method and endpoint.
+        """
+        import requests
+        if method not in ("GET", "POST", "DELETE"):
+            return None
+        if idempotent is None:
+            idempotent = method == "GET"
+        url = f"{self.base_url}{endpoint}"
+        headers = {"X-BX-APIKEY": self.api_key} if signed else {}
+        timeout = self.timeout_for(endpoint)
+        if priority is None:
+            priority = default_priority(method, endpoint)
+
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(endpoint, priority)
+            query = self.sign(params) if signed else params
+            started = time.perf_counter()
+            retry = False
+            try:
+                response = self.session.request(method, url, headers=headers, params=query,
+                                                json=data, timeout=timeout)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                self._record(endpoint, started, error="network")
+                retry = idempotent or _never_sent(e); error = e
+            except Exception as e:
+                self._record(endpoint, started, error="exception")
+                print(f"❌ API request failed: {e}")
+                return None
+            else:
+                if response.status_code == 200:
+                    try:
+                        body = response.json()
+                    except json.JSONDecodeError:
+                        self._record(endpoint, started, status=200, error="json")
+                        print(f"❌ Failed to parse JSON response: {response.text}")
+                        return None
+                    code = body.get("code") if isinstance(body, dict) else None
+                    self._record(endpoint, started, status=200, code=code)
+                    if self.rate_limiter is not None:
+                        self.rate_limiter.feedback(endpoint, 200, response.headers, code)
+                    return body
+                self._record(endpoint, started, status=response.status_code)
+                if self.rate_limiter is not None:
+                    self.rate_limiter.feedback(endpoint, response.status_code, response.headers)
+                retry = idempotent and response.status_code in RETRY_STATUS
+                error = f"status {response.status_code}: {response.text}"
+
+            if not retry or attempt == self.max_retries:
+                print(f"❌ API request failed ({endpoint}): {error}")
+                return None
+            self._count_retry(endpoint)
+            time.sleep(random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt)))
+        return None
+
+    def usdt_balance(self) -> Optional[float]:
+        """Available USDT of the futures account, or None when the exchange did not answer."""
+        result = self.request("GET", "/openApi/swap/v2/user/balance")
+        if isinstance(result, dict) and result.get("code") == 0:
+            balance_data = result.get("data", {})
+            if isinstance(balance_data.get("balance"), list):
+                for asset in balance_data["balance"]:
+                    if asset.get("asset") == "USDT":
+                        return float(asset.get("availableBalance", 0.0))
+            elif isinstance(balance_data.get("balance"), dict):
+                asset = balance_data["balance"]
+                if asset.get("asset") == "USDT":
+                    return float(asset.get("availableMargin", 0.0))
+            print("❌ USDT balance not found in response")
+            return None
+        print(f"❌ Balance request failed: {result.get('msg', 'Unknown error') if result else 'No response'}")
+        return None
+
+    # ---- latency accounting ----
+    def _entry(self, endpoint: str) -> Dict[str, float]:
+        entry = self._stats.get(endpoint)
+        if entry is None:
+            entry = self._stats[endpoint] = {"count": 0, "errors": 0, "retries": 0,
+                                             "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0, "last_status": 0}
+        return entry
+
+    def _record(self, endpoint: str, started: float, status: int = 0, error: Optional[str] = None,
+                code: Any = None):
+        ms = (time.perf_counter() - started) * 1000
+        if self.on_request is not None:
+            self.on_request(endpoint, ms / 1000, error or str(status), code)
+        with self._lock:
+            entry = self._entry(endpoint)
+            entry["count"] += 1
+            entry["total_ms"] += ms
+            entry["last_ms"] = ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+            entry["last_status"] = status
+            if error or status != 200:
+                entry["errors"] += 1
+
+    def _count_retry(self, endpoint: str):
+        with self._lock:
+            self._entry(endpoint)["retries"] += 1
+
+    def latency_stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-endpoint count, errors, retries and total/avg/max/last latency in ms."""
+        with self._lock:
+            out = {}
+            for endpoint, entry in self._stats.items():
+                row = dict(entry)
+                row["avg_ms"] = entry["total_ms"] / entry["count"] if entry["count"] else 0.0
+                out[endpoint] = row
+            return out
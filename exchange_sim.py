@@ -0,0 +1,495 @@
+# exchange_sim.py — local stand-in for the BingX swap endpoints the bot uses (no API calls)
+#
+# Serves klines, balance, positions and trade/order (MARKET, TAKE_PROFIT_MARKET,
+# STOP_MARKET) over HTTP, so the order path can be load-tested and exercised
+# end to end without touching the real exchange:
+#
+#   python exchange_sim.py --synthetic 5000 --speed 60 --port 8090
+#   BINGX_BASE_URL=http://127.0.0.1:8090 BINGX_API_KEY=sim BINGX_API_SECRET=sim python main.py
+#
+# Prices come from replayed (--csv) or synthetic candles.  Simulated time runs
+# `speed` times faster than the wall clock; inside a candle the price walks
+# open -> low -> high -> close (bullish) or open -> high -> low -> close
+# (bearish), and that path is both the mark and the last price.  Resting
+# TP/SL orders are matched against every point of the path since the previous
+# request, so a wick between two polls still triggers them.
+#
+# One-way mode (positionSide BOTH): a MARKET order nets against the position,
+# TP/SL orders only ever reduce it and are cancelled once it is flat.
+# Requests are checked like the exchange does (API key header, HMAC-SHA256
+# signature over the query in order, timestamp window), and every response
+# can be delayed or replaced by an injected failure (see SimConfig).
+import argparse
+import hashlib
+import hmac
+import itertools
+import random
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from flask import Flask, jsonify, request
+
+from backtest import load_csv, synthetic_candles
+from exchange_client import ExchangeClient
+from kline_store import interval_to_ms
+
+# Response codes; the exchange uses more, these are the ones the bot can act on
+OK = 0
+BAD_SIGNATURE = 100001
+BAD_API_KEY = 100413
+BAD_TIMESTAMP = 100421
+RATE_LIMITED = 100410
+INVALID_PARAMS = 109400
+INSUFFICIENT_MARGIN = 101204
+ORDER_NOT_FOUND = 80016
+
+ORDER_TYPES = ("MARKET", "TAKE_PROFIT_MARKET", "STOP_MARKET")
+KLINE_ENDPOINT = "/openApi/swap/v2/quote/klines"
+BALANCE_ENDPOINT = "/openApi/swap/v2/user/balance"
+POSITIONS_ENDPOINT = "/openApi/swap/v2/user/positions"
+ORDER_ENDPOINT = "/openApi/swap/v2/trade/order"
+
+
+@dataclass
+class SimConfig:
+    api_key: str = "sim"
+    api_secret: str = "sim"
+    symbol: str = "DOGE-USDT"
+    interval: str = "15m"
+    balance: float = 1000.0
+    leverage: float = 10
+    fee_rate: float = 0.0005               # per fill, fraction of notional
+    slippage: float = 0.0                  # MARKET fills this fraction worse than the price
+    speed: float = 1.0                     # simulated seconds per wall-clock second
+    warmup: int = 300                      # candles already closed when the simulation starts
+    recv_window_ms: float = 5000
+    check_signature: bool = True
+    latency_ms: float = 0.0                # added to every response ...
+    jitter_ms: float = 0.0                 # ... plus uniform(0, jitter)
+    error_rate: float = 0.0                # share of requests answered 503
+    throttle_rate: float = 0.0             # share answered 429 with Retry-After
+    throttle_code_rate: float = 0.0        # share answered 200 with the frequency-limit code
+    timeout_rate: float = 0.0              # share held for `stall_seconds` before answering
+    stall_seconds: float = 15.0
+    reject_rate: float = 0.0               # share of orders rejected with INVALID_PARAMS
+    fill_delay: float = 0.0                # wall seconds a MARKET order stays NEW before filling
+    seed: int = 0
+
+
+@dataclass
+class _Position:
+    qty: float = 0.0                       # signed: > 0 long, < 0 short
+    entry: float = 0.0
+    realized: float = 0.0
+
+
+class SimExchange:
+    """Price path, account and matching engine; thread-safe, no HTTP."""
+
+    def __init__(self, candles: Dict[str, np.ndarray], config: Optional[SimConfig] = None, clock=time.time):
+        self.config = config or SimConfig()
+        self.clock = clock
+        self.candles = {k: np.asarray(v, dtype=float) for k, v in candles.items()}
+        self.interval_ms = interval_to_ms(self.config.interval)
+        self.rng = random.Random(self.config.seed)
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            n = len(self.candles["close"])
+            start = min(self.config.warmup, n - 1)
+            self.start_ms = float(self.candles["timestamp"][start])
+            self.started_at = self.clock()
+            self.wallet = self.config.balance
+            self.position = _Position()
+            self.orders: Dict[int, Dict[str, Any]] = {}
+            self.fills: List[Dict[str, Any]] = []
+            self.requests = 0
+            self.injected = 0
+            self._ids = itertools.count(1_700_000_000_000)
+            self._last_ms = self.start_ms
+
+    # ---- price path ----
+    def now_ms(self) -> float:
+        return self.start_ms + (self.clock() - self.started_at) * self.config.speed * 1000
+
+    def _index(self, ms: float) -> int:
+        i = int((ms - self.candles["timestamp"][0]) // self.interval_ms)
+        return max(0, min(i, len(self.candles["close"]) - 1))
+
+    def _waypoints(self, i: int) -> List[Tuple[float, float]]:
+        c = self.candles
+        ts, o, h, l, cl = (float(c[k][i]) for k in ("timestamp", "open", "high", "low", "close"))
+        mid = (l, h) if cl >= o else (h, l)
+        step = self.interval_ms / 3
+        return [(ts, o), (ts + step, mid[0]), (ts + 2 * step, mid[1]), (ts + self.interval_ms, cl)]
+
+    def price_at(self, ms: float) -> float:
+        i = self._index(ms)
+        points = self._waypoints(i)
+        if ms >= points[-1][0]:
+            return points[-1][1]
+        for (t0, p0), (t1, p1) in zip(points, points[1:]):
+            if ms <= t1:
+                return p0 + (p1 - p0) * max(0.0, ms - t0) / (t1 - t0)
+        return points[-1][1]
+
+    def _path(self, t0: float, t1: float) -> List[float]:
+        """Prices at t0, at every waypoint in (t0, t1), and at t1, in time order."""
+        prices = [self.price_at(t0)]
+        for i in range(self._index(t0), self._index(t1) + 1):
+            prices.extend(p for t, p in self._waypoints(i) if t0 < t < t1)
+        prices.append(self.price_at(t1))
+        return prices
+
+    @property
+    def finished(self) -> bool:
+        return bool(self.now_ms() >= self.candles["timestamp"][-1] + self.interval_ms)
+
+    # ---- market data ----
+    def klines(self, limit: int = 500, start: Optional[float] = None, end: Optional[float] = None):
+        now = self.now_ms()
+        last = self._index(now)
+        ts = self.candles["timestamp"]
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side="left"))
+        hi = last + 1 if end is None else min(last + 1, int(np.searchsorted(ts, end, side="right")))
+        lo, hi = (lo, min(hi, lo + limit)) if start is not None else (max(lo, hi - limit), hi)
+        rows = []
+        for i in range(lo, hi):
+            o, h, l, c = (self.candles[k][i] for k in ("open", "high", "low", "close"))
+            v = self.candles["volume"][i] if "volume" in self.candles else 0.0
+            if i == last and now < ts[i] + self.interval_ms:
+                # forming candle: only the part of the path already walked
+                seen = [p for t, p in self._waypoints(i) if t <= now] + [self.price_at(now)]
+                h, l, c = max(seen), min(seen), seen[-1]
+                v *= (now - ts[i]) / self.interval_ms
+            rows.append({"open": f"{o}", "close": f"{c}", "high": f"{h}", "low": f"{l}",
+                         "volume": f"{v}", "time": int(ts[i])})
+        return rows
+
+    # ---- matching ----
+    def advance(self):
+        """Fill everything the price path crossed since the previous call."""
+        with self.lock:
+            now = self.now_ms()
+            wall = self.clock()
+            for order in list(self.orders.values()):
+                if order["status"] == "NEW" and order["type"] == "MARKET" and wall >= order["fill_at"]:
+                    self._fill_market(order, self.price_at(now))
+            if now > self._last_ms:
+                path = self._path(self._last_ms, now)
+                for a, b in zip(path, path[1:]):
+                    if not self._resting():
+                        break
+                    self._match_segment(a, b)
+                self._last_ms = now
+
+    def _resting(self) -> List[Dict[str, Any]]:
+        return [o for o in self.orders.values() if o["status"] == "NEW" and o["type"] != "MARKET"]
+
+    def _match_segment(self, a: float, b: float):
+        lo, hi = min(a, b), max(a, b)
+        for order in self._resting():
+            stop = order["stopPrice"]
+            up = (order["type"] == "TAKE_PROFIT_MARKET") == (order["side"] == "SELL")
+            if up and a >= stop or not up and a <= stop:
+                self._fill(order, a)            # already through the trigger at the segment start
+            elif lo <= stop <= hi:
+                self._fill(order, stop)
+            if self.position.qty == 0:
+                self._cancel_conditionals()
+                return
+
+    def _fill_market(self, order: Dict[str, Any], price: float):
+        slip = self.config.slippage if order["side"] == "BUY" else -self.config.slippage
+        self._fill(order, price * (1 + slip))
+
+    def _fill(self, order: Dict[str, Any], price: float):
+        pos = self.position
+        signed = order["origQty"] if order["side"] == "BUY" else -order["origQty"]
+        if order["type"] != "MARKET":
+            # TP/SL legs only reduce: never more than the open size, never in the same direction
+            if pos.qty == 0 or (signed > 0) == (pos.qty > 0):
+                order["status"] = "CANCELED"; order["updateTime"] = int(self.now_ms())
+                return
+            signed = max(-abs(pos.qty), min(abs(pos.qty), signed))
+        qty = abs(signed)
+        closing = min(qty, abs(pos.qty)) if pos.qty and (signed > 0) != (pos.qty > 0) else 0.0
+        if closing:
+            pnl = (price - pos.entry) * closing * (1 if pos.qty > 0 else -1)
+            pos.realized += pnl
+            self.wallet += pnl
+        opening = qty - closing
+        new_qty = pos.qty + signed
+        if opening:
+            same = pos.qty if (pos.qty > 0) == (signed > 0) else 0.0
+            pos.entry = (abs(same) * pos.entry + opening * price) / (abs(same) + opening)
+        if new_qty == 0:
+            pos.entry = 0.0
+        pos.qty = new_qty
+        fee = qty * price * self.config.fee_rate
+        self.wallet -= fee
+        order.update(status="FILLED", executedQty=qty, avgPrice=price, updateTime=int(self.now_ms()))
+        self.fills.append({"orderId": order["orderId"], "type": order["type"], "side": order["side"],
+                           "qty": qty, "price": price, "fee": fee, "time": int(self.now_ms())})
+
+    def _cancel_conditionals(self):
+        for order in self._resting():
+            order["status"] = "CANCELED"; order["updateTime"] = int(self.now_ms())
+
+    # ---- account ----
+    def unrealized(self, price: Optional[float] = None) -> float:
+        pos = self.position
+        if not pos.qty:
+            return 0.0
+        price = self.price_at(self.now_ms()) if price is None else price
+        return (price - pos.entry) * pos.qty
+
+    def balance(self) -> Dict[str, Any]:
+        with self.lock:
+            upnl = self.unrealized()
+            margin = abs(self.position.qty) * self.position.entry / self.config.leverage
+            equity = self.wallet + upnl
+            return {"asset": "USDT", "balance": f"{self.wallet:.8f}", "equity": f"{equity:.8f}",
+                    "unrealizedProfit": f"{upnl:.8f}", "usedMargin": f"{margin:.8f}",
+                    "availableMargin": f"{max(equity - margin, 0.0):.8f}"}
+
+    def positions(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self.lock:
+            pos = self.position
+            if not pos.qty or (symbol and symbol != self.config.symbol):
+                return []
+            return [{"symbol": self.config.symbol, "positionSide": "BOTH", "positionAmt": f"{pos.qty}",
+                     "entryPrice": f"{pos.entry}", "markPrice": f"{self.price_at(self.now_ms())}",
+                     "unrealizedProfit": f"{self.unrealized():.8f}", "leverage": self.config.leverage}]
+
+    # ---- orders ----
+    def place(self, params: Dict[str, str]) -> Tuple[int, str, Optional[Dict[str, Any]]]:
+        """(code, msg, order) for a trade/order POST."""
+        kind = params.get("type", "")
+        side = params.get("side", "")
+        try:
+            qty = float(params.get("quantity", 0))
+            stop = float(params["stopPrice"]) if kind != "MARKET" else 0.0
+        except (KeyError, ValueError):
+            return INVALID_PARAMS, "quantity/stopPrice missing or not a number", None
+        if params.get("symbol") != self.config.symbol:
+            return INVALID_PARAMS, f"unknown symbol {params.get('symbol')}", None
+        if kind not in ORDER_TYPES or side not in ("BUY", "SELL") or qty <= 0:
+            return INVALID_PARAMS, f"unsupported order {side} {kind} {qty}", None
+        if self.rng.random() < self.config.reject_rate:
+            return INVALID_PARAMS, "order rejected (injected)", None
+
+        with self.lock:
+            now = self.now_ms()
+            price = self.price_at(now)
+            pos = self.position
+            signed = qty if side == "BUY" else -qty
+            if kind == "MARKET" and (not pos.qty or (signed > 0) == (pos.qty > 0)):
+                needed = qty * price / self.config.leverage
+                available = self.wallet + self.unrealized(price) - abs(pos.qty) * pos.entry / self.config.leverage
+                if needed > available:
+                    return INSUFFICIENT_MARGIN, f"insufficient margin: need {needed:.4f}, have {available:.4f}", None
+            order = {"orderId": next(self._ids), "symbol": self.config.symbol, "side": side,
+                     "positionSide": params.get("positionSide", "BOTH"), "type": kind, "origQty": qty,
+                     "executedQty": 0.0, "stopPrice": stop, "workingType": params.get("workingType", "MARK_PRICE"),
+                     "status": "NEW", "avgPrice": 0.0, "time": int(now), "updateTime": int(now),
+                     "fill_at": self.clock() + self.config.fill_delay}
+            self.orders[order["orderId"]] = order
+            if kind == "MARKET" and self.config.fill_delay <= 0:
+                self._fill_market(order, price)
+            return OK, "", order
+
+    def get_order(self, order_id) -> Optional[Dict[str, Any]]:
+        try:
+            return self.orders.get(int(order_id))
+        except (TypeError, ValueError):
+            return None
+
+    def cancel(self, order_id) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            order = self.get_order(order_id)
+            if order is not None and order["status"] == "NEW":
+                order["status"] = "CANCELED"; order["updateTime"] = int(self.now_ms())
+            return order
+
+    def handle(self, method: str, endpoint: str, params: Dict[str, Any]) -> Tuple[int, str, Any]:
+        """(code, msg, data) for one authenticated request, after advancing the matching engine."""
+        with self.lock:
+            self.requests += 1
+        self.advance()
+        cfg = self.config
+        if endpoint == KLINE_ENDPOINT and method == "GET":
+            if params.get("symbol") != cfg.symbol or params.get("interval") != cfg.interval:
+                return INVALID_PARAMS, f"simulator serves {cfg.symbol} {cfg.interval} only", None
+            return OK, "", self.klines(min(int(params.get("limit", 500)), 1440),
+                                       float(params["startTime"]) if "startTime" in params else None,
+                                       float(params["endTime"]) if "endTime" in params else None)
+        if endpoint == BALANCE_ENDPOINT and method == "GET":
+            return OK, "", {"balance": self.balance()}
+        if endpoint == POSITIONS_ENDPOINT and method == "GET":
+            return OK, "", self.positions(params.get("symbol"))
+        if endpoint == ORDER_ENDPOINT and method == "POST":
+            code, msg, placed = self.place(params)
+            return code, msg, {"order": _public(placed)} if placed else None
+        if endpoint == ORDER_ENDPOINT and method in ("GET", "DELETE"):
+            found = self.get_order(params.get("orderId")) if method == "GET" else self.cancel(params.get("orderId"))
+            if found is None:
+                return ORDER_NOT_FOUND, "order does not exist", None
+            return OK, "", {"order": _public(found)}
+        return INVALID_PARAMS, f"simulator does not serve {method} {endpoint}", None
+
+    def state(self) -> Dict[str, Any]:
+        with self.lock:
+            now = self.now_ms()
+            return {"sim_time": int(now), "price": self.price_at(now), "finished": self.finished,
+                    "wallet": self.wallet, "position": asdict(self.position), "requests": self.requests,
+                    "injected": self.injected, "open_orders": [_public(o) for o in self._resting()],
+                    "fills": self.fills[-50:], "config": asdict(self.config)}
+
+
+def _public(order: Dict[str, Any]) -> Dict[str, Any]:
+    out = {k: v for k, v in order.items() if k != "fill_at"}
+    for k in ("origQty", "executedQty", "stopPrice", "avgPrice"):
+        out[k] = f"{order[k]}"
+    return out
+
+
+# ---------- HTTP ----------
+def _reply(code: int, msg: str = "", data: Any = None, status: int = 200):
+    return jsonify({"code": code, "msg": msg, "data": data if data is not None else {}}), status
+
+
+def create_app(sim: SimExchange) -> Flask:
+    app = Flask(__name__)
+    cfg = sim.config
+
+    def check_signed():
+        """None when key, timestamp and signature are valid, else the error reply."""
+        if request.headers.get("X-BX-APIKEY") != cfg.api_key:
+            return _reply(BAD_API_KEY, "Incorrect apiKey")
+        pairs = [(k, v) for k, v in request.args.items(multi=True) if k != "signature"]
+        try:
+            ts = float(request.args.get("timestamp", ""))
+        except ValueError:
+            return _reply(BAD_TIMESTAMP, "timestamp missing")
+        if abs(time.time() * 1000 - ts) > cfg.recv_window_ms:
+            return _reply(BAD_TIMESTAMP, "timestamp outside recvWindow")
+        if cfg.check_signature:
+            query = "&".join(f"{k}={v}" for k, v in pairs)
+            expected = hmac.new(cfg.api_secret.encode(), query.encode(), hashlib.sha256).hexdigest()
+            if not hmac.compare_digest(expected, request.args.get("signature", "")):
+                return _reply(BAD_SIGNATURE, "Signature verification failed")
+        return None
+
+    @app.before_request
+    def inject():
+        if request.path.startswith("/sim/"):
+            return None
+        with sim.lock:
+            roll = sim.rng.random()
+            delay = (cfg.latency_ms + sim.rng.uniform(0, cfg.jitter_ms)) / 1000
+        if delay > 0:
+            time.sleep(delay)
+        for rate, failure in ((cfg.error_rate, "error"), (cfg.throttle_rate, "throttle"),
+                              (cfg.throttle_code_rate, "throttle_code"), (cfg.timeout_rate, "stall")):
+            if roll < rate:
+                with sim.lock:
+                    sim.injected += 1
+                if failure == "error":
+                    return _reply(OK, "service unavailable (injected)", status=503)
+                if failure == "throttle":
+                    body, status = _reply(RATE_LIMITED, "too many requests (injected)", status=429)
+                    body.headers["Retry-After"] = "1"
+                    return body, status
+                if failure == "throttle_code":
+                    return _reply(RATE_LIMITED, "frequency limit (injected)")
+                time.sleep(cfg.stall_seconds)
+                break
+            roll -= rate
+        return None
+
+    @app.route(KLINE_ENDPOINT)
+    @app.route(BALANCE_ENDPOINT)
+    @app.route(POSITIONS_ENDPOINT)
+    @app.route(ORDER_ENDPOINT, methods=["GET", "POST", "DELETE"])
+    def api():
+        denied = None if request.path == KLINE_ENDPOINT else check_signed()
+        if denied:
+            return denied
+        code, msg, data = sim.handle(request.method, request.path, request.args.to_dict())
+        return _reply(code, msg, data)
+
+    @app.route("/sim/state")
+    def state():
+        sim.advance()
+        return jsonify(sim.state())
+
+    @app.route("/sim/config", methods=["POST"])
+    def configure():
+        """Change failure injection / latency at run time: POST a JSON object of SimConfig fields."""
+        changes = request.get_json(silent=True) or {}
+        unknown = sorted(set(changes) - set(asdict(cfg)))
+        if unknown:
+            return jsonify({"error": f"unknown fields {unknown}"}), 400
+        for k, v in changes.items():
+            setattr(cfg, k, type(getattr(cfg, k))(v))
+        return jsonify(asdict(cfg))
+
+    @app.route("/sim/reset", methods=["POST"])
+    def reset():
+        sim.reset()
+        return jsonify(sim.state())
+
+    return app
+
+
+class PaperClient(ExchangeClient):
+    """ExchangeClient that answers from a SimExchange in-process: no HTTP, signing or rate limits."""
+
+    def __init__(self, sim: SimExchange):
+        super().__init__("sim://", sim.config.api_key, sim.config.api_secret)
+        self.sim = sim
+
+    def request(self, method: str, endpoint: str, params: Optional[Dict[str, Any]] = None,
+                data: Any = None, signed: bool = True, idempotent: Optional[bool] = None,
+                priority: Optional[int] = None):
+        code, msg, body = self.sim.handle(method, endpoint, dict(params or {}))
+        return {"code": code, "msg": msg, "data": body if body is not None else {}}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Local BingX-compatible exchange for offline runs of the bot")
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--csv", help="candles to replay (timestamp,open,high,low,close[,volume])")
+    src.add_argument("--synthetic", type=int, default=5000, help="number of synthetic candles")
+    ap.add_argument("--port", type=int, default=8090)
+    ap.add_argument("--host", default="127.0.0.1")
+    for name, f in SimConfig.__dataclass_fields__.items():
+        if f.type in (int, float, str):
+            ap.add_argument(f"--{name.replace('_', '-')}", dest=name, default=f.default,
+                            type=f.type, help=f"default {f.default!r}")
+    ap.add_argument("--no-signature-check", action="store_true")
+    args = ap.parse_args(argv)
+
+    config = SimConfig(**{k: getattr(args, k) for k in SimConfig.__dataclass_fields__ if hasattr(args, k)})
+    config.check_signature = not args.no_signature_check
+    if args.csv:
+        candles = load_csv(args.csv)
+    else:
+        # aligned to the interval like exchange candles, ending now so the bot sees current times
+        step = interval_to_ms(config.interval)
+        start = (int(time.time() * 1000) // step - config.warmup) * step
+        candles = synthetic_candles(args.synthetic, config.interval, seed=config.seed, start_ms=start)
+    sim = SimExchange(candles, config)
+    print(f"🧪 Simulating {config.symbol} {config.interval} from {len(candles['close'])} candles "
+          f"at x{config.speed} on http://{args.host}:{args.port}")
+    create_app(sim).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# execution.py — the order requests of one symbol, shared by main.py and symbol_engine.py
+#
+# Entry, TP/SL bracket, close, status and cancel requests, plus the price
+# arithmetic around them (ATR TP/SL, exit conditions, realized profit), live
+# here once.  The single-symbol loop in main.py and every SymbolEngine keep
+# their own position state and logging but send orders only through an
+# OrderExecutor, so a fix to the order path applies to both modes.
+#
+# The executor is handed a request callable with ExchangeClient.request's
+# signature rather than a client, so main.py can pass its safe_api_request
+# and keep swapping the client underneath (paper trading, tests).
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from exchange_client import CLOSE
+from order_lifecycle import PositionLifecycle, FILLED, FAILED
+
+ORDER_ENDPOINT = "/openApi/swap/v2/trade/order"
+POSITIONS_ENDPOINT = "/openApi/swap/v2/user/positions"
+
+TP_ATR = 1.2
+SL_ATR = 0.8
+
+# TP and SL legs of every bracket go out in parallel
+bracket_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="bracket")
+
+
+def order_payload(data) -> Dict[str, Any]:
+    """Order fields from a trade/order response (BingX may nest them under "order")."""
+    if isinstance(data, dict) and isinstance(data.get("order"), dict):
+        return data["order"]
+    return data if isinstance(data, dict) else {}
+
+
+def accepted(response) -> bool:
+    return bool(response) and response.get("code") == 0
+
+
+def error_text(response) -> str:
+    return response.get("msg") if response else "Unknown error"
+
+
+def fill_price(order_data: Dict[str, Any]) -> Optional[float]:
+    """avgPrice of a filled order, or None when the exchange has not reported one yet."""
+    avg = order_data.get("avgPrice")
+    return float(avg) if avg not in (None, "", "0", 0) else None
+
+
+def fill_quantity(order_data: Dict[str, Any]) -> Optional[float]:
+    """executedQty of a filled order, or None when the exchange has not reported one."""
+    qty = order_data.get("executedQty")
+    try:
+        qty = float(qty)
+    except (TypeError, ValueError):
+        return None
+    return qty if qty > 0 else None
+
+
+def tp_sl_prices(entry_price: float, atr: float, side: str, precision: int = 5) -> Tuple[float, float]:
+    if side == "BUY":
+        tp, sl = entry_price + atr * TP_ATR, entry_price - atr * SL_ATR
+    else:
+        tp, sl = entry_price - atr * TP_ATR, entry_price + atr * SL_ATR
+    return round(tp, precision), round(sl, precision)
+
+
+def exit_reason(side: str, price: float, tp: float, sl: float, tolerance: float) -> Optional[str]:
+    """"TP" or "SL" once `price` is within `tolerance` of the level, else None."""
+    sign = 1 if side == "BUY" else -1
+    if sign * (price - tp) >= -tolerance:
+        return "TP"
+    if sign * (price - sl) <= tolerance:
+        return "SL"
+    return None
+
+
+def realized_profit(side: str, entry_price: float, exit_price: float, quantity: float) -> float:
+    sign = 1 if side == "BUY" else -1
+    return sign * (exit_price - entry_price) * quantity
+
+
+class OrderExecutor:
+    """Order requests of one symbol over a shared client's request function."""
+
+    def __init__(self, symbol: str, request: Callable[..., Optional[Dict[str, Any]]], price_precision: int = 5,
+                 log: Callable[[str], None] = print):
+        self.symbol = symbol
+        self.request = request
+        self.price_precision = price_precision
+        self.log = log
+
+    def tp_sl(self, entry_price: float, atr: float, side: str) -> Tuple[float, float]:
+        return tp_sl_prices(entry_price, atr, side, self.price_precision)
+
+    def market(self, side: str, quantity: float, priority: Optional[int] = None):
+        """Send a MARKET order; returns the raw response."""
+        return self.request("POST", ORDER_ENDPOINT, params={
+            "symbol": self.symbol, "side": side, "positionSide": "BOTH", "type": "MARKET",
+            "quantity": quantity}, priority=priority)
+
+    def close(self, position_side: str, quantity: float):
+        """Flatten a position with a MARKET order on the opposite side, ahead of all other traffic."""
+        return self.market("SELL" if position_side == "BUY" else "BUY", quantity, priority=CLOSE)
+
+    def bracket(self, position_side: str, quantity: float, tp: float, sl: float) -> Optional[str]:
+        """Place the TP and SL legs together; None when both rest, else the close reason.
+
+        When a leg is rejected every accepted leg is cancelled by its orderId
+        before returning "NO_TP"/"NO_SL", so no stop is left behind to fire
+        against the next position.
+        """
+        exit_side = "SELL" if position_side == "BUY" else "BUY"
+        futures = {}
+        for name, kind, price in (("TP", "TAKE_PROFIT_MARKET", tp), ("SL", "STOP_MARKET", sl)):
+            futures[name] = bracket_pool.submit(self.request, "POST", ORDER_ENDPOINT, params={
+                "symbol": self.symbol, "side": exit_side, "positionSide": "BOTH", "type": kind,
+                "quantity": quantity, "stopPrice": f"{price:.{self.price_precision}f}",
+                "workingType": "MARK_PRICE"}, priority=CLOSE)
+        responses = {name: future.result() for name, future in futures.items()}
+        failed = None
+        for name, price in (("TP", tp), ("SL", sl)):
+            if accepted(responses[name]):
+                self.log(f"✅ {name} order placed @ {price:.{self.price_precision}f}")
+            else:
+                self.log(f"❌ Failed to place {name} order: {error_text(responses[name])}")
+                failed = failed or name
+        if failed is None:
+            return None
+        for name, response in responses.items():
+            if accepted(response):
+                self.cancel(order_payload(response.get("data")).get("orderId"), name)
+        return f"NO_{failed}"
+
+    def cancel(self, order_id, name: str = "entry", priority: Optional[int] = CLOSE) -> bool:
+        if not order_id:
+            self.log(f"⚠️ {name} order has no orderId — cannot cancel it")
+            return False
+        response = self.request("DELETE", ORDER_ENDPOINT, params={"symbol": self.symbol, "orderId": order_id},
+                                priority=priority)
+        if accepted(response):
+            self.log(f"🧹 Cancelled {name} order {order_id}")
+            return True
+        self.log(f"❌ Failed to cancel {name} order {order_id}: {error_text(response)}")
+        return False
+
+    def order_status(self, order_id) -> Optional[Dict[str, Any]]:
+        response = self.request("GET", ORDER_ENDPOINT, params={"symbol": self.symbol, "orderId": order_id})
+        return order_payload(response.get("data")) if accepted(response) else None
+
+    def open_position(self) -> Optional[Dict[str, Any]]:
+        """The symbol's non-zero position as {side, entryPrice, positionAmt, unrealizedProfit}, or None."""
+        return self.position()[1]
+
+    def position(self) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """(answered, open position or None); answered is False when the positions request failed."""
+        response = self.request("GET", POSITIONS_ENDPOINT, params={"symbol": self.symbol})
+        if not (response and isinstance(response, dict) and "data" in response):
+            return False, None
+        for position in response["data"] or []:
+            if (isinstance(position, dict) and "entryPrice" in position
+                    and float(position.get("positionAmt", 0) or 0) != 0):
+                amount = float(position["positionAmt"])
+                return True, {"side": "BUY" if amount > 0 else "SELL",
+                              "entryPrice": float(position["entryPrice"]),
+                              "positionAmt": abs(amount),
+                              "unrealizedProfit": float(position.get("unrealizedProfit", 0) or 0)}
+        return True, None
+
+    def poll_entry(self, lifecycle: PositionLifecycle) -> Tuple[Optional[str], Dict[str, Any]]:
+        """One status query for a pending entry: (outcome, fill data), outcome None while still pending.
+
+        Outcomes are "filled", "not_filled" (the exchange gave up on the
+        order) and "fill_timeout".  Past the fill deadline the exchange
+        position is the source of truth: if it exists the entry filled,
+        otherwise the order is cancelled and the lifecycle fails.  The fill
+        data carries avgPrice and, when known, executedQty.
+        """
+        order_data = self.order_status(lifecycle.order_id)
+        if order_data is not None:
+            new_state = lifecycle.on_order_update(order_data)
+            if new_state == FILLED:
+                return "filled", order_data
+            if new_state == FAILED:
+                return "not_filled", {}
+        if not lifecycle.expired():
+            return None, {}
+        position = self.open_position()
+        if position and position["side"] == lifecycle.side:
+            lifecycle.transition(FILLED, "position found after fill deadline")
+            return "filled", {"avgPrice": position["entryPrice"], "executedQty": position["positionAmt"]}
+        self.cancel(lifecycle.order_id, priority=None)
+        lifecycle.transition(FAILED, "fill deadline passed")
+        return "fill_timeout", {}
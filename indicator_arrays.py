@@ -0,0 +1,206 @@
+# indicator_arrays.py — NumPy indicator kernels over whole histories (no pandas, no API calls)
+#
+# The recursive indicators cannot be vectorised along time, so the kernels
+# loop over plain Python floats (single series) or over the time axis with
+# NumPy operations across a batch of series/parameter sets (many series).
+# Either way there is no per-element pandas indexing.
+import math
+from typing import Dict, Iterable, Tuple
+import numpy as np
+
+
+def ewm_mean(x, alpha: float, adjust: bool, min_periods: int = 1) -> np.ndarray:
+    """pandas `Series.ewm(alpha=..., adjust=...).mean()` for a 1-D array (NaN-aware, same recurrence)."""
+    vals = np.asarray(x, dtype=float).tolist()
+    out = [math.nan] * len(vals)
+    weighted = math.nan; old_wt = 1.0; nobs = 0
+    new_wt = 1.0 if adjust else alpha
+    decay = 1.0 - alpha
+    min_periods = max(min_periods, 1)
+    for i, v in enumerate(vals):
+        is_obs = v == v
+        nobs += is_obs
+        if weighted == weighted:
+            old_wt *= decay
+            if is_obs:
+                if weighted != v:
+                    weighted = (old_wt * weighted + new_wt * v) / (old_wt + new_wt)
+                old_wt = old_wt + new_wt if adjust else 1.0
+        elif is_obs:
+            weighted = v
+        if nobs >= min_periods:
+            out[i] = weighted
+    return np.asarray(out)
+
+
+def ema(close, period: int) -> np.ndarray:
+    """calculate_ema: ewm(span=period, adjust=False)."""
+    return ewm_mean(close, 2.0 / (period + 1), adjust=False)
+
+
+def sma(close, period: int) -> np.ndarray:
+    """calculate_sma: rolling mean, NaN for the first period-1 values."""
+    close = np.asarray(close, dtype=float)
+    out = np.full(close.shape, np.nan)
+    if len(close) >= period:
+        csum = np.cumsum(np.insert(close, 0, 0.0))
+        out[period - 1:] = (csum[period:] - csum[:-period]) / period
+    return out
+
+
+def rsi(close, window: int = 14) -> np.ndarray:
+    """ta RSIIndicator: Wilder smoothing of up/down moves (the first move counts as zero)."""
+    close = np.asarray(close, dtype=float)
+    diff = np.diff(close, prepend=np.nan)
+    up = np.where(diff > 0, diff, 0.0)
+    down = np.where(diff < 0, -diff, 0.0)
+    emaup = ewm_mean(up, 1.0 / window, adjust=False, min_periods=window)
+    emadn = ewm_mean(down, 1.0 / window, adjust=False, min_periods=window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(emadn == 0, 100.0, 100 - (100 / (1 + emaup / emadn)))
+
+
+def adx(high, low, close, period: int = 14) -> np.ndarray:
+    """calculate_adx: independently clipped DMs, SMA true range, ewm(alpha=1/period, adjust=True)."""
+    high = np.asarray(high, dtype=float); low = np.asarray(low, dtype=float)
+    plus_dm = np.diff(high, prepend=np.nan)
+    minus_dm = -np.diff(low, prepend=np.nan)
+    plus_dm[plus_dm < 0] = 0
+    minus_dm[minus_dm < 0] = 0
+    atr = sma(true_range(high, low, close), period)
+    alpha = 1.0 / period
+    with np.errstate(divide="ignore", invalid="ignore"):
+        plus_di = 100 * (ewm_mean(plus_dm, alpha, adjust=True) / atr)
+        minus_di = 100 * (ewm_mean(minus_dm, alpha, adjust=True) / atr)
+        dx = (np.abs(plus_di - minus_di) / (plus_di + minus_di)) * 100
+    return ewm_mean(dx, alpha, adjust=True)
+
+
+def price_range_percent(close, lookback: int = 20) -> np.ndarray:
+    """price_range_percent at every bar: (max - min) / min * 100 over the last `lookback` closes."""
+    close = np.asarray(close, dtype=float)
+    out = np.zeros(close.shape)
+    if len(close) >= lookback:
+        windows = np.lib.stride_tricks.sliding_window_view(close, lookback)
+        lowest = windows.min(axis=1)
+        out[lookback - 1:] = (windows.max(axis=1) - lowest) / lowest * 100
+    return out
+
+
+def true_range(high, low, close) -> np.ndarray:
+    """max(high-low, |high-prev_close|, |low-prev_close|); the first bar is high-low.
+
+    Works on 1-D arrays or 2-D (series, time) arrays.
+    """
+    high = np.asarray(high, dtype=float); low = np.asarray(low, dtype=float); close = np.asarray(close, dtype=float)
+    tr = high - low
+    if tr.shape[-1] > 1:
+        prev_close = close[..., :-1]
+        tr[..., 1:] = np.maximum(tr[..., 1:], np.maximum(np.abs(high[..., 1:] - prev_close),
+                                                         np.abs(low[..., 1:] - prev_close)))
+    return tr
+
+
+def wilder_atr(high, low, close, window: int = 14) -> np.ndarray:
+    """ta AverageTrueRange: zeros until window-1, the mean of the first `window` TRs, then Wilder.
+
+    Accepts 1-D arrays or 2-D (series, time) arrays.
+    """
+    tr = true_range(high, low, close)
+    atr = np.zeros_like(tr)
+    n = tr.shape[-1]
+    if n < window:
+        return atr
+    atr[..., window - 1] = tr[..., :window].mean(axis=-1)
+    if tr.ndim == 1:
+        trs = tr.tolist(); out = atr.tolist(); prev = out[window - 1]; w = float(window)
+        for i in range(window, n):
+            prev = (prev * (window - 1) + trs[i]) / w
+            out[i] = prev
+        return np.asarray(out)
+    # time-major copies keep each step on contiguous memory
+    tr_t = np.ascontiguousarray(tr.T); atr_t = np.ascontiguousarray(atr.T)
+    for i in range(window, n):
+        atr_t[i] = (atr_t[i - 1] * (window - 1) + tr_t[i]) / float(window)
+    return atr_t.T.copy()
+
+
+def supertrend_kernel(close, upper, lower) -> Tuple[np.ndarray, np.ndarray]:
+    """Band ratchet of calculate_supertrend over precomputed basic bands.
+
+    A close above the previous upper band flips the trend up, below the
+    previous lower band flips it down; otherwise the trend holds and the band
+    on its side may only tighten.  Returns (line, direction); 1-D inputs loop
+    over Python floats, 2-D (series, time) inputs step time with NumPy across rows.
+    """
+    close = np.asarray(close, dtype=float)
+    upper = np.array(upper, dtype=float); lower = np.array(lower, dtype=float)
+    n = close.shape[-1]
+    if close.ndim == 1:
+        c = close.tolist(); ub = upper.tolist(); lb = lower.tolist()
+        d = [1.0] * n
+        for i in range(1, n):
+            if c[i] > ub[i - 1]:
+                d[i] = 1.0
+            elif c[i] < lb[i - 1]:
+                d[i] = -1.0
+            else:
+                d[i] = d[i - 1]
+                if d[i] == 1 and lb[i] < lb[i - 1]:
+                    lb[i] = lb[i - 1]
+                if d[i] == -1 and ub[i] > ub[i - 1]:
+                    ub[i] = ub[i - 1]
+        direction = np.asarray(d)
+        return np.where(direction == 1, lb, ub), direction
+
+    # time-major copies keep each step on contiguous memory
+    c = np.ascontiguousarray(close.T); ub = np.ascontiguousarray(upper.T); lb = np.ascontiguousarray(lower.T)
+    d = np.ones_like(c)
+    for i in range(1, n):
+        up = c[i] > ub[i - 1]
+        down = c[i] < lb[i - 1]
+        down &= ~up
+        hold = ~(up | down)
+        d[i] = np.where(up, 1.0, np.where(down, -1.0, d[i - 1]))
+        np.copyto(lb[i], lb[i - 1], where=hold & (d[i] == 1) & (lb[i] < lb[i - 1]))
+        np.copyto(ub[i], ub[i - 1], where=hold & (d[i] == -1) & (ub[i] > ub[i - 1]))
+    return np.where(d == 1, lb, ub).T.copy(), d.T.copy()
+
+
+def supertrend(high, low, close, period: int = 10, multiplier: float = 3) -> Tuple[np.ndarray, np.ndarray]:
+    """Supertrend (line, direction) for one series, or a (series, time) block sharing one setting."""
+    high = np.asarray(high, dtype=float); low = np.asarray(low, dtype=float)
+    atr = wilder_atr(high, low, close, period)
+    hl2 = (high + low) / 2
+    return supertrend_kernel(close, hl2 + multiplier * atr, hl2 - multiplier * atr)
+
+
+def supertrend_batch(high, low, close,
+                     params: Iterable[Tuple[int, float]] = ((10, 3),)) -> Dict[str, np.ndarray]:
+    """Supertrend for many series and (period, multiplier) settings in one pass.
+
+    `high`/`low`/`close` are 1-D (one series) or 2-D (series, time) of equal
+    length.  ATR is computed once per distinct period, then every
+    series x setting row is ratcheted together.  Returns "line" and
+    "direction" arrays shaped (series, settings, time) plus the "params" used.
+    """
+    high = np.atleast_2d(np.asarray(high, dtype=float))
+    low = np.atleast_2d(np.asarray(low, dtype=float))
+    close = np.atleast_2d(np.asarray(close, dtype=float))
+    params = [(int(p), float(m)) for p, m in params]
+    n_series, n = close.shape
+
+    atr_by_period = {p: wilder_atr(high, low, close, p) for p in sorted({p for p, _ in params})}
+    hl2 = (high + low) / 2
+    upper = np.empty((n_series, len(params), n)); lower = np.empty_like(upper)
+    for j, (p, m) in enumerate(params):
+        upper[:, j] = hl2 + m * atr_by_period[p]
+        lower[:, j] = hl2 - m * atr_by_period[p]
+
+    rows = n_series * len(params)
+    line, direction = supertrend_kernel(np.repeat(close, len(params), axis=0),
+                                        upper.reshape(rows, n), lower.reshape(rows, n))
+    return {"line": line.reshape(n_series, len(params), n),
+            "direction": direction.reshape(n_series, len(params), n),
+            "params": np.asarray(params)}
+
@@ -0,0 +1,290 @@
+# indicator_engine.py — incremental indicator state for main_bot_loop (no API calls)
+#
+# Every indicator keeps just enough running state to advance by one closed
+# candle in O(1).  The still-forming candle is evaluated with `preview`, which
+# reads the committed state without changing it, so re-polling the same candle
+# any number of times costs one step per indicator.
+#
+# The recurrences reproduce the batch helpers in main.py step for step:
+#   EMA        -> calculate_ema      (ewm span=period, adjust=False)
+#   SMA        -> calculate_sma      (rolling mean)
+#   RSI        -> ta RSIIndicator    (Wilder, ewm alpha=1/n, adjust=False)
+#   ATR        -> ta AverageTrueRange
+#   ADX        -> calculate_adx      (SMA true range, ewm alpha=1/n, adjust=True)
+#   Supertrend -> calculate_supertrend (ta ATR bands with the same ratchet)
+# `sync` keeps the state rebased onto the kline window it is given, so the
+# values equal the batch helpers run over that window, as the loop computed
+# them before.  EMA200 in particular still carries ~14% of its weight on the
+# window's first candle after 200 rows, so continuing the state over the whole
+# history seen would drift with uptime.  While the window only grows the new
+# candles are pushed in O(1); once it slides (a new candle closed and the
+# oldest dropped out) the closed rows are replayed once, and every poll of the
+# forming candle in between is a single `preview`.
+import math
+from collections import deque
+from typing import Dict, Any, Optional, Sequence
+
+NAN = float("nan")
+
+
+class _Ewm:
+    """pandas `Series.ewm(alpha=..., adjust=...).mean()` as a running state."""
+    __slots__ = ("alpha", "adjust", "min_periods", "weighted", "old_wt", "nobs")
+
+    def __init__(self, alpha: float, adjust: bool, min_periods: int = 1):
+        self.alpha = alpha; self.adjust = adjust; self.min_periods = max(min_periods, 1)
+        self.weighted = NAN; self.old_wt = 1.0; self.nobs = 0
+
+    def _next(self, x: float):
+        weighted, old_wt, nobs = self.weighted, self.old_wt, self.nobs
+        is_obs = x == x
+        nobs += is_obs
+        if weighted == weighted:
+            old_wt *= 1.0 - self.alpha
+            if is_obs:
+                new_wt = 1.0 if self.adjust else self.alpha
+                if weighted != x:
+                    weighted = (old_wt * weighted + new_wt * x) / (old_wt + new_wt)
+                old_wt = old_wt + new_wt if self.adjust else 1.0
+        elif is_obs:
+            weighted = x
+        return weighted, old_wt, nobs
+
+    def update(self, x: float) -> float:
+        self.weighted, self.old_wt, self.nobs = self._next(x)
+        return self.weighted if self.nobs >= self.min_periods else NAN
+
+    def peek(self, x: float) -> float:
+        weighted, _, nobs = self._next(x)
+        return weighted if nobs >= self.min_periods else NAN
+
+
+class _Sma:
+    """Rolling mean over the last `period` values."""
+    __slots__ = ("period", "window")
+
+    def __init__(self, period: int):
+        self.period = period; self.window = deque(maxlen=period)
+
+    def update(self, x: float) -> float:
+        self.window.append(x)
+        return math.fsum(self.window) / self.period if len(self.window) == self.period else NAN
+
+    def peek(self, x: float) -> float:
+        if len(self.window) + 1 < self.period:
+            return NAN
+        vals = list(self.window)[1 - self.period:] if self.period > 1 else []
+        return math.fsum(vals + [x]) / self.period
+
+
+class _WilderAtr:
+    """ta AverageTrueRange: mean of the first `window` true ranges, then Wilder smoothing."""
+    __slots__ = ("window", "seed", "atr", "n")
+
+    def __init__(self, window: int):
+        self.window = window; self.seed = []; self.atr = 0.0; self.n = 0
+
+    def _next(self, tr: float):
+        n = self.n + 1
+        if n < self.window:
+            return self.seed + [tr], 0.0, n
+        if n == self.window:
+            vals = self.seed + [tr]
+            return [], math.fsum(vals) / self.window, n
+        return self.seed, (self.atr * (self.window - 1) + tr) / float(self.window), n
+
+    def update(self, tr: float) -> float:
+        self.seed, self.atr, self.n = self._next(tr)
+        return self.atr
+
+    def peek(self, tr: float) -> float:
+        return self._next(tr)[1]
+
+
+def _div(a: float, b: float) -> float:
+    """a / b with numpy semantics (inf or NaN instead of ZeroDivisionError)."""
+    if b == 0:
+        return NAN if a == 0 or a != a else math.copysign(math.inf, a)
+    return a / b
+
+
+def _true_range(high: float, low: float, prev_close: Optional[float]) -> float:
+    if prev_close is None:
+        return high - low
+    return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+
+class IndicatorEngine:
+    """Running EMA/SMA/RSI/ATR/ADX/Supertrend state for one symbol and interval.
+
+    `push` commits a closed candle, `preview` evaluates the forming candle and
+    `sync` does both from a kline window, replaying only candles it has not
+    committed yet.  Values that the batch helpers would not produce yet (too
+    little history) are NaN, except ATR which follows ta and reads 0.0.
+    """
+
+    def __init__(self, atr_period: int = 14, rsi_period: int = 14, adx_period: int = 14,
+                 supertrend_period: int = 10, supertrend_multiplier: float = 3,
+                 ema_periods: Sequence[int] = (20, 50, 200), sma_periods: Sequence[int] = (3, 5, 7, 10, 14),
+                 range_lookback: int = 20):
+        self.atr_period = atr_period; self.rsi_period = rsi_period; self.adx_period = adx_period
+        self.supertrend_period = supertrend_period; self.supertrend_multiplier = supertrend_multiplier
+        self.ema_periods = tuple(ema_periods); self.sma_periods = tuple(sma_periods)
+        self.range_lookback = range_lookback
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.first_timestamp = self.last_timestamp = None
+        self.prev_high = self.prev_low = self.prev_close = None
+        self._ema = {p: _Ewm(2.0 / (p + 1), adjust=False) for p in self.ema_periods}
+        self._sma = {p: _Sma(p) for p in self.sma_periods}
+        self._rsi_up = _Ewm(1.0 / self.rsi_period, adjust=False, min_periods=self.rsi_period)
+        self._rsi_dn = _Ewm(1.0 / self.rsi_period, adjust=False, min_periods=self.rsi_period)
+        self._atr = _WilderAtr(self.atr_period)
+        self._adx_tr = _Sma(self.adx_period)
+        self._plus_dm = _Ewm(1.0 / self.adx_period, adjust=True)
+        self._minus_dm = _Ewm(1.0 / self.adx_period, adjust=True)
+        self._dx = _Ewm(1.0 / self.adx_period, adjust=True)
+        self._st_atr = _WilderAtr(self.supertrend_period)
+        self._st_upper = self._st_lower = None
+        self._st_dir = 1.0
+        self._closes = deque(maxlen=max(self.range_lookback - 1, 1))
+        self.last: Dict[str, Any] = {}
+
+    # ---- one step over every indicator ----
+    def _step(self, high: float, low: float, close: float, commit: bool) -> Dict[str, Any]:
+        op = "update" if commit else "peek"
+        n = self.count + 1
+        prev_close = self.prev_close
+        out: Dict[str, Any] = {"price": close, "count": n}
+
+        for p, ema in self._ema.items():
+            v = getattr(ema, op)(close)
+            out[f"ema{p}"] = v if n >= p else NAN
+        for p, sma in self._sma.items():
+            out[f"sma{p}"] = getattr(sma, op)(close)
+
+        # RSI (ta): the first diff is NaN and counts as a zero move
+        diff = close - prev_close if prev_close is not None else NAN
+        up = diff if diff > 0 else 0.0
+        dn = -diff if diff < 0 else 0.0
+        emaup = getattr(self._rsi_up, op)(up); emadn = getattr(self._rsi_dn, op)(dn)
+        if emadn == 0:
+            out["rsi"] = 100.0
+        elif emaup != emaup or emadn != emadn:
+            out["rsi"] = NAN
+        else:
+            out["rsi"] = 100 - (100 / (1 + emaup / emadn))
+
+        tr = _true_range(high, low, prev_close)
+        out["atr"] = getattr(self._atr, op)(tr)
+
+        # ADX (calculate_adx): DMs are clipped independently, ATR is a plain SMA
+        if self.prev_high is None:
+            plus_dm = minus_dm = NAN
+        else:
+            plus_dm = max(high - self.prev_high, 0.0)
+            minus_dm = max(self.prev_low - low, 0.0)
+        adx_atr = getattr(self._adx_tr, op)(tr)
+        plus_di = 100 * _div(getattr(self._plus_dm, op)(plus_dm), adx_atr)
+        minus_di = 100 * _div(getattr(self._minus_dm, op)(minus_dm), adx_atr)
+        dx = _div(abs(plus_di - minus_di), plus_di + minus_di) * 100
+        adx = getattr(self._dx, op)(dx)
+        out["adx"] = adx if n >= self.adx_period * 2 else NAN
+
+        # Supertrend (calculate_supertrend): ta ATR bands, ratchet only while the trend holds
+        st_atr = getattr(self._st_atr, op)(tr)
+        hl2 = (high + low) / 2
+        upper = hl2 + self.supertrend_multiplier * st_atr
+        lower = hl2 - self.supertrend_multiplier * st_atr
+        direction = self._st_dir
+        if self._st_upper is not None:
+            if close > self._st_upper:
+                direction = 1.0
+            elif close < self._st_lower:
+                direction = -1.0
+            else:
+                if direction == 1 and lower < self._st_lower:
+                    lower = self._st_lower
+                if direction == -1 and upper > self._st_upper:
+                    upper = self._st_upper
+        if n >= self.supertrend_period * 2:
+            out["supertrend"] = lower if direction == 1 else upper
+            out["supertrend_dir"] = direction
+        else:
+            out["supertrend"] = out["supertrend_dir"] = NAN
+
+        # price_range_percent over the last `range_lookback` closes
+        if n >= self.range_lookback:
+            recent = list(self._closes)[-(self.range_lookback - 1):] + [close] if self.range_lookback > 1 else [close]
+            lowest = min(recent)
+            out["range"] = (max(recent) - lowest) / lowest * 100
+        else:
+            out["range"] = 0.0
+
+        out["prev_close"] = prev_close if prev_close is not None else NAN
+        out["rsi_prev"] = self.last.get("rsi", NAN)
+
+        if commit:
+            self.count = n
+            self.prev_high, self.prev_low, self.prev_close = high, low, close
+            self._st_upper, self._st_lower, self._st_dir = upper, lower, direction
+            self._closes.append(close)
+            self.last = out
+        return out
+
+    def push(self, high: float, low: float, close: float, timestamp: Optional[float] = None) -> Dict[str, Any]:
+        """Commit a closed candle and return its indicator values."""
+        out = self._step(float(high), float(low), float(close), commit=True)
+        if self.count == 1:
+            self.first_timestamp = timestamp
+        self.last_timestamp = timestamp
+        return out
+
+    def preview(self, high: float, low: float, close: float) -> Dict[str, Any]:
+        """Indicator values if the forming candle closed at `close`; state is untouched."""
+        return self._step(float(high), float(low), float(close), commit=False)
+
+    def seed(self, timestamps, high, low, close):
+        """Reset and replay a block of closed candles."""
+        self.reset()
+        for i in range(len(close)):
+            self.push(high[i], low[i], close[i], timestamps[i] if timestamps is not None else None)
+
+    def sync(self, timestamps, high, low, close) -> Dict[str, Any]:
+        """Bring the state up to a kline window and preview its last (forming) candle.
+
+        All rows but the last are treated as closed.  The committed state always
+        starts at the window's first row: while it does, rows already committed
+        are skipped by timestamp; if the window has slid past that row (or there
+        is a gap, missing timestamps, or no state yet) the closed rows are replayed.
+        """
+        n = len(close)
+        if n == 0:
+            return {}
+        closed = n - 1
+        start = self._resume_index(timestamps, closed)
+        if start is None:
+            self.seed(timestamps, high[:closed], low[:closed], close[:closed])
+        else:
+            for i in range(start, closed):
+                self.push(high[i], low[i], close[i], timestamps[i])
+        return self.preview(high[-1], low[-1], close[-1])
+
+    def _resume_index(self, timestamps, closed: int) -> Optional[int]:
+        last = self.last_timestamp
+        if timestamps is None or last is None or last != last or closed == 0:
+            return None
+        if timestamps[0] != self.first_timestamp:
+            return None
+        # Newest first: a poll between closes usually adds zero or one candle
+        for i in range(closed - 1, -1, -1):
+            ts = timestamps[i]
+            if ts != ts:
+                return None
+            if ts == last:
+                return i + 1
+            if ts < last:
+                return None
+        return None
@@ -0,0 +1,157 @@
+# kline_store.py — fixed-capacity columnar kline buffer with incremental refresh
+#
+# Candles live in preallocated float64 columns.  The ring is mirrored (every
+# slot is written at i and i+capacity) so the newest N candles are always one
+# contiguous slice: indicators get zero-copy NumPy views with no wrap-around
+# handling.  After the first load only candles from the last stored open time
+# onwards are requested; the forming candle is updated in place.
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+_COL = {name: i for i, name in enumerate(COLUMNS)}
+
+_INTERVAL_UNITS_MS = {"m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 604_800_000}
+
+
+def interval_to_ms(interval: str) -> int:
+    """'15m' -> 900000, '1h' -> 3600000, '1d' -> 86400000."""
+    return int(interval[:-1]) * _INTERVAL_UNITS_MS[interval[-1]]
+
+
+def parse_kline_rows(data) -> List[Tuple[float, ...]]:
+    """Exchange kline payload -> ascending (timestamp, open, high, low, close, volume) tuples.
+
+    Accepts BingX dict rows ({"time", "open", ...}) or positional lists.
+    """
+    rows = []
+    for item in data or []:
+        if isinstance(item, dict):
+            ts = item.get("time", item.get("timestamp"))
+            rows.append((float(ts), float(item["open"]), float(item["high"]), float(item["low"]),
+                         float(item["close"]), float(item.get("volume", 0.0))))
+        else:
+            rows.append(tuple(float(v) for v in item[:6]))
+    rows.sort(key=lambda r: r[0])
+    return rows
+
+
+class KlineStore:
+    """Per symbol/interval ring buffer of OHLCV candles; the last candle may still be forming."""
+
+    def __init__(self, symbol: str, interval: str, capacity: int = 1000):
+        self.symbol = symbol
+        self.interval = interval
+        self.interval_ms = interval_to_ms(interval)
+        self.capacity = capacity
+        self._buf = np.zeros((len(COLUMNS), 2 * capacity))
+        self._head = 0          # next slot to write
+        self.size = 0
+        self.gaps: List[Tuple[float, float]] = []   # (last_ts, next_ts) holes the exchange could not fill
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def last_timestamp(self) -> Optional[float]:
+        return float(self._buf[0, self._head - 1 + self.capacity]) if self.size else None
+
+    def clear(self):
+        self._head = 0; self.size = 0; self.gaps.clear()
+
+    def _write(self, slot: int, row: Sequence[float]):
+        self._buf[:, slot] = row
+        self._buf[:, slot + self.capacity] = row
+
+    def append(self, row: Sequence[float]):
+        self._write(self._head, row)
+        self._head = (self._head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def update_last(self, row: Sequence[float]):
+        """Overwrite the newest candle (the one still forming)."""
+        self._write((self._head - 1) % self.capacity, row)
+
+    def merge(self, rows: Sequence[Sequence[float]]) -> int:
+        """Merge ascending rows: same open time updates in place, newer appends, older is ignored.
+
+        Returns the number of appended candles.  Holes between the stored
+        tail and a newer row are recorded in `gaps`.
+        """
+        appended = 0
+        for row in rows:
+            last = self.last_timestamp
+            ts = row[0]
+            if last is None or ts > last:
+                if last is not None and ts - last > self.interval_ms:
+                    self.gaps.append((last, ts))
+                self.append(row); appended += 1
+            elif ts == last:
+                self.update_last(row)
+        return appended
+
+    def view(self, n: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Zero-copy column views of the newest `n` candles (all stored candles by default)."""
+        n = self.size if n is None else min(n, self.size)
+        end = self._head + self.capacity
+        return {name: self._buf[i, end - n:end] for i, name in enumerate(COLUMNS)}
+
+    def column(self, name: str, n: Optional[int] = None) -> np.ndarray:
+        n = self.size if n is None else min(n, self.size)
+        end = self._head + self.capacity
+        return self._buf[_COL[name], end - n:end]
+
+    def to_frame(self, n: Optional[int] = None):
+        """pandas DataFrame of the newest `n` candles for callers that still want one."""
+        import pandas as pd
+        return pd.DataFrame({k: v.copy() for k, v in self.view(n).items()})
+
+
+Fetcher = Callable[..., Optional[List[Tuple[float, ...]]]]
+
+
+def sync_klines(store: KlineStore, fetch: Fetcher, initial_limit: int = 200, page_limit: int = 100) -> bool:
+    """Refresh `store` through `fetch(limit, start_time=None, end_time=None)`.
+
+    `fetch` returns parsed rows (see parse_kline_rows) or None on failure.
+    An empty store (or one left too far behind to catch up) is reloaded with
+    `initial_limit` candles.  Otherwise candles are requested from the stored
+    forming candle onwards, paging until caught up, and any hole between two
+    consecutive candles is backfilled with a bounded range request.
+    """
+    if store.size:
+        for _ in range(store.capacity // page_limit + 1):
+            rows = fetch(page_limit, start_time=store.last_timestamp)
+            if rows is None:
+                return False
+            rows = _fill_holes(store, fetch, rows, page_limit)
+            if rows is None:
+                return False
+            store.merge(rows)
+            if len(rows) < page_limit:
+                return True
+        # too far behind to page through the gap: start over
+
+    rows = fetch(initial_limit)
+    if not rows:
+        return False
+    store.clear()
+    store.merge(rows)
+    return True
+
+
+def _fill_holes(store: KlineStore, fetch: Fetcher, rows, page_limit: int):
+    """Insert candles missing between the store tail and `rows`, or inside `rows`."""
+    step = store.interval_ms
+    prev = store.last_timestamp
+    out = []
+    for row in rows:
+        if prev is not None and row[0] - prev > step:
+            missing = fetch(min(int((row[0] - prev) / step) - 1, page_limit),
+                            start_time=prev + step, end_time=row[0] - 1)
+            if missing is None:
+                return None
+            out.extend(r for r in missing if prev < r[0] < row[0])
+        out.append(row)
+        prev = row[0]
+    return out
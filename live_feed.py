@@ -0,0 +1,134 @@
+# live_feed.py — Server-Sent Events fan-out of published TradingState (no API calls)
+#
+# One broadcaster thread waits for new state versions, coalesces them to at
+# most `max_rate` updates per second and serializes each update once: the
+# changed fields plus any new trade_log entries.  Every connected browser
+# owns a bounded queue of those pre-encoded frames.  A client that falls
+# behind does not stall anyone: its backlog is dropped and it is sent one
+# full-state frame instead, so it resynchronises on the next update.
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, Optional
+
+from trading_state import StatePublisher, TradingState
+
+SKIP_FIELDS = ("version", "published_at", "trade_log")
+
+
+def sse_frame(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> bytes:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+def full_payload(s: TradingState) -> Dict[str, Any]:
+    return s.as_dict()
+
+
+def delta_payload(old: TradingState, new: TradingState) -> Dict[str, Any]:
+    """Changed scalar fields plus trades logged since `old` (newest first, like trade_log)."""
+    out = {name: getattr(new, name) for name in TradingState.__slots__
+           if name not in SKIP_FIELDS and getattr(old, name) != getattr(new, name)}
+    new_trades = new.total_trades - old.total_trades
+    if new_trades > 0:
+        out["trades"] = [dict(t) for t in new.trade_log[:new_trades]]
+    out["version"] = new.version
+    return out
+
+
+class FeedClient:
+    """One connected browser: a bounded queue of encoded frames."""
+
+    def __init__(self, queue_size: int):
+        self.frames = deque()
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.wakeup = threading.Event()
+        self.lock = threading.Lock()
+
+    def offer(self, frame: bytes, full_frame) -> None:
+        with self.lock:
+            if len(self.frames) >= self.queue_size:
+                self.dropped += len(self.frames)
+                self.frames.clear()
+                frame = full_frame()            # deltas were lost: resync with the whole state
+            self.frames.append(frame)
+        self.wakeup.set()
+
+    def take(self, timeout: float) -> Optional[bytes]:
+        if not self.wakeup.wait(timeout):
+            return None
+        with self.lock:
+            frame = self.frames.popleft() if self.frames else None
+            if not self.frames:
+                self.wakeup.clear()
+        return frame
+
+
+class EventBroadcaster:
+    """Pushes coalesced state deltas from a StatePublisher to every subscribed client."""
+
+    def __init__(self, publisher: StatePublisher, max_rate: float = 2.0, queue_size: int = 16,
+                 heartbeat: float = 15.0):
+        self.publisher = publisher
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self._clients = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.frames_encoded = 0
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sse-broadcast", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        sent = self.publisher.snapshot()
+        while True:
+            latest = self.publisher.wait_newer(sent.version, timeout=self.heartbeat)
+            if latest.version == sent.version:
+                continue
+            time.sleep(self.min_interval)           # let a burst of publishes collapse into one frame
+            latest = self.publisher.snapshot()
+            self.broadcast(sent, latest)
+            sent = latest
+
+    def broadcast(self, old: TradingState, new: TradingState):
+        with self._lock:
+            clients = list(self._clients)
+        if not clients:
+            return
+        frame = sse_frame("delta", delta_payload(old, new), new.version)
+        self.frames_encoded += 1
+        full = []
+
+        def full_frame():                           # encoded at most once per update, only if needed
+            if not full:
+                full.append(sse_frame("state", full_payload(new), new.version))
+                self.frames_encoded += 1
+            return full[0]
+
+        for client in clients:
+            client.offer(frame, full_frame)
+
+    def stream(self) -> Iterator[bytes]:
+        """Generator for one HTTP response: full state first, then deltas and heartbeats."""
+        client = FeedClient(self.queue_size)
+        with self._lock:
+            self._clients.add(client)
+        try:
+            s = self.publisher.snapshot()
+            yield b"retry: 3000\n\n" + sse_frame("state", full_payload(s), s.version)
+            while True:
+                frame = client.take(self.heartbeat)
+                yield frame if frame is not None else b": ping\n\n"
+        finally:
+            with self._lock:
+                self._clients.discard(client)
@@ -1,26 +1,68 @@
 import time
-import requests
-import hmac
-import hashlib
 import json
 import os
-import pandas as pd
+from datetime import datetime, timezone
 import numpy as np
-from flask import Flask, render_template_string
 from threading import Thread
 from collections import deque
 from urllib.parse import urlencode
-from ta.momentum import RSIIndicator
-from ta.volatility import AverageTrueRange
+from indicator_engine import IndicatorEngine
+from indicator_arrays import supertrend as supertrend_arrays
+from clock import SystemClock
+from kline_store import KlineStore, parse_kline_rows, sync_klines
+from timeframes import MultiTimeframe
+from market_stream import MarketStream
+from exchange_client import BalanceCache, ExchangeClient, RequestScheduler
+from execution import OrderExecutor, order_payload, fill_price, fill_quantity, tp_sl_prices, exit_reason, realized_profit
+from strategy_upgrade import StrategyUpgrade, Params, Guard
+from order_lifecycle import PositionLifecycle, PENDING, FILLED, PROTECTED, CLOSING, CLOSED
+from trading_state import TradingState, StatePublisher
+from live_feed import EventBroadcaster
+from metrics import Registry, CONTENT_TYPE as METRICS_CONTENT_TYPE, FAST_BUCKETS
+from profiler import StageTimer, ProfileCapture
+from trade_journal import TradeJournal
+from warm_start import load_snapshot, save_snapshot, snapshot_path
 
-# Terminal coloring
+# Terminal coloring (plain text if termcolor is missing; install it from requirements.txt)
 try:
     from termcolor import colored
-except:
-    os.system("pip install termcolor")
-    from termcolor import colored
+except ImportError:
+    def colored(text, color=None, on_color=None, attrs=None):
+        return text
+
+# Flask and requests are imported on first use (dashboard_app(), ExchangeClient.session), so
+# paper runs, backtests and tools importing main do not pay for them at start-up
+ROUTES = []
+
+def route(rule, **options):
+    """Register a dashboard view; dashboard_app() adds them to the Flask app when it is built."""
+    def register(view):
+        ROUTES.append((rule, view, options))
+        return view
+    return register
+
+def dashboard_app():
+    """The dashboard's Flask app (`main.app`), built with its routes and template on first use.
+
+    Also binds the module globals the views use (Response, jsonify, request).
+    """
+    global _app, dashboard_template, Response, jsonify, request
+    if _app is None:
+        from flask import Flask, Response, jsonify, request
+        flask_app = Flask(__name__)
+        for rule, view, options in ROUTES:
+            flask_app.add_url_rule(rule, view_func=view, **options)
+        # Compiled once; rendered pages and state JSON are cached per published state version
+        dashboard_template = flask_app.jinja_env.from_string(DASHBOARD_TEMPLATE)
+        _app = flask_app
+    return _app
+
+def __getattr__(name):
+    if name == "app":
+        return dashboard_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-app = Flask(__name__)
+_app = None
 
 # ===== Trade tracking variables =====
 total_trades = 0
@@ -38,9 +80,7 @@ last_trade_time = 0
 def log_status(title, value, color="white"):
     print(colored(f"{title:<25}: {value}", color))
 
-@app.route('/')
-def dashboard():
-    return render_template_string('''
+DASHBOARD_TEMPLATE = '''
     <!DOCTYPE html>
     <html>
     <head>
@@ -203,11 +243,11 @@ def dashboard():
                     <div class="card-title">📈 Market Conditions</div>
                     <div class="card-content">
                         {% if current_price and ema_200 %}
-                            <p>Current Price: {{ current_price|round(5) }} USDT</p>
-                            <p>EMA 200: {{ ema_200|round(5) }}</p>
+                            <p>Current Price: <span data-field="current_price" data-digits="5">{{ current_price|round(5) }}</span> USDT</p>
+                            <p>EMA 200: <span data-field="ema_200" data-digits="5">{{ ema_200|round(5) }}</span></p>
                             <p>Position: {{ "Above EMA200" if current_price > ema_200 else "Below EMA200" }}</p>
-                            <p>RSI: {{ rsi|round(2) }} - {{ "Overbought" if rsi > 70 else "Oversold" if rsi < 30 else "Neutral" }}</p>
-                            <p>ADX: {{ adx|round(2) }} - {{ "Strong Trend" if adx > 25 else "Weak Trend" }}</p>
+                            <p>RSI: <span data-field="rsi" data-digits="2">{{ rsi|round(2) }}</span> - {{ "Overbought" if rsi > 70 else "Oversold" if rsi < 30 else "Neutral" }}</p>
+                            <p>ADX: <span data-field="adx" data-digits="2">{{ adx|round(2) }}</span> - {{ "Strong Trend" if adx > 25 else "Weak Trend" }}</p>
                         {% else %}
                             <p>Loading market data...</p>
                         {% endif %}
@@ -222,12 +262,12 @@ def dashboard():
                             <p>Position: {{ position_side }} @ {{ position_entry|round(5) }}</p>
                             <p>TP Target: {{ position_tp|round(5) }}</p>
                             <p>SL Target: {{ position_sl|round(5) }}</p>
-                            <p>Current PnL: {{ position_pnl|round(4) }} USDT</p>
+                            <p>Current PnL: <span data-field="pnl" data-digits="4">{{ position_pnl|round(4) }}</span> USDT</p>
                         {% else %}
                             <p>🔴 NO ACTIVE POSITION</p>
                             <p>Waiting for trading signals...</p>
                         {% endif %}
-                        <p>Last Update: {{ update_time }}</p>
+                        <p>Last Update: <span data-field="update_time">{{ update_time }}</span></p>
                     </div>
                 </div>
             </div>
@@ -261,31 +301,166 @@ def dashboard():
                 </div>
             </div>
         </div>
+        <script>
+            // Live values: pushed deltas over SSE, or polling where EventSource is missing.
+            const shown = {{ state_key|tojson }};
+            let state = {}, version = -1;
+            function render() {
+                if (`${state.position_open}|${state.total_trades}` !== shown) { location.reload(); return; }
+                document.querySelectorAll("[data-field]").forEach(el => {
+                    const v = state[el.dataset.field];
+                    el.textContent = el.dataset.digits ? Number(v).toFixed(+el.dataset.digits) : v;
+                });
+            }
+            if (window.EventSource) {
+                const feed = new EventSource("/api/stream");
+                feed.addEventListener("state", e => { state = JSON.parse(e.data); version = state.version; render(); });
+                feed.addEventListener("delta", e => {
+                    const d = JSON.parse(e.data);
+                    if (d.version <= version) return;
+                    version = d.version; Object.assign(state, d); render();
+                });
+            } else {
+                setInterval(async () => {
+                    try {
+                        const r = await fetch("/api/state", {cache: "no-cache"});
+                        if (r.ok) { state = await r.json(); render(); }
+                    } catch (e) {}
+                }, 5000);
+            }
+        </script>
     </body>
     </html>
-    ''', 
-    symbol=SYMBOL.replace('-', '/'),
-    total_trades=total_trades,
-    successful_trades=successful_trades,
-    failed_trades=failed_trades,
-    compound_profit=compound_profit,
-    leverage=LEVERAGE,
-    risk_per_trade=TRADE_PORTION*100,
-    trade_log=trade_log,
-    position_open=position_open,
-    position_side=position_side,
-    position_entry=entry_price,
-    position_tp=tp_price,
-    position_sl=sl_price,
-    position_pnl=current_pnl,
-    current_price=current_price,
-    ema_200=ema_200_value,
-    rsi=rsi_value,
-    adx=adx_value,
-    update_time=update_time)
+    '''
+
+# Rendered pages and state JSON are cached per published state version
+_page_cache = (-1, b"")
+_state_cache = (-1, b"")
+# State versions restart at 0 on every boot; the nonce keeps a tag from before a restart from matching
+BOOT_ID = os.urandom(4).hex()
+
+def conditional(body, mimetype, s, kind):
+    """Response tagged with boot, representation and state version; revalidations of an unchanged state get a 304."""
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(f"{BOOT_ID}-{kind}-v{s.version}")
+    response.last_modified = datetime.fromtimestamp(s.published_at or time.time(), timezone.utc)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@route('/')
+def dashboard():
+    global _page_cache
+    s = trading_state.snapshot()  # one consistent view; the trading thread is never blocked
+    version, body = _page_cache
+    if version != s.version:
+        body = dashboard_template.render(
+            state_key=f"{'true' if s.position_open else 'false'}|{s.total_trades}",
+            symbol=SYMBOL.replace('-', '/'),
+            total_trades=s.total_trades,
+            successful_trades=s.successful_trades,
+            failed_trades=s.failed_trades,
+            compound_profit=s.compound_profit,
+            leverage=LEVERAGE,
+            risk_per_trade=TRADE_PORTION*100,
+            trade_log=s.trade_log,
+            position_open=s.position_open,
+            position_side=s.position_side,
+            position_entry=s.entry_price,
+            position_tp=s.tp_price,
+            position_sl=s.sl_price,
+            position_pnl=s.pnl,
+            current_price=s.current_price,
+            ema_200=s.ema_200,
+            rsi=s.rsi,
+            adx=s.adx,
+            update_time=s.update_time).encode()
+        _page_cache = (s.version, body)
+    return conditional(body, "text/html", s, "html")
+
+@route('/api/state')
+def api_state():
+    global _state_cache
+    s = trading_state.snapshot()
+    version, body = _state_cache
+    if version != s.version:
+        body = json.dumps(s.as_dict(), separators=(",", ":")).encode()
+        _state_cache = (s.version, body)
+    return conditional(body, "application/json", s, "json")
+
+@route('/api/trades')
+def api_trades():
+    """Closed trades newest first: ?limit=50&before=<next_before of the previous page>&symbol=..."""
+    try:
+        before = request.args.get("before")
+        page = journal.history(request.args.get("symbol") or None, int(request.args.get("limit", 50)),
+                               int(before) if before else None)
+    except ValueError:
+        return jsonify({"error": "limit and before must be integers"}), 400
+    return jsonify(page)
+
+@route('/api/stream')
+def api_stream():
+    live_feed.start()
+    return Response(live_feed.stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@route('/debug/stages')
+def debug_stages():
+    return jsonify(stage_timer.summary())
+
+@route('/debug/profile', methods=['GET', 'POST'])
+def debug_profile():
+    """GET: capture status.  POST ?iterations=N&mode=cprofile|sample&token=...: arm a capture of the next passes.
+
+    Arming slows the loop and writes files, so it is only available once
+    BOT_PROFILE_TOKEN is set; SIGUSR1 arms a capture without it.
+    """
+    if PROFILE_TOKEN and request.args.get("token") != PROFILE_TOKEN:
+        return jsonify({"error": "forbidden"}), 403
+    if request.method == "GET":
+        return jsonify({"armed": profile_capture.armed, "remaining": profile_capture.remaining,
+                        "last_path": profile_capture.last_path})
+    if not PROFILE_TOKEN:
+        return jsonify({"error": "set BOT_PROFILE_TOKEN to arm captures over HTTP"}), 403
+    try:
+        armed = profile_capture.arm(int(request.args.get("iterations", PROFILE_ITERATIONS)),
+                                    request.args.get("mode", "cprofile"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"armed": True, "iterations": armed, "directory": PROFILE_DIR})
+
+def install_profile_signal():
+    """SIGUSR1 arms a cProfile capture of the next PROFILE_ITERATIONS passes (main thread only)."""
+    import signal
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: profile_capture.arm(PROFILE_ITERATIONS))
+
+@route('/debug/scheduler')
+def debug_scheduler():
+    return jsonify(api_scheduler.stats())
+
+@route('/debug/timeframes')
+def debug_timeframes():
+    keys = ("timestamp", "trend", "price", "ema200", "rsi", "adx", "atr", "supertrend")
+    return jsonify({iv: {k: r.snapshot.get(k) for k in keys if r.snapshot.get(k) == r.snapshot.get(k)}
+                    for iv, r in timeframes.resamplers.items()})
+
+@route('/healthz')
+def healthz():
+    return "ok"
+
+@route('/symbols')
+def symbols_status():
+    if multi_runner is None:
+        return jsonify([])
+    return jsonify(multi_runner.status())
 
 def run_flask_app():
-    app.run(host="0.0.0.0", port=8080)
+    dashboard_app().run(host="0.0.0.0", port=8080)
 
 def start_dashboard():
     Thread(target=run_flask_app).start()
@@ -293,9 +468,17 @@ def start_dashboard():
 # ========== Trading Configuration ==========
 API_KEY = os.getenv("BINGX_API_KEY")
 API_SECRET = os.getenv("BINGX_API_SECRET")
-BASE_URL = "https://open-api.bingx.com"
+# Point at a local exchange_sim.py (e.g. http://127.0.0.1:8090) to run the whole order path offline
+BASE_URL = os.getenv("BINGX_BASE_URL", "https://open-api.bingx.com")
+
+# Streaming market data (pushed klines + mark price instead of polling)
+USE_STREAM = os.getenv("BINGX_STREAM", "0") == "1"
+STREAM_URL = os.getenv("BINGX_STREAM_URL", "wss://open-api-swap.bingx.com/swap-market")
 
-SYMBOL = "DOGE-USDT"
+# Several pairs in one process, e.g. BINGX_SYMBOLS=DOGE-USDT,XRP-USDT (see symbol_engine.py)
+SYMBOLS = [s.strip() for s in os.getenv("BINGX_SYMBOLS", "").split(",") if s.strip()]
+# A single BINGX_SYMBOLS entry is traded by the single-symbol loop
+SYMBOL = SYMBOLS[0] if len(SYMBOLS) == 1 else "DOGE-USDT"
 INTERVAL = "15m"
 LEVERAGE = 10
 TRADE_PORTION = 0.60
@@ -305,6 +488,45 @@ TOLERANCE = 0.0005
 # Risk management parameters
 MIN_ATR = 0.001
 MIN_TP_PERCENT = 0.75
+
+# Order execution
+FILL_CONFIRM_TIMEOUT = 2.0
+FILL_POLL_INTERVAL = 0.25
+CLOSE_RETRY_INTERVAL = 5.0  # seconds between closes of a position left unprotected by a failed bracket
+BALANCE_SETTLE_SECONDS = 10
+BALANCE_TTL = 300  # seconds a cached balance is trusted when no fill or close invalidated it
+
+# Market data
+KLINE_WINDOW = 200
+KLINE_CAPACITY = 1000
+# Higher timeframes resampled from the 15m buffer (no extra requests); BOT_REQUIRE_H1=1 turns on the 1h filter
+HIGHER_TIMEFRAMES = ("1h", "4h", "1d")
+REQUIRE_H1_ALIGNMENT = os.getenv("BOT_REQUIRE_H1", "0") == "1"
+# Kline buffer + indicator state saved per closed candle and reloaded on start ("" disables)
+WARM_START_DIR = os.getenv("BOT_WARM_START_DIR", "warm_start")
+
+# Optional self-ping for hosts that idle web services (e.g. a Replit URL)
+KEEP_ALIVE_URL = os.getenv("KEEP_ALIVE_URL")
+
+# Time source of the trading loop; paper_trade.py swaps in a VirtualClock (see use_clock)
+clock = SystemClock()
+
+# Dashboard live feed: at most SSE_MAX_RATE pushes/s, SSE_QUEUE_SIZE frames buffered per viewer
+SSE_MAX_RATE = float(os.getenv("SSE_MAX_RATE", "2"))
+SSE_QUEUE_SIZE = 16
+
+# Loop profiling: stage timers are always-on unless BOT_STAGE_TIMERS=0; captures are armed on demand
+STAGE_TIMERS = os.getenv("BOT_STAGE_TIMERS", "1") == "1"
+PROFILE_DIR = os.getenv("BOT_PROFILE_DIR", "profiles")
+PROFILE_TOKEN = os.getenv("BOT_PROFILE_TOKEN")
+PROFILE_ITERATIONS = 5
+
+# Durable trade history; point at a persistent disk so redeploys keep P&L and cooldown state
+JOURNAL_PATH = os.getenv("BOT_JOURNAL_PATH", "trades.db")
+
+# Exchange request budget shared by every symbol (requests per second, burst)
+API_RATE = 10.0
+API_BURST = 10
 # ===========================================
 
 # Trading state variables
@@ -325,115 +547,205 @@ update_time = ""
 # Compound profit variables
 initial_balance = 0.0
 
+# Shared keep-alive client for every exchange call; closes and TP/SL legs get request budget first
+api_scheduler = RequestScheduler(API_RATE, API_BURST)
+exchange = ExchangeClient(BASE_URL, API_KEY, API_SECRET, pool_size=max(10, 2 * len(SYMBOLS)),
+                          rate_limiter=api_scheduler)
+
+# Telemetry served at /metrics (Prometheus text format, see metrics.py)
+metrics = Registry()
+API_LATENCY = metrics.histogram("bot_api_request_seconds", "Exchange request latency per attempt", ("endpoint",))
+API_REQUESTS = metrics.counter("bot_api_requests", "Exchange request attempts by HTTP status or error", ("endpoint", "outcome"))
+API_CODES = metrics.counter("bot_api_response_codes", "Exchange response codes in JSON bodies", ("endpoint", "code"))
+LOOP_SECONDS = metrics.histogram("bot_loop_iteration_seconds", "main_bot_loop pass time, excluding the wait")
+API_QUEUE_SECONDS = metrics.histogram("bot_api_queue_seconds", "Time a request waited for rate-limit budget", ("priority",), buckets=FAST_BUCKETS)
+INDICATOR_SECONDS = metrics.histogram("bot_indicator_seconds", "Indicator update time per pass", buckets=FAST_BUCKETS)
+DECISION_REJECTIONS = metrics.counter("bot_decision_rejections", "Entry rejections by reason", ("reason",))
+ORDERS = metrics.counter("bot_orders", "Entry order outcomes", ("side", "outcome"))
+TRADES_CLOSED = metrics.counter("bot_trades_closed", "Closed positions by reason", ("result",))
+POSITION_OPEN = metrics.gauge("bot_position_open", "1 while a position is open")
+POSITION_PNL = metrics.gauge("bot_position_pnl_usdt", "Unrealized PnL of the open position")
+
+# Closed trades and fills, written off the trading thread (see trade_journal.py)
+journal = TradeJournal(JOURNAL_PATH)
+
+# Per-stage loop timings and on-demand profiles of the next N passes (see profiler.py)
+stage_timer = StageTimer(enabled=STAGE_TIMERS)
+profile_capture = ProfileCapture(PROFILE_DIR)
+
+def observe_api(endpoint, seconds, outcome, code):
+    API_LATENCY.labels(endpoint).observe(seconds)
+    API_REQUESTS.labels(endpoint, outcome).inc()
+    if code is not None:
+        API_CODES.labels(endpoint, code).inc()
+
+exchange.on_request = observe_api
+api_scheduler.on_wait = lambda priority, seconds: API_QUEUE_SECONDS.labels(priority).observe(seconds)
+
+# What readers (dashboard, API) see: the last state published by the trading thread
+trading_state = StatePublisher(TradingState(symbol=SYMBOL, published_at=time.time()))
+
+# Pushes coalesced state changes to dashboard viewers (see live_feed.py)
+live_feed = EventBroadcaster(trading_state, max_rate=SSE_MAX_RATE, queue_size=SSE_QUEUE_SIZE)
+
+# Engines of the multi-symbol mode; None when trading SYMBOL alone
+multi_runner = None
+
+# Order/position state machine of the current (or last) trade, see order_lifecycle.py
+position_lifecycle = None
+
+# Available margin, refetched on TTL, after fills/closes and right before an order is sent
+balance_cache = BalanceCache(exchange.usdt_balance, BALANCE_TTL, clock=lambda: clock.time())
+
+# Entry rules, built once (see strategy_upgrade.py)
+strategy = StrategyUpgrade(Params(require_h1_alignment=REQUIRE_H1_ALIGNMENT), Guard())
+
+# Running indicator state (updated per closed candle, see indicator_engine.py)
+indicators = IndicatorEngine(atr_period=ATR_PERIOD)
+
+# Local candle history, refreshed incrementally (see kline_store.py)
+kline_store = KlineStore(SYMBOL, INTERVAL, capacity=KLINE_CAPACITY)
+# 1h/4h/1d bars and indicators built from kline_store (see timeframes.py)
+timeframes = MultiTimeframe(SYMBOL, INTERVAL, HIGHER_TIMEFRAMES)
+warm_start_path = snapshot_path(WARM_START_DIR, SYMBOL, INTERVAL) if WARM_START_DIR else None
+warm_saved_timestamp = None
+
+# Push feed (see market_stream.py); None when polling
+market_stream = None
+stream_synced_generation = 0
+
+def publish_state():
+    """Publish the trading thread's current values as one immutable snapshot."""
+    lifecycle = position_lifecycle
+    POSITION_OPEN.set(1 if position_open else 0)
+    POSITION_PNL.set(current_pnl if position_open else 0.0)
+    return trading_state.publish(
+        position_open=position_open, position_side=position_side, entry_price=entry_price,
+        tp_price=tp_price, sl_price=sl_price, quantity=current_quantity, pnl=current_pnl,
+        current_price=current_price, ema_200=ema_200_value, rsi=rsi_value, adx=adx_value, atr=current_atr,
+        total_trades=total_trades, successful_trades=successful_trades, failed_trades=failed_trades,
+        compound_profit=compound_profit, trade_log=trade_log, update_time=update_time,
+        lifecycle_state=lifecycle.state if lifecycle is not None else None)
+
 def get_signature(params):
-    query_string = "&".join([f"{key}={value}" for key, value in params.items()])
-    return hmac.new(API_SECRET.encode(), query_string.encode(), hashlib.sha256).hexdigest()
+    return exchange.signature(params)
 
-def safe_api_request(method, endpoint, params=None, data=None):
-    try:
-        url = f"{BASE_URL}{endpoint}"
-        headers = {"X-BX-APIKEY": API_KEY}
-        timestamp = str(int(time.time() * 1000))
-        
-        if params is None:
-            params = {}
-        params["timestamp"] = timestamp
-        
-        params["signature"] = get_signature(params)
-        
-        if method == "GET":
-            response = requests.get(url, headers=headers, params=params)
-        elif method == "POST":
-            response = requests.post(url, headers=headers, params=params, json=data)
-        else:
-            return None
-        
-        if response.status_code != 200:
-            print(f"❌ API request failed with status {response.status_code}: {response.text}")
-            return None
-        
-        try:
-            return response.json()
-        except json.JSONDecodeError:
-            print(f"❌ Failed to parse JSON response: {response.text}")
-            return None
-    except Exception as e:
-        print(f"❌ API request failed: {e}")
-        return None
+def safe_api_request(method, endpoint, params=None, data=None, priority=None):
+    return exchange.request(method, endpoint, params=params, data=data, priority=priority)
+
+# Order requests for SYMBOL, shared with symbol_engine.py (see execution.py); they go
+# through safe_api_request, so swapping `exchange` (paper trading) swaps them too
+executor = OrderExecutor(SYMBOL, safe_api_request)
 
 def get_balance():
+    """Available USDT from the balance cache; only expired or invalidated values cost a request."""
     try:
-        timestamp = str(int(time.time() * 1000))
-        params = {"timestamp": timestamp}
-        signature = get_signature(params)
-        
-        url = f"{BASE_URL}/openApi/swap/v2/user/balance?timestamp={timestamp}&signature={signature}"
-        headers = {"X-BX-APIKEY": API_KEY}
-        
-        response = requests.get(url, headers=headers)
-        result = response.json()
-        
-        if isinstance(result, dict) and "code" in result and result["code"] == 0:
-            balance_data = result.get("data", {})
-            
-            if isinstance(balance_data.get("balance"), list):
-                for asset in balance_data["balance"]:
-                    if asset.get("asset") == "USDT":
-                        return float(asset.get("availableBalance", 0.0))
-            
-            elif isinstance(balance_data.get("balance"), dict):
-                asset = balance_data["balance"]
-                if asset.get("asset") == "USDT":
-                    return float(asset.get("availableMargin", 0.0))
-            
-            print("❌ USDT balance not found in response")
-        else:
-            print(f"❌ Balance request failed: {result.get('msg', 'Unknown error')}")
+        balance = balance_cache.get()
+        if balance is not None:
+            return balance
     except Exception as e:
         print(f"❌ Error fetching balance: {str(e)}")
     return 0.0
 
+def trade_budget(balance):
+    """Margin for the next entry: the compounding share of the account, capped by what is available."""
+    return min((initial_balance + compound_profit) * TRADE_PORTION, balance)
+
 def get_open_position():
     try:
-        params = {"symbol": SYMBOL}
-        response = safe_api_request("GET", "/openApi/swap/v2/user/positions", params)
-        
-        if response and isinstance(response, dict) and "data" in response:
-            for position in response["data"]:
-                if (isinstance(position, dict) and 
-                    "entryPrice" in position and 
-                    "positionAmt" in position and
-                    float(position.get("positionAmt", 0)) != 0):
-                    
-                    return {
-                        "side": "BUY" if float(position["positionAmt"]) > 0 else "SELL",
-                        "entryPrice": float(position["entryPrice"]),
-                        "positionAmt": abs(float(position["positionAmt"])),
-                        "unrealizedProfit": float(position.get("unrealizedProfit", 0))
-                    }
-        return None
+        return executor.open_position()
     except Exception as e:
         print(f"❌ Error in get_open_position: {e}")
         return None
 
-def get_klines():
+def fetch_klines(limit, start_time=None, end_time=None):
     try:
-        response = requests.get(
-            f"{BASE_URL}/openApi/swap/v2/quote/klines",
-            params={"symbol": SYMBOL, "interval": INTERVAL, "limit": 200}
-        )
-        if response.status_code == 200:
-            data = response.json().get("data", [])
-            if data:
-                df = pd.DataFrame(data, columns=["timestamp","open","high","low","close","volume"])
-                df[["open", "high", "low", "close"]] = df[["open", "high", "low", "close"]].astype(float)
-                return df
-        return pd.DataFrame()
+        params = {"symbol": SYMBOL, "interval": INTERVAL, "limit": limit}
+        if start_time is not None:
+            params["startTime"] = int(start_time)
+        if end_time is not None:
+            params["endTime"] = int(end_time)
+        response = exchange.request("GET", "/openApi/swap/v2/quote/klines", params=params, signed=False)
+        if response is None:
+            return None
+        return parse_kline_rows(response.get("data", []))
     except Exception as e:
         print(f"❌ Error fetching klines: {e}")
+        return None
+
+def apply_stream_klines():
+    """Merge pushed klines into the store; False if the push sequence skipped a candle."""
+    for row in market_stream.drain():
+        last = kline_store.last_timestamp
+        if last is not None and row[0] - last > kline_store.interval_ms:
+            print(f"⚠️ Stream gap after {int(last)} — resyncing klines over REST")
+            return False
+        kline_store.merge([row])
+    return True
+
+def get_candles():
+    """Refresh the kline store and return zero-copy views of the newest KLINE_WINDOW candles.
+
+    With a live stream the pushed klines are applied directly; REST is used on
+    start-up, after every reconnect and whenever the pushed sequence has a gap.
+    """
+    global stream_synced_generation
+    if (market_stream is not None and market_stream.live and kline_store.size
+            and market_stream.generation == stream_synced_generation):
+        if apply_stream_klines():
+            return kline_store.view(KLINE_WINDOW)
+    generation = market_stream.generation if market_stream is not None else 0
+    if not sync_klines(kline_store, fetch_klines, initial_limit=KLINE_WINDOW):
+        return None
+    if market_stream is not None:
+        market_stream.drain()  # everything queued so far is covered by the REST sync
+        stream_synced_generation = generation
+    return kline_store.view(KLINE_WINDOW)
+
+def start_market_stream():
+    global market_stream
+    if USE_STREAM and market_stream is None:
+        market_stream = MarketStream(STREAM_URL, SYMBOL, INTERVAL)
+        market_stream.start()
+        print(f"📡 Streaming market data from {STREAM_URL}")
+
+def wait_for_market(timeout):
+    """Wait until the next loop pass without going blind.
+
+    A pending entry order is advanced every FILL_POLL_INTERVAL.  In streaming
+    mode every pushed price re-checks TP/SL immediately, and a newly opened
+    candle ends the wait early so signals are evaluated on close.
+    """
+    global current_price
+    deadline = clock.time() + timeout
+    while True:
+        advance_orders()
+        remaining = deadline - clock.time()
+        if remaining <= 0:
+            return
+        step = min(remaining, FILL_POLL_INTERVAL) if entry_pending() else remaining
+        if market_stream is None or not market_stream.live:
+            clock.sleep(step)
+            continue
+        if not market_stream.wait(step):
+            continue
+        if position_open and market_stream.price:
+            current_price = market_stream.price
+            check_position_status()
+            if not position_open:
+                return
+        if market_stream.pop_candle_closed():
+            return
+
+def get_klines():
+    import pandas as pd
+    candles = get_candles()
+    if not candles or len(candles["close"]) == 0:
         return pd.DataFrame()
+    return pd.DataFrame({k: v.copy() for k, v in candles.items()})
 
 def calculate_adx(df, period=14):
+    import pandas as pd
     try:
         if len(df) < period * 2:
             return pd.Series()
@@ -465,11 +777,13 @@ def calculate_adx(df, period=14):
         return pd.Series()
 
 def calculate_sma(series, period):
+    import pandas as pd
     if len(series) < period:
         return pd.Series()
     return series.rolling(period).mean()
 
 def calculate_ema(series, period):
+    import pandas as pd
     if len(series) < period:
         return pd.Series()
     return series.ewm(span=period, adjust=False).mean()
@@ -483,126 +797,98 @@ def price_range_percent(df, lookback=20):
     return ((highest - lowest) / lowest) * 100
 
 def calculate_supertrend(df, period=10, multiplier=3):
+    import pandas as pd
     try:
         if len(df) < period * 2:
             return pd.Series(), pd.Series()
             
-        high = df["high"]
-        low = df["low"]
-        close = df["close"]
-        
-        hl2 = (high + low) / 2
-        atr_indicator = AverageTrueRange(high=high, low=low, close=close, window=period)
-        atr = atr_indicator.average_true_range()
-        
-        if atr.empty:
-            return pd.Series(), pd.Series()
-            
-        upper_band = hl2 + (multiplier * atr)
-        lower_band = hl2 - (multiplier * atr)
-        
-        supertrend = pd.Series(np.zeros(len(close)), index=close.index)
-        direction = pd.Series(np.ones(len(close)), index=close.index)
-        
-        for i in range(1, len(close)):
-            if close.iloc[i] > upper_band.iloc[i-1]:
-                direction.iloc[i] = 1
-            elif close.iloc[i] < lower_band.iloc[i-1]:
-                direction.iloc[i] = -1
-            else:
-                direction.iloc[i] = direction.iloc[i-1]
-                
-                if direction.iloc[i] == 1 and lower_band.iloc[i] < lower_band.iloc[i-1]:
-                    lower_band.iloc[i] = lower_band.iloc[i-1]
-                if direction.iloc[i] == -1 and upper_band.iloc[i] > upper_band.iloc[i-1]:
-                    upper_band.iloc[i] = upper_band.iloc[i-1]
-        
-        supertrend = np.where(direction == 1, lower_band, upper_band)
-        return pd.Series(supertrend, index=df.index), pd.Series(direction, index=df.index)
+        line, direction = supertrend_arrays(
+            df["high"].to_numpy(dtype=float),
+            df["low"].to_numpy(dtype=float),
+            df["close"].to_numpy(dtype=float),
+            period, multiplier
+        )
+        return pd.Series(line, index=df.index), pd.Series(direction, index=df.index)
     except Exception as e:
         print(f"❌ Error calculating Supertrend: {e}")
         return pd.Series(), pd.Series()
 
+def restore_warm_start():
+    """Load the last saved kline window and indicator state so the first sync only fetches the gap."""
+    global warm_saved_timestamp
+    if warm_start_path and load_snapshot(warm_start_path, kline_store, indicators):
+        warm_saved_timestamp = indicators.last_timestamp
+        print(f"♨️ Warm start: {kline_store.size} candles and indicator state from {warm_start_path}")
+        return True
+    return False
+
+def save_warm_start():
+    """Snapshot the buffer once per newly closed candle."""
+    global warm_saved_timestamp
+    if warm_start_path and indicators.last_timestamp != warm_saved_timestamp:
+        if save_snapshot(warm_start_path, kline_store, indicators):
+            warm_saved_timestamp = indicators.last_timestamp
+
+def update_indicators(df):
+    """Advance the running indicators to `df` (DataFrame or kline store views) and return values for its last candle."""
+    started = time.perf_counter()
+    snapshot = indicators.sync(
+        np.asarray(df["timestamp"], dtype=float),
+        np.asarray(df["high"], dtype=float),
+        np.asarray(df["low"], dtype=float),
+        np.asarray(df["close"], dtype=float),
+    )
+    timeframes.update(kline_store.view())
+    INDICATOR_SECONDS.observe(time.perf_counter() - started)
+    return snapshot
+
+def use_clock(new_clock):
+    """Run the loop on another clock (clock.py), e.g. a VirtualClock for paper trading."""
+    global clock
+    clock = new_clock
+
+def clock_text():
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(clock.time()))
+
+def indicator_value(snapshot, key, default=0):
+    value = snapshot.get(key, default)
+    return default if value != value else value
+
 def calculate_tp_sl(entry_price, atr_value, direction):
-    if direction == "BUY":
-        tp = entry_price + atr_value * 1.2
-        sl = entry_price - atr_value * 0.8
-    else:
-        tp = entry_price - atr_value * 1.2
-        sl = entry_price + atr_value * 0.8
-    return round(tp, 5), round(sl, 5)
+    return tp_sl_prices(entry_price, atr_value, direction)
 
 def create_tp_sl_orders():
-    global position_open
-    
     if not position_open or current_quantity <= 0 or entry_price <= 0:
         print("⚠️ Skipping TP/SL creation — Missing data!")
         return False
     
-    # Wait 1 second to ensure order confirmation
-    time.sleep(1)
-    
-    if position_side == "BUY":
-        tp_side = "SELL"
-        sl_side = "SELL"
-    else:
-        tp_side = "BUY"
-        sl_side = "BUY"
-    
-    tp_params = {
-        "symbol": SYMBOL,
-        "side": tp_side,
-        "positionSide": "BOTH",
-        "type": "TAKE_PROFIT_MARKET",
-        "quantity": current_quantity,
-        "stopPrice": f"{tp_price:.5f}",
-        "workingType": "MARK_PRICE"
-    }
-    
-    sl_params = {
-        "symbol": SYMBOL,
-        "side": sl_side,
-        "positionSide": "BOTH",
-        "type": "STOP_MARKET",
-        "quantity": current_quantity,
-        "stopPrice": f"{sl_price:.5f}",
-        "workingType": "MARK_PRICE"
-    }
-    
     try:
-        # Place TP order
-        tp_response = safe_api_request("POST", "/openApi/swap/v2/trade/order", params=tp_params)
-        if tp_response and tp_response.get("code") == 0:
-            print(f"✅ TP order placed @ {tp_price:.5f}")
-        else:
-            print(f"❌ Failed to place TP order: {tp_response.get('msg') if tp_response else 'Unknown error'}")
-            close_position("NO_TP", current_price)
-            return False
-        
-        # Place SL order
-        sl_response = safe_api_request("POST", "/openApi/swap/v2/trade/order", params=sl_params)
-        if sl_response and sl_response.get("code") == 0:
-            print(f"✅ SL order placed @ {sl_price:.5f}")
-            return True
-        else:
-            print(f"❌ Failed to place SL order: {sl_response.get('msg') if sl_response else 'Unknown error'}")
-            close_position("NO_SL", current_price)
-            return False
+        # Both legs go out at once; if one is rejected the accepted one is cancelled first
+        failure = executor.bracket(position_side, current_quantity, tp_price, sl_price)
     except Exception as e:
         print(f"❌ Error creating TP/SL orders: {e}")
-        close_position("ERROR", current_price)
-        return False
+        failure = "ERROR"
+    if failure is None:
+        return True
+    close_position(failure, current_price)
+    if position_open and position_lifecycle is not None and position_lifecycle.active:
+        # The close was not confirmed: the position is open and unprotected, advance_orders retries it
+        print(f"⚠️ Close not confirmed — retrying every {CLOSE_RETRY_INTERVAL:.0f}s")
+        position_lifecycle.meta["close_reason"] = failure
+        position_lifecycle.transition(CLOSING, "protection failed", deadline=clock.time() + CLOSE_RETRY_INTERVAL)
+    return False
 
 def place_order(side, quantity):
-    global position_open, position_side, entry_price, current_quantity, tp_price, sl_price, last_trade_time
+    global position_lifecycle
     
-    current_time = time.time()
+    current_time = clock.time()
     if current_time - last_trade_time < COOLDOWN_PERIOD:
         remaining = COOLDOWN_PERIOD - (current_time - last_trade_time)
         print(f"⏳ Skipping duplicate signal (cooldown: {int(remaining)}s)")
+        ORDERS.labels(side, "skipped_cooldown").inc()
         return False
     
-    if position_open:
+    if position_open or entry_pending():
         print("🚫 Position already open - skipping new order")
         return False
     
@@ -621,58 +907,157 @@ def place_order(side, quantity):
         
         if tp_percent < MIN_TP_PERCENT:
             print(f"🚫 TP too small: {tp_percent:.3f}% — skipping trade")
+            ORDERS.labels(side, "skipped_tp").inc()
             return False
         
         if adx_value < 20:
             print("🚫 ADX too weak — skipping trade")
+            ORDERS.labels(side, "skipped_adx").inc()
             return False
         
-        params = {
-            "symbol": SYMBOL,
-            "side": side,
-            "positionSide": "BOTH",
-            "type": "MARKET",
-            "quantity": quantity
-        }
+        # The loop sized `quantity` from the cached balance; re-read it now that an order will be sent
+        # and shrink the order if less margin is free than the cache said (rounding down, so a
+        # budget capped by the free margin never asks for more than is free)
+        balance = balance_cache.refresh()
+        if balance is None:
+            print("❌ Balance unavailable — skipping trade")
+            ORDERS.labels(side, "skipped_balance").inc()
+            return False
+        quantity = min(quantity, float(np.floor(trade_budget(balance) * LEVERAGE / current_price * 100) / 100))
+        if quantity <= 0:
+            print("❌ No free margin for this trade — skipping")
+            ORDERS.labels(side, "skipped_balance").inc()
+            return False
         
-        response = safe_api_request("POST", "/openApi/swap/v2/trade/order", params=params)
+        response = executor.market(side, quantity)
         
         if response and response.get("code") == 0:
-            order_data = response["data"]
-            
-            if 'avgPrice' in order_data and order_data['avgPrice'] is not None:
-                entry_price = float(order_data['avgPrice'])
-            else:
-                print("⚠️ avgPrice not available. Using current market price")
-                entry_price = current_price
-                
-            position_side = side
-            current_quantity = quantity
-            position_open = True
-            
-            tp_price, sl_price = calculate_tp_sl(entry_price, atr, position_side)
-            
-            last_trade_time = current_time
+            order_data = order_payload(response["data"])
             
-            print(f"\n{'🟢 BUY' if side == 'BUY' else '🔴 SELL'} @ {entry_price:.5f}")
-            print(f"🎯 Take Profit: {tp_price:.5f}")
-            print(f"🛑 Stop Loss: {sl_price:.5f}")
-            print(f"⚙️ Leverage: {LEVERAGE}x | 📏 ATR: {atr:.5f}")
+            lifecycle = PositionLifecycle(side, quantity, order_data.get("orderId"),
+                                          deadline=current_time + FILL_CONFIRM_TIMEOUT, clock=clock.time)
+            lifecycle.meta["atr"] = atr
+            position_lifecycle = lifecycle
+            ORDERS.labels(side, "sent").inc()
             
-            # STRICT PROTECTION: Immediately create TP/SL and close if failed
-            if not create_tp_sl_orders():
-                print("🛑 Trade aborted - protection orders failed")
-                position_open = False  # Reset position status
-                return False
+            if lifecycle.on_order_update(order_data) == FILLED or not order_data.get("orderId"):
+                return on_entry_filled(lifecycle, order_data)
             
+            print(f"⏳ {side} order {order_data.get('orderId')} sent — waiting for fill confirmation")
             return True
         else:
             print(f"❌ Failed to place {side} order: {response.get('msg') if response else 'Unknown error'}")
+            ORDERS.labels(side, "rejected").inc()
             return False
     except Exception as e:
         print(f"❌ Error placing order: {e}")
+        ORDERS.labels(side, "error").inc()
         return False
 
+def on_entry_filled(lifecycle, order_data):
+    """Entry confirmed: record the position and protect it with TP/SL."""
+    global position_open, position_side, entry_price, current_quantity, tp_price, sl_price, last_trade_time
+    
+    if lifecycle.state == PENDING:
+        lifecycle.transition(FILLED, "fill assumed from order response")
+    ORDERS.labels(lifecycle.side, "filled").inc()
+    balance_cache.invalidate()
+    atr = lifecycle.meta.get("atr", max(current_atr, MIN_ATR))
+    side = lifecycle.side
+    
+    entry_price = fill_price(order_data)
+    if entry_price is None:
+        print("⚠️ avgPrice not available. Using current market price")
+        entry_price = current_price
+        
+    filled = fill_quantity(order_data)
+    if filled is not None and filled != lifecycle.quantity:
+        print(f"⚠️ Filled {filled} of {lifecycle.quantity} — sizing TP/SL to the fill")
+        lifecycle.quantity = filled
+    position_side = side
+    current_quantity = lifecycle.quantity
+    position_open = True
+    
+    tp_price, sl_price = calculate_tp_sl(entry_price, atr, position_side)
+    
+    last_trade_time = lifecycle.created_at
+    journal.record_entry(SYMBOL, side, entry_price, current_quantity, last_trade_time)
+    
+    print(f"\n{'🟢 BUY' if side == 'BUY' else '🔴 SELL'} @ {entry_price:.5f}")
+    print(f"🎯 Take Profit: {tp_price:.5f}")
+    print(f"🛑 Stop Loss: {sl_price:.5f}")
+    print(f"⚙️ Leverage: {LEVERAGE}x | 📏 ATR: {atr:.5f}")
+    
+    # STRICT PROTECTION: Immediately create TP/SL and close if failed
+    if not create_tp_sl_orders():
+        print("🛑 Trade aborted - protection orders failed")
+        ORDERS.labels(side, "protection_failed").inc()
+        publish_state()
+        return False
+    
+    lifecycle.transition(PROTECTED, "TP/SL placed")
+    publish_state()
+    return True
+
+def advance_orders():
+    """Move a pending entry, or an unprotected position being closed, forward; no sleeping.
+
+    Past the fill deadline the exchange position is the source of truth: if it
+    exists the entry filled, otherwise the order is cancelled and dropped.
+    """
+    lifecycle = position_lifecycle
+    if lifecycle is not None and lifecycle.state == CLOSING and position_open:
+        if lifecycle.expired():
+            retry_close(lifecycle)
+        return
+    if lifecycle is None or lifecycle.state != PENDING:
+        return
+    outcome, order_data = executor.poll_entry(lifecycle)
+    if outcome == "filled":
+        on_entry_filled(lifecycle, order_data)
+    elif outcome == "not_filled":
+        print(f"❌ {lifecycle.side} order {lifecycle.order_id} was not filled")
+        ORDERS.labels(lifecycle.side, "not_filled").inc()
+        publish_state()
+    elif outcome == "fill_timeout":
+        ORDERS.labels(lifecycle.side, "fill_timeout").inc()
+        print(f"⚠️ {lifecycle.side} order {lifecycle.order_id} not filled within {FILL_CONFIRM_TIMEOUT}s — cancelled")
+        publish_state()
+
+def retry_close(lifecycle):
+    """Close a position whose bracket failed and whose first close was not confirmed.
+
+    The exchange position is read first: a close that timed out may have gone
+    through, and sending another would open the opposite position.
+    """
+    global current_quantity
+    answered, position = executor.position()
+    if answered and (position is None or position["side"] != position_side):
+        print("⚠️ Unprotected position is no longer on the exchange — recording it as aborted")
+        abort_position(lifecycle, "ABORTED")
+        return True
+    if answered:
+        current_quantity = position["positionAmt"]
+        if close_position(lifecycle.meta.get("close_reason", "NO_PROTECTION"), current_price):
+            return True
+    lifecycle.deadline = clock.time() + CLOSE_RETRY_INTERVAL
+    return False
+
+def abort_position(lifecycle, result):
+    """Forget a position that ended without a close of ours; the journal keeps an abort row for its entry."""
+    global position_open, position_side, entry_price, current_quantity, tp_price, sl_price
+    journal.record_abort(SYMBOL, position_side, entry_price, current_quantity, result, clock.time())
+    ORDERS.labels(position_side, "aborted").inc()
+    position_open = False
+    position_side = None
+    entry_price = current_quantity = tp_price = sl_price = 0.0
+    lifecycle.transition(CLOSED, result)
+    balance_cache.invalidate(BALANCE_SETTLE_SECONDS)
+    publish_state()
+
+def entry_pending():
+    return position_lifecycle is not None and position_lifecycle.state == PENDING
+
 def close_position(reason, exit_price):
     global position_open, position_side, entry_price, current_quantity, tp_price, sl_price
     global total_trades, successful_trades, failed_trades, compound_profit, last_trade_time
@@ -682,40 +1067,27 @@ def close_position(reason, exit_price):
         print("⚠️ No open position to close")
         return False
     
-    if position_side == "BUY":
-        close_side = "SELL"
-    else:
-        close_side = "BUY"
-    
-    params = {
-        "symbol": SYMBOL,
-        "side": close_side,
-        "positionSide": "BOTH",
-        "type": "MARKET",
-        "quantity": current_quantity
-    }
+    lifecycle = position_lifecycle if position_lifecycle is not None and position_lifecycle.active else None
+    state_before = lifecycle.state if lifecycle is not None else None
+    if lifecycle is not None:
+        lifecycle.transition(CLOSING, reason)
     
     try:
-        response = safe_api_request("POST", "/openApi/swap/v2/trade/order", params=params)
+        response = executor.close(position_side, current_quantity)
         
         if response and response.get("code") == 0:
-            order_data = response["data"]
-            
-            if 'avgPrice' in order_data and order_data['avgPrice'] is not None:
-                exit_price = float(order_data['avgPrice'])
-            else:
+            exit_price = fill_price(order_payload(response["data"]))
+            if exit_price is None:
                 print("⚠️ avgPrice not available. Using current market price")
                 exit_price = current_price
             
-            if position_side == "BUY":
-                profit = (exit_price - entry_price) * current_quantity
-                profit_pct = ((exit_price - entry_price) / entry_price) * 100
-            else:
-                profit = (entry_price - exit_price) * current_quantity
-                profit_pct = ((entry_price - exit_price) / entry_price) * 100
+            profit = realized_profit(position_side, entry_price, exit_price, current_quantity)
+            profit_pct = (realized_profit(position_side, entry_price, exit_price, 1) / entry_price * 100
+                          if entry_price else 0.0)
             
             compound_profit += profit
             total_trades += 1
+            TRADES_CLOSED.labels(reason).inc()
             
             if reason == "TP":
                 successful_trades += 1
@@ -728,13 +1100,14 @@ def close_position(reason, exit_price):
                 'exit_price': exit_price,
                 'result': reason,
                 'profit': profit,
-                'time': time.strftime("%Y-%m-%d %H:%M:%S")
+                'time': clock_text()
             }
             trade_log.appendleft(trade_record)
             
             last_direction = position_side
             
-            last_trade_time = time.time()
+            last_trade_time = clock.time()
+            journal.record_close(SYMBOL, trade_record, current_quantity, last_trade_time)
             
             print(f"\n💼 Closed {position_side} @ {exit_price:.5f} | Entry: {entry_price:.5f}")
             print(f"📈 Profit: {profit:.4f} USDT | 📊 Change: {profit_pct:.2f}%")
@@ -750,17 +1123,24 @@ def close_position(reason, exit_price):
             tp_price = 0.0
             sl_price = 0.0
             
-            # === FIX: Allow API to update balance ===
-            print("🔄 Waiting 10 seconds for balance update...")
-            time.sleep(10)
-            # ========================================
+            if lifecycle is not None:
+                lifecycle.transition(CLOSED, reason)
+            publish_state()
+            
+            # The exchange needs a moment to settle the balance; reconcile on a later pass instead of blocking
+            balance_cache.invalidate(BALANCE_SETTLE_SECONDS)
+            print(f"🔄 Balance will be reconciled after {BALANCE_SETTLE_SECONDS}s")
             
             return True
         else:
             print(f"❌ Failed to close position: {response.get('msg') if response else 'Unknown error'}")
+            if lifecycle is not None:
+                lifecycle.transition(state_before, "close rejected")
             return False
     except Exception as e:
         print(f"❌ Error closing position: {e}")
+        if lifecycle is not None and lifecycle.state == CLOSING:
+            lifecycle.transition(state_before, "close error")
         return False
 
 def check_position_status():
@@ -769,28 +1149,45 @@ def check_position_status():
     if not position_open or position_side is None:
         return
     
-    if position_side == "BUY":
-        current_pnl = (current_price - entry_price) * current_quantity
-    else:
-        current_pnl = (entry_price - current_price) * current_quantity
+    current_pnl = realized_profit(position_side, entry_price, current_price, current_quantity)
+    
+    reason = exit_reason(position_side, current_price, tp_price, sl_price, TOLERANCE)
+    if reason == "TP":
+        print(f"✅ TP condition met! Price {'reached' if position_side == 'BUY' else 'dropped to'} {current_price:.5f}")
+        close_position("TP", current_price)
+    elif reason == "SL":
+        print(f"🛑 SL condition met! Price {'dropped' if position_side == 'BUY' else 'rose'} to {current_price:.5f}")
+        close_position("SL", current_price)
+    
+    if position_open:
+        publish_state()
+
+def restore_trade_history():
+    """Rebuild P&L counters, recent trades and cooldown state from the journal."""
+    global total_trades, successful_trades, failed_trades, compound_profit, last_direction, last_trade_time
     
-    if position_side == "BUY":
-        if current_price >= tp_price - TOLERANCE:
-            print(f"✅ TP condition met! Price reached {current_price:.5f}")
-            close_position("TP", current_price)
-        elif current_price <= sl_price + TOLERANCE:
-            print(f"🛑 SL condition met! Price dropped to {current_price:.5f}")
-            close_position("SL", current_price)
-    else:
-        if current_price <= tp_price + TOLERANCE:
-            print(f"✅ TP condition met! Price dropped to {current_price:.5f}")
-            close_position("TP", current_price)
-        elif current_price >= sl_price - TOLERANCE:
-            print(f"🛑 SL condition met! Price rose to {current_price:.5f}")
-            close_position("SL", current_price)
+    try:
+        started = time.perf_counter()
+        saved = journal.recover(SYMBOL, trade_log.maxlen)
+    except Exception as e:
+        print(f"❌ Error reading trade journal: {e}")
+        return False
+    total_trades = saved["total_trades"]
+    successful_trades = saved["successful_trades"]
+    failed_trades = saved["failed_trades"]
+    compound_profit = saved["compound_profit"]
+    last_direction = saved["last_direction"]
+    last_trade_time = saved["last_trade_time"]
+    trade_log.clear()
+    trade_log.extend(saved["trade_log"])
+    if total_trades:
+        print(f"📒 Restored {total_trades} trades ({compound_profit:.4f} USDT) from {JOURNAL_PATH} "
+              f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+    publish_state()
+    return True
 
 def resume_open_position():
-    global position_open, position_side, entry_price, current_quantity, current_atr
+    global position_open, position_side, entry_price, current_quantity, current_atr, position_lifecycle
     
     try:
         position = get_open_position()
@@ -799,6 +1196,7 @@ def resume_open_position():
             entry_price = position["entryPrice"]
             current_quantity = position["positionAmt"]
             position_open = True
+            position_lifecycle = PositionLifecycle(position_side, current_quantity, state=FILLED, clock=clock.time)
             
             atr = max(current_atr, MIN_ATR)
             
@@ -813,17 +1211,22 @@ def resume_open_position():
             print(f"📏 Current ATR: {atr:.5f}")
             
             # Apply strict protection for resumed positions
-            if not create_tp_sl_orders():
+            if create_tp_sl_orders():
+                position_lifecycle.transition(PROTECTED, "TP/SL placed on resume")
+            else:
                 print("🛑 Failed to set protection for resumed position")
             
+            publish_state()
             return True
         return False
     except Exception as e:
         print(f"❌ Error resuming position: {e}")
         return False
 
-def main_bot_loop():
+def main_bot_loop(until=None):
+    """Trade SYMBOL forever, or until `until()` returns True (paper trading)."""
     global current_atr, current_price, ema_200_value, rsi_value, adx_value, update_time
+    global initial_balance
     
     print(colored("🚀 Starting DOGE Trading Bot...", "green", attrs=["bold"]))
     print(f"⚙️ Configuration:")
@@ -835,68 +1238,66 @@ def main_bot_loop():
     print(f"  - MIN_TP_PERCENT: {MIN_TP_PERCENT}%")
     print(f"  - Cooldown Period: {COOLDOWN_PERIOD} seconds")
 
+    restore_warm_start()
     initial_balance = get_balance()
     if initial_balance <= 0:
         print("❌ Error: Initial balance is not positive")
         exit(1)
 
-    df = get_klines()
-    if not df.empty:
-        atr_indicator = AverageTrueRange(high=df['high'], low=df['low'], close=df['close'], window=ATR_PERIOD)
-        atr_series = atr_indicator.average_true_range()
-        if not atr_series.empty:
-            current_atr = atr_series.iloc[-1]
-        else:
-            current_atr = MIN_ATR
+    candles = get_candles()
+    if candles and len(candles["close"]) > 0:
+        current_atr = indicator_value(update_indicators(candles), "atr", MIN_ATR)
 
+    restore_trade_history()
     resume_open_position()
+    start_market_stream()
 
-    while True:
+    while until is None or not until():
         try:
-            update_time = time.strftime("%Y-%m-%d %H:%M:%S")
+            loop_started = time.perf_counter()
+            profile_capture.begin()
+            stage_timer.start()
+            update_time = clock_text()
+            advance_orders()
+            stage_timer.lap("orders")
             
             sleep_time = 15 if position_open else 60
             
-            df = get_klines()
-            if df.empty:
+            candles = get_candles()
+            stage_timer.lap("klines")
+            if not candles or len(candles["close"]) == 0:
                 print(colored("❌ Failed to get market data, retrying...", "red"))
-                time.sleep(sleep_time)
+                profile_capture.end()
+                wait_for_market(sleep_time)
                 continue
                 
-            if len(df) < 50:
-                print(f"⚠️ Insufficient data ({len(df)} candles), waiting...")
-                time.sleep(sleep_time)
+            if len(candles["close"]) < 50:
+                print(f"⚠️ Insufficient data ({len(candles['close'])} candles), waiting...")
+                profile_capture.end()
+                wait_for_market(sleep_time)
                 continue
                 
-            close_prices = df["close"]
-            current_price = close_prices.iloc[-1]
+            close_prices = candles["close"]
+            current_price = float(close_prices[-1])
             
-            atr_indicator = AverageTrueRange(high=df['high'], low=df['low'], close=df['close'], window=ATR_PERIOD)
-            atr_series = atr_indicator.average_true_range()
-            current_atr = atr_series.iloc[-1] if not atr_series.empty else MIN_ATR
+            snapshot = update_indicators(candles)
+            current_atr = indicator_value(snapshot, "atr", MIN_ATR)
+            price_range = indicator_value(snapshot, "range")
             
-            rsi_series = RSIIndicator(close=df["close"], window=14).rsi()
-            ema_20 = calculate_ema(close_prices, 20)
-            ema_50 = calculate_ema(close_prices, 50)
-            ema_200 = calculate_ema(close_prices, 200)
-            adx_series = calculate_adx(df)
-            supertrend_line, supertrend_trend = calculate_supertrend(df)
-            price_range = price_range_percent(df)
+            sma_3 = indicator_value(snapshot, "sma3")
+            sma_5 = indicator_value(snapshot, "sma5")
+            sma_7 = indicator_value(snapshot, "sma7")
+            sma_10 = indicator_value(snapshot, "sma10")
+            sma_14 = indicator_value(snapshot, "sma14")
             
-            sma_3 = calculate_sma(close_prices, 3).iloc[-1] if len(close_prices) >= 3 else 0
-            sma_5 = calculate_sma(close_prices, 5).iloc[-1] if len(close_prices) >= 5 else 0
-            sma_7 = calculate_sma(close_prices, 7).iloc[-1] if len(close_prices) >= 7 else 0
-            sma_10 = calculate_sma(close_prices, 10).iloc[-1] if len(close_prices) >= 10 else 0
-            sma_14 = calculate_sma(close_prices, 14).iloc[-1] if len(close_prices) >= 14 else 0
-            
-            rsi_value = rsi_series.iloc[-2] if not rsi_series.empty and len(rsi_series) >= 2 else 0
-            ema_200_value = ema_200.iloc[-1] if not ema_200.empty else 0
-            adx_value = adx_series.iloc[-1] if not adx_series.empty else 0
-            current_supertrend = supertrend_trend.iloc[-1] if not supertrend_trend.empty else 0
+            rsi_value = indicator_value(snapshot, "rsi_prev")
+            ema_200_value = indicator_value(snapshot, "ema200")
+            adx_value = indicator_value(snapshot, "adx")
+            current_supertrend = indicator_value(snapshot, "supertrend_dir")
+            save_warm_start()
+            stage_timer.lap("indicators")
             
             # ===== (PRO) استراتيجية مطوّرة — قرار موحّد للشراء/البيع =====
-            from strategy_upgrade import StrategyUpgrade, Params as _P, Guard as _G
-            strategyX = StrategyUpgrade(_P(), _G())
             state = {
                 "price": current_price,
                 "atr": current_atr,
@@ -907,36 +1308,43 @@ def main_bot_loop():
                 "supertrend": 1 if current_supertrend > 0 else -1,
                 "sma3": sma_3, "sma5": sma_5, "sma7": sma_7,
                 "last_direction": last_direction,
-                "mins_since_last_trade": int((time.time() - last_trade_time) / 60),
-                "spike": abs(close_prices.iloc[-1] - close_prices.iloc[-2]) > 1.8 * current_atr
+                "mins_since_last_trade": int((clock.time() - last_trade_time) / 60),
+                "spike": abs(close_prices[-1] - close_prices[-2]) > 1.8 * current_atr,
+                "h1_trend": timeframes.trend("1h")
             }
-            dec = strategyX.decide(state)
-            ok_pre, reasons_pre = strategyX.pre_trade({
+            dec = strategy.decide(state)
+            ok_pre, reasons_pre = strategy.pre_trade({
                 **state,
-                "prev": close_prices.iloc[-2],
-                "pct3": ((close_prices.iloc[-1] - close_prices.iloc[-4]) / close_prices.iloc[-4] * 100) if len(close_prices) >= 4 else 0.0
+                "prev": float(close_prices[-2]),
+                "pct3": float((close_prices[-1] - close_prices[-4]) / close_prices[-4] * 100) if len(close_prices) >= 4 else 0.0
             }, dec["side"])
 
             # بدل إشارات التقاطع الأصلية إلى إشارات محسّنة
             ma_cross_up   = dec["enter"] and dec["side"] == "BUY"
             ma_cross_down = dec["enter"] and dec["side"] == "SELL"
 
+            for reason in dec["reasons"]:
+                DECISION_REJECTIONS.labels(reason).inc()
+
             if not ok_pre:
                 print(f"[PROTECT][PRE] blocked: {reasons_pre}")
+                for reason in reasons_pre:
+                    DECISION_REJECTIONS.labels(reason).inc()
                 ma_cross_up = ma_cross_down = False
 
             # منع الدخول بعد الشموع المفاجئة
-            current_close = close_prices.iloc[-1]
-            previous_close = close_prices.iloc[-2]
+            current_close = float(close_prices[-1])
+            previous_close = float(close_prices[-2])
             spike = abs(current_close - previous_close) > current_atr * 1.8
+            stage_timer.lap("decision")
             
             # ===== الحسابات المالية =====
-            current_balance = get_balance()
+            current_balance = get_balance()  # cached; place_order re-reads it before sending
             
-            total_balance = initial_balance + compound_profit
-            trade_usdt = min(total_balance * TRADE_PORTION, current_balance)
+            trade_usdt = trade_budget(current_balance)
             effective_usdt = trade_usdt * LEVERAGE
             quantity = round(effective_usdt / current_price, 2)
+            stage_timer.lap("balance")
             
             print(f"📊 Effective USD (after leverage): {effective_usdt:.2f} USD")
             print(f"📦 Quantity: {quantity} {SYMBOL.split('-')[0]}")
@@ -959,10 +1367,13 @@ def main_bot_loop():
                      "green" if current_supertrend > 0 else "red")
             log_status("💥 Spike Candle", f"{abs(current_close - previous_close):.5f} > {current_atr*1.8:.5f}" if spike else "No", "red" if spike else "green")
             
+            stage_timer.lap("logging")
             check_position_status()
+            publish_state()
+            stage_timer.lap("position")
             
             if not position_open:
-                current_time = time.time()
+                current_time = clock.time()
                 if current_time - last_trade_time < COOLDOWN_PERIOD:
                     remaining = int(COOLDOWN_PERIOD - (current_time - last_trade_time))
                     print(f"🕒 Cooldown active. Waiting {remaining} seconds before next trade.")
@@ -1000,17 +1411,39 @@ def main_bot_loop():
                     elif (ma_cross_up or ma_cross_down) and price_range <= 1.5:
                         print(f"🚫 Price range too low ({price_range:.2f}% < 1.5%) — skipping trade")
             
-            time.sleep(sleep_time)
+            stage_timer.lap("entry")
+            stage_timer.finish()
+            profile_capture.end()
+            LOOP_SECONDS.observe(time.perf_counter() - loop_started)
+            wait_for_market(sleep_time)
             
         except Exception as e:
+            profile_capture.end()
             print(colored(f"❌ Unexpected error: {e}", "red"))
-            time.sleep(60)
+            clock.sleep(60)
+
+def run_multi_symbol():
+    """Trade every pair of SYMBOLS from one process over the shared client."""
+    global multi_runner
+    from symbol_engine import SymbolEngine, MultiSymbolRunner
+    engines = [SymbolEngine(symbol, exchange, INTERVAL, leverage=LEVERAGE, min_atr=MIN_ATR,
+                            min_tp_percent=MIN_TP_PERCENT, tolerance=TOLERANCE, cooldown=COOLDOWN_PERIOD,
+                            kline_window=KLINE_WINDOW, kline_capacity=KLINE_CAPACITY,
+                            fill_timeout=FILL_CONFIRM_TIMEOUT, journal=journal,
+                            warm_path=snapshot_path(WARM_START_DIR, symbol, INTERVAL) if WARM_START_DIR else None,
+                            clock=clock)
+               for symbol in SYMBOLS]
+    multi_runner = MultiSymbolRunner(engines, exchange, trade_portion=TRADE_PORTION,
+                                     fill_poll=FILL_POLL_INTERVAL, clock=clock)
+    multi_runner.run_forever()
+
+def keep_alive(url):
+    import requests
 
-def keep_alive():
     def ping():
         while True:
             try:
-                requests.get("https://YOUR-REPLIT-URL.replit.app")
+                requests.get(url, timeout=10)
                 print("🟢 Keep-alive ping sent")
             except:
                 print("🔴 Keep-alive failed")
@@ -1020,12 +1453,13 @@ def keep_alive():
     t.daemon = True
     t.start()
 
-keep_alive()
-
 if __name__ == '__main__':
-    bot_thread = Thread(target=main_bot_loop)
+    install_profile_signal()
+    if KEEP_ALIVE_URL:
+        keep_alive(KEEP_ALIVE_URL)
+    bot_thread = Thread(target=run_multi_symbol if len(SYMBOLS) > 1 else main_bot_loop)
     bot_thread.daemon = True
     bot_thread.start()
     # Bind PORT for Render
     port = int(os.getenv("PORT", 8080))
-    app.run(host="0.0.0.0", port=port)
+    dashboard_app().run(host="0.0.0.0", port=port)
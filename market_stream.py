@@ -0,0 +1,371 @@
+# market_stream.py — pushed kline/mark-price ingestion over WebSocket (stdlib only)
+#
+# A background thread keeps one WebSocket to the exchange, subscribes to the
+# kline and mark-price streams and hands updates to the trading thread:
+#   - kline rows are queued and applied to the KlineStore by the trading
+#     thread (`drain`), so the store is never written from two threads;
+#   - the latest price is kept on the stream and `wait` wakes the trading
+#     thread on every push, so TP/SL checks react within one message.
+# Dropped connections are re-opened with jittered backoff and every stream is
+# re-subscribed.  Each (re)connect bumps `generation`; a consumer that sees a
+# new generation, or a kline that skips an interval, must resync over REST.
+import base64
+import gzip
+import hashlib
+import json
+import os
+import random
+import socket
+import ssl
+import struct
+import threading
+import time
+from collections import deque
+from typing import List, Optional, Tuple
+from urllib.parse import urlparse
+
+_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_CONT, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+
+# ---- RFC 6455 framing ----
+def _mask(data: bytes, key: bytes) -> bytes:
+    n = len(data)
+    if not n:
+        return data
+    k = (key * (n // 4 + 1))[:n]
+    return (int.from_bytes(data, "big") ^ int.from_bytes(k, "big")).to_bytes(n, "big")
+
+
+def _recv_exact(sock, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("socket closed")
+        buf += chunk
+    return bytes(buf)
+
+
+def send_frame(sock, opcode: int, payload: bytes, mask: bool):
+    header = bytearray([0x80 | opcode])
+    n = len(payload)
+    mbit = 0x80 if mask else 0
+    if n < 126:
+        header.append(mbit | n)
+    elif n < 1 << 16:
+        header.append(mbit | 126); header += struct.pack("!H", n)
+    else:
+        header.append(mbit | 127); header += struct.pack("!Q", n)
+    if mask:
+        key = os.urandom(4)
+        header += key
+        payload = _mask(payload, key)
+    sock.sendall(bytes(header) + payload)
+
+
+def recv_message(sock) -> Tuple[int, bytes]:
+    """Next complete message as (opcode, payload); control frames are returned as they come."""
+    parts = []; first_op = None
+    while True:
+        b0, b1 = _recv_exact(sock, 2)
+        fin, opcode = b0 & 0x80, b0 & 0x0F
+        n = b1 & 0x7F
+        if n == 126:
+            n = struct.unpack("!H", _recv_exact(sock, 2))[0]
+        elif n == 127:
+            n = struct.unpack("!Q", _recv_exact(sock, 8))[0]
+        key = _recv_exact(sock, 4) if b1 & 0x80 else None
+        payload = _recv_exact(sock, n)
+        if key:
+            payload = _mask(payload, key)
+        if opcode >= OP_CLOSE:
+            return opcode, payload
+        if first_op is None:
+            first_op = opcode
+        parts.append(payload)
+        if fin:
+            return first_op, b"".join(parts)
+
+
+def _read_http_head(sock) -> bytes:
+    # byte by byte so no frame data that follows the headers is consumed
+    head = b""
+    while not head.endswith(b"\r\n\r\n"):
+        chunk = sock.recv(1)
+        if not chunk:
+            raise ConnectionError("connection closed during handshake")
+        head += chunk
+    return head
+
+
+def _accept_key(key: str) -> str:
+    return base64.b64encode(hashlib.sha1((key + _GUID).encode()).digest()).decode()
+
+
+def ws_connect(url: str, timeout: float = 10.0):
+    """Open a client WebSocket (ws:// or wss://) and return the connected socket."""
+    u = urlparse(url)
+    secure = u.scheme == "wss"
+    port = u.port or (443 if secure else 80)
+    sock = socket.create_connection((u.hostname, port), timeout=timeout)
+    if secure:
+        sock = ssl.create_default_context().wrap_socket(sock, server_hostname=u.hostname)
+    key = base64.b64encode(os.urandom(16)).decode()
+    path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+    sock.sendall((f"GET {path} HTTP/1.1\r\nHost: {u.hostname}:{port}\r\nUpgrade: websocket\r\n"
+                  f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+    head = _read_http_head(sock)
+    status, _, rest = head.partition(b"\r\n")
+    if b" 101 " not in status + b" " or _accept_key(key).encode() not in rest:
+        raise ConnectionError(f"handshake rejected: {status.decode(errors='replace')}")
+    return sock
+
+
+def _decode(opcode: int, payload: bytes) -> str:
+    if opcode == OP_BINARY:
+        try:
+            payload = gzip.decompress(payload)
+        except OSError:
+            pass
+    return payload.decode("utf-8", errors="replace")
+
+
+# ---- client ----
+class MarketStream:
+    """Kline + mark-price subscription for one symbol/interval with automatic reconnect."""
+
+    def __init__(self, url: str, symbol: str, interval: str, stale_after: float = 30.0,
+                 max_backoff: float = 30.0):
+        self.url = url
+        self.symbol = symbol
+        self.interval = interval
+        self.stale_after = stale_after
+        self.max_backoff = max_backoff
+        self.kline_topic = f"{symbol}@kline_{interval}"
+        self.mark_topic = f"{symbol}@markPrice"
+        self.live = False
+        self.generation = 0                 # bumped on every successful (re)connect
+        self.price: Optional[float] = None  # latest mark price (or kline close until one arrives)
+        self.price_time = 0.0
+        self.reconnects = 0
+        self._klines = deque(maxlen=10_000)
+        self._candle_open: Optional[float] = None
+        self._candle_closed = False
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sock = None
+        self._thread: Optional[threading.Thread] = None
+
+    # -- trading-thread side --
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="market-stream", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._close()
+
+    def wait(self, timeout: float) -> bool:
+        """Block until a push arrives or `timeout` passes; True if something arrived."""
+        fired = self._event.wait(timeout)
+        self._event.clear()
+        return fired
+
+    def drain(self) -> List[Tuple[float, ...]]:
+        """Pushed kline rows since the last call, oldest first."""
+        with self._lock:
+            rows = list(self._klines); self._klines.clear()
+        return rows
+
+    def pop_candle_closed(self) -> bool:
+        """True once per newly opened candle (the previous one has closed)."""
+        with self._lock:
+            closed, self._candle_closed = self._candle_closed, False
+        return closed
+
+    # -- stream thread --
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                self._sock = ws_connect(self.url)
+                self._sock.settimeout(self.stale_after)
+                for topic in (self.kline_topic, self.mark_topic):
+                    self._send_json({"id": f"{topic}-{self.generation + 1}", "reqType": "sub", "dataType": topic})
+                self.generation += 1
+                self.live = True
+                backoff = 1.0
+                self._event.set()
+                self._read_loop()
+            except Exception as e:
+                if not self._stop.is_set():
+                    print(f"❌ Market stream error: {e}")
+            finally:
+                self.live = False
+                self._close()
+            if self._stop.is_set():
+                break
+            self.reconnects += 1
+            self._stop.wait(backoff * random.uniform(0.5, 1.0))
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def _read_loop(self):
+        while not self._stop.is_set():
+            opcode, payload = recv_message(self._sock)
+            if opcode == OP_CLOSE:
+                return
+            if opcode == OP_PING:
+                send_frame(self._sock, OP_PONG, payload, mask=True); continue
+            if opcode == OP_PONG:
+                continue
+            text = _decode(opcode, payload)
+            if text == "Ping":
+                send_frame(self._sock, OP_TEXT, b"Pong", mask=True); continue
+            try:
+                msg = json.loads(text)
+            except ValueError:
+                continue
+            self._dispatch(msg)
+
+    def _dispatch(self, msg):
+        topic = msg.get("dataType")
+        data = msg.get("data")
+        if not topic or data is None:
+            return
+        now = time.time()
+        if topic == self.kline_topic:
+            rows = []
+            for k in data if isinstance(data, list) else [data]:
+                rows.append((float(k["T"]), float(k["o"]), float(k["h"]), float(k["l"]),
+                             float(k["c"]), float(k.get("v", 0.0))))
+            rows.sort(key=lambda r: r[0])
+            with self._lock:
+                for row in rows:
+                    if self._candle_open is not None and row[0] > self._candle_open:
+                        self._candle_closed = True
+                    if self._candle_open is None or row[0] >= self._candle_open:
+                        self._candle_open = row[0]
+                    self._klines.append(row)
+                if rows and (self.price is None or now - self.price_time > self.stale_after):
+                    self.price = rows[-1][4]; self.price_time = now
+        elif topic == self.mark_topic:
+            items = data if isinstance(data, list) else [data]
+            self.price = float(items[-1]["p"]); self.price_time = now
+        else:
+            return
+        self._event.set()
+
+    def _send_json(self, obj):
+        send_frame(self._sock, OP_TEXT, json.dumps(obj).encode(), mask=True)
+
+    def _close(self):
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+
+# ---- local stand-in server ----
+class LocalFeedServer:
+    """Minimal BingX-style WebSocket feed on localhost for offline runs and tests.
+
+    Clients subscribe with {"reqType": "sub", "dataType": ...}; `push` sends a
+    gzip-compressed message to every subscriber of that topic, `ping` sends
+    the exchange's text "Ping" and `drop_clients` cuts every connection.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._srv = socket.create_server((host, port))
+        self.host, self.port = self._srv.getsockname()[:2]
+        self.url = f"ws://{self.host}:{self.port}/swap-market"
+        self._clients = {}   # socket -> set of topics
+        self._lock = threading.Lock()
+        self.subscriptions = 0
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self._srv.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            head = _read_http_head(conn)
+            key = ""
+            for line in head.decode(errors="replace").split("\r\n"):
+                if line.lower().startswith("sec-websocket-key:"):
+                    key = line.split(":", 1)[1].strip()
+            conn.sendall((f"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                          f"Sec-WebSocket-Accept: {_accept_key(key)}\r\n\r\n").encode())
+            with self._lock:
+                self._clients[conn] = set()
+            while True:
+                opcode, payload = recv_message(conn)
+                if opcode == OP_CLOSE:
+                    return
+                if opcode != OP_TEXT:
+                    continue
+                text = payload.decode(errors="replace")
+                if text == "Pong":
+                    continue
+                msg = json.loads(text)
+                if msg.get("reqType") == "sub":
+                    with self._lock:
+                        self._clients.setdefault(conn, set()).add(msg.get("dataType"))
+                        self.subscriptions += 1
+                    self._send(conn, {"id": msg.get("id"), "code": 0, "msg": ""})
+        except (OSError, ConnectionError, ValueError):
+            pass
+        finally:
+            with self._lock:
+                self._clients.pop(conn, None)
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _send(self, conn, obj):
+        send_frame(conn, OP_BINARY, gzip.compress(json.dumps(obj).encode()), mask=False)
+
+    def push(self, topic: str, data) -> int:
+        """Send `data` under `topic` to its subscribers; returns how many received it."""
+        with self._lock:
+            targets = [c for c, topics in self._clients.items() if topic in topics]
+        sent = 0
+        for conn in targets:
+            try:
+                self._send(conn, {"code": 0, "dataType": topic, "data": data}); sent += 1
+            except OSError:
+                pass
+        return sent
+
+    def ping(self):
+        with self._lock:
+            targets = list(self._clients)
+        for conn in targets:
+            try:
+                send_frame(conn, OP_BINARY, gzip.compress(b"Ping"), mask=False)
+            except OSError:
+                pass
+
+    def drop_clients(self):
+        with self._lock:
+            targets = list(self._clients); self._clients.clear()
+        for conn in targets:
+            try:
+                conn.shutdown(socket.SHUT_RDWR); conn.close()
+            except OSError:
+                pass
+
+    def close(self):
+        self.drop_clients()
+        self._srv.close()
@@ -0,0 +1,98 @@
+# order_lifecycle.py — explicit order/position states with deadlines (no API calls)
+#
+#   PENDING ──fill──> FILLED ──TP+SL placed──> PROTECTED ──close sent──> CLOSING ──> CLOSED
+#      │                 │                         ^                        │
+#      └──reject/expire──┴──> FAILED               └──── close rejected ────┘
+#
+# Nothing here sleeps.  The trading loop calls into the lifecycle whenever it
+# learns something (an order-status reply, a pushed fill event, a deadline
+# passing) and the lifecycle only records where the position is.  Several
+# lifecycles can be driven from one thread.
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PENDING = "PENDING"
+FILLED = "FILLED"
+PROTECTED = "PROTECTED"
+CLOSING = "CLOSING"
+CLOSED = "CLOSED"
+FAILED = "FAILED"
+
+TRANSITIONS = {
+    PENDING: {FILLED, FAILED},
+    FILLED: {PROTECTED, CLOSING, CLOSED, FAILED},
+    PROTECTED: {CLOSING, CLOSED},
+    CLOSING: {CLOSED, PROTECTED, FILLED},
+    CLOSED: set(),
+    FAILED: set(),
+}
+
+ACTIVE_STATES = {PENDING, FILLED, PROTECTED, CLOSING}
+FILLED_STATUSES = {"FILLED"}
+DEAD_STATUSES = {"CANCELED", "CANCELLED", "EXPIRED", "REJECTED", "FAILED"}
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+class PositionLifecycle:
+    """State of one position from entry order to close."""
+    __slots__ = ("side", "quantity", "order_id", "state", "deadline", "created_at",
+                 "fill", "meta", "history", "_clock")
+
+    def __init__(self, side: str, quantity: float, order_id: Optional[Any] = None,
+                 state: str = PENDING, deadline: Optional[float] = None,
+                 clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self.side = side
+        self.quantity = quantity
+        self.order_id = order_id
+        self.state = state
+        self.deadline = deadline
+        self.created_at = clock()
+        self.fill: Dict[str, Any] = {}
+        self.meta: Dict[str, Any] = {}    # caller data carried with the position (e.g. ATR at entry)
+        self.history: List[Tuple[float, str, str]] = [(self.created_at, state, "created")]
+
+    @property
+    def active(self) -> bool:
+        return self.state in ACTIVE_STATES
+
+    def expired(self, now: Optional[float] = None) -> bool:
+        return self.deadline is not None and (self._clock() if now is None else now) >= self.deadline
+
+    def transition(self, state: str, reason: str = "", deadline: Optional[float] = None):
+        if state == self.state:
+            return
+        if state not in TRANSITIONS[self.state]:
+            raise InvalidTransition(f"{self.state} -> {state}")
+        self.state = state
+        self.deadline = deadline
+        self.history.append((self._clock(), state, reason))
+
+    def on_order_update(self, order: Dict[str, Any]) -> Optional[str]:
+        """Apply an order-status reply or pushed order event for the entry order.
+
+        Accepts REST order fields ({"orderId", "status", "avgPrice"}) or the
+        account stream's ORDER_TRADE_UPDATE payload ({"i", "X", "ap"}).
+        Returns the new state when it changed.
+        """
+        order_id = order.get("orderId", order.get("i"))
+        if self.order_id is not None and order_id is not None and str(order_id) != str(self.order_id):
+            return None
+        if self.state != PENDING:
+            return None
+        status = str(order.get("status", order.get("X", ""))).upper()
+        if status in FILLED_STATUSES:
+            avg = order.get("avgPrice", order.get("ap"))
+            self.fill = {"avgPrice": avg, "orderId": order_id}
+            self.transition(FILLED, "fill reported")
+            return FILLED
+        if status in DEAD_STATUSES:
+            self.transition(FAILED, f"order {status.lower()}")
+            return FAILED
+        return None
+
+    def describe(self) -> str:
+        return f"{self.side} {self.quantity} [{self.state}]"
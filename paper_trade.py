@@ -0,0 +1,111 @@
+# paper_trade.py — main_bot_loop against the exchange simulator in virtual time (no API calls)
+#
+# The unchanged decision and execution code of main.py runs on a VirtualClock
+# and talks to an in-process SimExchange (exchange_sim.py) instead of BingX.
+# Every sleep of the loop advances virtual time instantly, so the 15s/60s
+# polls, the order cooldown and the same-direction block all happen in
+# simulated seconds, and a month of 15m candles replays in well under a
+# minute.  The loop's console output goes to --log (discarded by default);
+# trades go to their own journal so the live trades.db is never touched.
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from backtest import load_csv, synthetic_candles
+from clock import VirtualClock
+from exchange_sim import PaperClient, SimConfig, SimExchange
+from kline_store import interval_to_ms
+from trade_journal import TradeJournal
+
+
+def run_paper(candles: Dict[str, np.ndarray], config: Optional[SimConfig] = None,
+              journal_path: str = "paper_trades.db", log_path: Optional[str] = None) -> Dict[str, Any]:
+    """Replay `candles` through main_bot_loop; returns the bot's counters and the simulator's account."""
+    import main
+
+    config = config or SimConfig(symbol=main.SYMBOL, interval=main.INTERVAL, leverage=main.LEVERAGE)
+    start = float(candles["timestamp"][min(config.warmup, len(candles["timestamp"]) - 1)])
+    clock = VirtualClock(start / 1000)
+    sim = SimExchange(candles, config, clock=clock.time)
+    client = PaperClient(sim)
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(journal_path + suffix):
+            os.remove(journal_path + suffix)
+    main.use_clock(clock)
+    main.exchange = client
+    main.balance_cache.fetch = client.usdt_balance
+    main.journal = TradeJournal(journal_path)
+    main.warm_start_path = None
+    # Prices come from the simulator only; a live WebSocket would feed real quotes into virtual time
+    main.USE_STREAM = False
+    main.market_stream = None
+
+    started = time.perf_counter()
+    with open(log_path or os.devnull, "w", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+        main.main_bot_loop(until=lambda: sim.finished)
+    main.journal.flush(timeout=10)
+    wall = time.perf_counter() - started
+
+    state = sim.state()
+    virtual_days = (sim.now_ms() - start) / 86_400_000
+    return {
+        "virtual_days": virtual_days,
+        "wall_seconds": wall,
+        "speedup": virtual_days * 86_400 / wall if wall > 0 else float("inf"),
+        "requests": sim.requests,
+        "trades": main.total_trades,
+        "wins": main.successful_trades,
+        "losses": main.failed_trades,
+        "bot_profit": main.compound_profit,
+        "exchange_fills": len(sim.fills),
+        "wallet": state["wallet"],
+        "open_position": state["position"],
+        "journal": journal_path,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Paper-trade main.py on the simulator in virtual time")
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--csv", help="candles to replay (timestamp,open,high,low,close[,volume])")
+    src.add_argument("--days", type=float, default=30, help="synthetic 15m candles covering this many days")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--balance", type=float, default=1000.0)
+    ap.add_argument("--fee-rate", type=float, default=0.0005)
+    ap.add_argument("--slippage", type=float, default=0.0)
+    ap.add_argument("--journal", default="paper_trades.db")
+    ap.add_argument("--log", help="write the loop's console output here (default: discard)")
+    ap.add_argument("--out", help="write the summary JSON here")
+    args = ap.parse_args(argv)
+
+    import main as bot
+    config = SimConfig(symbol=bot.SYMBOL, interval=bot.INTERVAL, leverage=bot.LEVERAGE, balance=args.balance,
+                       fee_rate=args.fee_rate, slippage=args.slippage, seed=args.seed)
+    if args.csv:
+        candles = load_csv(args.csv)
+    else:
+        step = interval_to_ms(config.interval)
+        n = config.warmup + int(args.days * 86_400_000 / step)
+        candles = synthetic_candles(n, config.interval, seed=args.seed,
+                                    start_ms=(int(time.time() * 1000) // step - n) * step)
+
+    summary = run_paper(candles, config, args.journal, args.log)
+    print(f"🧪 {summary['virtual_days']:.1f} days in {summary['wall_seconds']:.1f}s "
+          f"(x{summary['speedup']:,.0f}), {summary['requests']} requests")
+    print(f"📒 {summary['trades']} trades ({summary['wins']} TP / {summary['losses']} other), "
+          f"bot P&L {summary['bot_profit']:.4f} USDT, exchange wallet {summary['wallet']:.4f} USDT")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
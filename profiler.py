@@ -0,0 +1,179 @@
+# profiler.py — per-stage loop timers and on-demand cProfile/sampling captures (no API calls)
+#
+# StageTimer: the loop calls start() once per pass and lap("stage") after each
+# phase; every lap stores one float into a preallocated ring per stage, and
+# percentiles are only computed when someone asks.  With timers disabled a
+# lap is a single attribute check.
+#
+# ProfileCapture: arm(n) makes the next n loop passes run under cProfile (or
+# a stack sampler thread) and writes the result to disk when they are done.
+# Nothing is attached to the interpreter until a capture is armed.
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+import numpy as np
+
+MAX_CAPTURE_ITERATIONS = 100
+
+
+class StageTimer:
+    def __init__(self, window: int = 512, enabled: bool = True):
+        self.window = window
+        self.enabled = enabled
+        self._rings: Dict[str, np.ndarray] = {}
+        self._counts: Dict[str, int] = {}
+        self._last = 0.0
+        self._started = 0.0
+
+    def start(self):
+        if self.enabled:
+            self._started = self._last = time.perf_counter()
+
+    def lap(self, stage: str):
+        """Record the time since the previous lap (or start) under `stage`."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._store(stage, now - self._last)
+        self._last = now
+
+    def finish(self, stage: str = "total"):
+        """Record the whole pass since start() under `stage`."""
+        if self.enabled:
+            self._store(stage, time.perf_counter() - self._started)
+
+    def _store(self, stage: str, seconds: float):
+        ring = self._rings.get(stage)
+        if ring is None:
+            ring = self._rings[stage] = np.zeros(self.window)
+            self._counts[stage] = 0
+        count = self._counts[stage]
+        ring[count % self.window] = seconds
+        self._counts[stage] = count + 1
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per stage: samples seen and rolling p50/p95/p99/max in milliseconds."""
+        out = {}
+        for stage, ring in list(self._rings.items()):
+            count = self._counts[stage]
+            recent = ring[:min(count, self.window)] * 1000
+            if not len(recent):
+                continue
+            p50, p95, p99 = np.percentile(recent, (50, 95, 99))
+            out[stage] = {"count": count, "p50_ms": float(p50), "p95_ms": float(p95),
+                          "p99_ms": float(p99), "max_ms": float(recent.max())}
+        return out
+
+    def reset(self):
+        self._rings.clear(); self._counts.clear()
+
+
+class _Sampler:
+    """Collects the stack of one thread every `interval` seconds as folded stacks."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set(); self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+
+class ProfileCapture:
+    """Profile the next N loop passes; call begin()/end() around each pass."""
+
+    def __init__(self, directory: str = "profiles"):
+        self.directory = directory
+        self.remaining = 0
+        self.mode = "cprofile"
+        self.last_path: Optional[str] = None
+        self._profiler: Optional[cProfile.Profile] = None
+        self._sampler: Optional[_Sampler] = None
+        self._active: Optional[str] = None      # mode latched by begin() for the pass in progress
+        self._lock = threading.Lock()
+
+    @property
+    def armed(self) -> bool:
+        return self.remaining > 0
+
+    def arm(self, iterations: int = 5, mode: str = "cprofile") -> int:
+        if mode not in ("cprofile", "sample"):
+            raise ValueError("mode must be 'cprofile' or 'sample'")
+        with self._lock:
+            self.remaining = max(1, min(int(iterations), MAX_CAPTURE_ITERATIONS))
+            self.mode = mode
+        return self.remaining
+
+    def begin(self):
+        """Start one pass; whether and how it is profiled is latched here, so arm() mid-pass is safe."""
+        with self._lock:
+            self._active = self.mode if self.remaining else None
+            active = self._active
+        if active == "cprofile":
+            if self._profiler is None:
+                self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif active == "sample" and self._sampler is None:
+            self._sampler = _Sampler(threading.get_ident())
+            self._sampler.start()
+
+    def end(self):
+        """Finish the pass begin() latched; a pass that began unarmed (or a second end()) does nothing."""
+        with self._lock:
+            active, self._active = self._active, None
+            if active is None:
+                return
+            if active == "cprofile":
+                self._profiler.disable()
+            self.remaining = max(0, self.remaining - 1)
+            done = self.remaining == 0
+        if done:
+            self._write()
+
+    def _write(self):
+        """Write every collector the capture used (both if the mode changed while it ran)."""
+        profiler, self._profiler = self._profiler, None
+        sampler, self._sampler = self._sampler, None
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        if profiler is not None:
+            path = os.path.join(self.directory, f"loop-{stamp}.prof")
+            profiler.dump_stats(path)
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(40)
+            with open(path[:-5] + ".txt", "w") as f:
+                f.write(text.getvalue())
+            self.last_path = path
+            print(f"🧪 Profile written to {path}")
+        if sampler is not None:
+            sampler.stop()
+            path = os.path.join(self.directory, f"loop-{stamp}.folded")
+            with open(path, "w") as f:
+                for stack, count in sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            self.last_path = path
+            print(f"🧪 Profile written to {path}")
@@ -1,6 +1,23 @@
 # strategy_upgrade.py — Pro decision layer (no API calls)
+#
+# decide_many/pre_trade_many evaluate the rules over NumPy columns (one entry
+# per bar or tick); decide/pre_trade are the same code on one-element columns,
+# so the live loop, the backtest and the sweep share a single implementation.
+# Reasons come back as bit codes per row; reason_text turns them into the
+# strings the loop logs.
 from dataclasses import dataclass
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+# decide() reason bits
+R_RANGE, R_ADX, R_SPIKE, R_SAME_DIR, R_H1 = 1, 2, 4, 8, 16
+# pre_trade() reason bits
+P_SPIKE_1BAR, P_MOVE_3BARS, P_COUNTER_TREND = 1, 2, 4
+
+BUY, SELL = 1, -1
+SIDES = {BUY: "BUY", SELL: "SELL", 0: None}
+SIDE_CODES = {"BUY": BUY, "SELL": SELL, None: 0}
 
 @dataclass
 class Params:
@@ -22,42 +39,112 @@ class Guard:
     trail_start_atr: float = 1.0
     trail_step_atr: float = 0.5
 
+def _col(cols: Dict[str, Any], key: str, n: int, default, dtype=float) -> np.ndarray:
+    v = cols.get(key)
+    return np.full(n, default, dtype=dtype) if v is None else np.asarray(v, dtype=dtype)
+
+def _side_codes(side, n: int) -> np.ndarray:
+    """+1/-1/0 per row from codes, or from "BUY"/"SELL"/None (one value or one per row)."""
+    if side is None or isinstance(side, str):
+        return np.full(n, SIDE_CODES.get(side or None, 0), dtype=np.int8)
+    side = np.asarray(side)
+    if side.dtype.kind in "OUS":
+        return np.array([SIDE_CODES.get(x or None, 0) for x in side], dtype=np.int8)
+    return side.astype(np.int8)
+
+def _trend(cols: Dict[str, Any], n: int) -> np.ndarray:
+    # int(supertrend) > 0 like the scalar rules, so 0.5 counts as down
+    return np.where(np.trunc(_col(cols, "supertrend", n, 1)) > 0, 1, -1)
+
 class StrategyUpgrade:
     def __init__(self, p: Params = Params(), g: Guard = Guard()):
         self.p = p; self.g = g
 
+    # ---- arrays ----
+    def decide_many(self, cols: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """Entry decision per row.
+
+        Columns: price, atr, ema200, rsi, adx, supertrend (sign), sma3, sma5, sma7, range;
+        optional spike (bool), last_direction (+1 BUY / -1 SELL / 0), mins_since_last_trade,
+        h1_trend (+1/-1, 0 unknown; only read with require_h1_alignment, see timeframes.py).
+        Returns enter (bool), side (+1/-1/0), tp_mult, est_tp_percent and reasons (R_* bits).
+        """
+        price = np.asarray(cols["price"], dtype=float); n = len(price)
+        atr = np.asarray(cols["atr"], dtype=float); ema200 = np.asarray(cols["ema200"], dtype=float)
+        rsi = np.asarray(cols["rsi"], dtype=float); adx = np.asarray(cols["adx"], dtype=float)
+        st = _trend(cols, n)
+        sma3, sma5, sma7 = (np.asarray(cols[k], dtype=float) for k in ("sma3", "sma5", "sma7"))
+        prange = np.asarray(cols["range"], dtype=float)
+        last_dir = _side_codes(cols.get("last_direction"), n)
+        mins = _col(cols, "mins_since_last_trade", n, 9_999)
+        spike = _col(cols, "spike", n, False, bool)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            reasons = np.where(prange < self.p.range_min_pct, R_RANGE, 0)
+            reasons |= np.where(adx < self.p.adx_min, R_ADX, 0)
+            reasons |= np.where(spike, R_SPIKE, 0)
+
+            bull = (price > ema200) & (st > 0) & (sma3 > sma5) & (sma5 > sma7) & (rsi >= self.p.rsi_buy)
+            bear = (price < ema200) & (st < 0) & (sma3 < sma5) & (sma5 < sma7) & (rsi <= self.p.rsi_sell)
+
+            blocked = (mins < self.p.block_same_dir_minutes) & (((last_dir == BUY) & bull) | ((last_dir == SELL) & bear))
+            reasons |= np.where(blocked, R_SAME_DIR, 0)
+
+            if self.p.require_h1_alignment:
+                h1 = _col(cols, "h1_trend", n, 0)
+                reasons |= np.where((bull & ~(h1 > 0)) | (bear & ~(h1 < 0)), R_H1, 0)
+
+            ok = reasons == 0
+            side = np.where(ok & bull, BUY, np.where(ok & bear, SELL, 0)).astype(np.int8)
+            tp_mult = np.where(adx >= self.p.adx_strong, 1.8, 1.3)
+            est_tp = np.where((atr > 0) & (price > 0), tp_mult * atr / price * 100, 0.0)
+        return {"enter": side != 0, "side": side, "tp_mult": tp_mult, "est_tp_percent": est_tp,
+                "reasons": reasons.astype(np.uint8)}
+
+    def pre_trade_many(self, cols: Dict[str, Any], side) -> Tuple[np.ndarray, np.ndarray]:
+        """Protection check per row for `side` (codes or one "BUY"/"SELL"/None); returns ok, P_* bits.
+
+        Columns: price, atr; optional prev (defaults to price), pct3, adx, ema200, supertrend.
+        """
+        price = np.asarray(cols["price"], dtype=float); n = len(price)
+        atr = np.asarray(cols["atr"], dtype=float)
+        prev = price if cols.get("prev") is None else np.asarray(cols["prev"], dtype=float)
+        pct3 = _col(cols, "pct3", n, 0.0)
+        adx = _col(cols, "adx", n, 0.0); ema200 = _col(cols, "ema200", n, 0.0)
+        st = _trend(cols, n)
+        side = _side_codes(side, n)
+
+        with np.errstate(invalid="ignore"):
+            reasons = np.where((atr > 0) & (np.abs(price - prev) > self.g.spike_1bar_atr * atr), P_SPIKE_1BAR, 0)
+            reasons |= np.where(np.abs(pct3) > self.g.move_3bars_pct, P_MOVE_3BARS, 0)
+            strong = adx >= 28.0
+            counter = (((side == BUY) & ~((price > ema200) & (st > 0)))
+                       | ((side == SELL) & ~((price < ema200) & (st < 0))))
+            reasons |= np.where(strong & counter, P_COUNTER_TREND, 0)
+        return reasons == 0, reasons.astype(np.uint8)
+
+    def reason_text(self, bits: int, pre: bool = False) -> List[str]:
+        """The log strings for one row's reason bits (decide's, or pre_trade's with pre=True)."""
+        if pre:
+            names = ((P_SPIKE_1BAR, f"1bar spike>{self.g.spike_1bar_atr}*ATR"),
+                     (P_MOVE_3BARS, f"3bars>{self.g.move_3bars_pct}%"),
+                     (P_COUNTER_TREND, "Counter-trend (strong ADX)"))
+        else:
+            names = ((R_RANGE, f"Range<{self.p.range_min_pct}%"), (R_ADX, f"ADX<{self.p.adx_min}"),
+                     (R_SPIKE, "Spike bar"), (R_SAME_DIR, f"SameDir<{self.p.block_same_dir_minutes}m"),
+                     (R_H1, "H1 not aligned"))
+        return [text for bit, text in names if int(bits) & bit]
+
+    # ---- one tick ----
     def decide(self, s: Dict[str, Any]) -> Dict[str, Any]:
-        r: List[str] = []
-        price=s["price"]; atr=s["atr"]; ema200=s["ema200"]; rsi=s["rsi"]; adx=s["adx"]
-        st = 1 if int(s.get("supertrend", 1))>0 else -1
-        sma3, sma5, sma7 = s["sma3"], s["sma5"], s["sma7"]
-        prange = s["range"]; last_dir=s.get("last_direction")
-        mins = int(s.get("mins_since_last_trade", 9_999)); spike=bool(s.get("spike", False))
-
-        ok=True
-        if prange < self.p.range_min_pct: ok=False; r.append(f"Range<{self.p.range_min_pct}%")
-        if adx < self.p.adx_min:          ok=False; r.append(f"ADX<{self.p.adx_min}")
-        if spike:                         ok=False; r.append("Spike bar")
-
-        bull = (price>ema200 and st>0 and sma3>sma5> sma7 and rsi>=self.p.rsi_buy)
-        bear = (price<ema200 and st<0 and sma3<sma5<sma7 and rsi<=self.p.rsi_sell)
-
-        if last_dir and mins < self.p.block_same_dir_minutes:
-            if (last_dir=="BUY" and bull) or (last_dir=="SELL" and bear):
-                ok=False; r.append(f"SameDir<{self.p.block_same_dir_minutes}m")
-
-        side = "BUY" if (ok and bull) else ("SELL" if (ok and bear) else None)
-        tp_mult = 1.8 if adx>=self.p.adx_strong else 1.3
-        est_tp_pct = (tp_mult*atr/price*100) if (atr>0 and price>0) else 0.0
-        return {"enter": bool(side) and ok, "side": side, "reasons": r if not side else [],
-                "est_tp_percent": est_tp_pct, "min_tp_percent": self.p.min_tp_percent, "tp_mult": tp_mult}
+        cols = {k: [v] for k, v in s.items()}
+        cols["last_direction"] = s.get("last_direction")
+        d = self.decide_many(cols)
+        side = SIDES[int(d["side"][0])]
+        return {"enter": bool(d["enter"][0]), "side": side, "reasons": self.reason_text(d["reasons"][0]),
+                "est_tp_percent": float(d["est_tp_percent"][0]), "min_tp_percent": self.p.min_tp_percent,
+                "tp_mult": float(d["tp_mult"][0])}
 
     def pre_trade(self, s: Dict[str, Any], side: Optional[str]):
-        ok=True; r=[]
-        price=s["price"]; prev=s.get("prev", price); atr=s["atr"]; pct3=float(s.get("pct3", 0.0))
-        if atr>0 and abs(price-prev)>self.g.spike_1bar_atr*atr: ok=False; r.append(f"1bar spike>{self.g.spike_1bar_atr}*ATR")
-        if abs(pct3)>self.g.move_3bars_pct: ok=False; r.append(f"3bars>{self.g.move_3bars_pct}%")
-        adx=s.get("adx",0.0); ema200=s.get("ema200",0.0); st=1 if int(s.get("supertrend",1))>0 else -1
-        if side=="BUY" and adx>=28.0 and not(price>ema200 and st>0): ok=False; r.append("Counter-trend (strong ADX)")
-        if side=="SELL" and adx>=28.0 and not(price<ema200 and st<0): ok=False; r.append("Counter-trend (strong ADX)")
-        return ok, r
+        ok, bits = self.pre_trade_many({k: [v] for k, v in s.items()}, side)
+        return bool(ok[0]), self.reason_text(bits[0], pre=True)
@@ -0,0 +1,197 @@
+# sweep.py — Params/Guard grid search over candle history on every core (no API calls)
+#
+# Candles and indicator columns are computed once in the parent and packed
+# into a single shared-memory block; worker processes map it as read-only
+# NumPy views, so a task is just a dict of parameter overrides.  Each grid
+# cell only re-runs the (cheap) signal masks and trade walk of backtest.py.
+# Results stream back unordered and a ranked table is reprinted as they land.
+import argparse
+import csv
+import heapq
+import itertools
+import os
+import time
+from dataclasses import fields, replace
+from multiprocessing import Pool, shared_memory
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from backtest import BacktestConfig, compute_features, load_csv, run_backtest, synthetic_candles
+from strategy_upgrade import Params, Guard
+
+PARAM_FIELDS = {f.name: f.type for f in fields(Params)}
+GUARD_FIELDS = {f.name: f.type for f in fields(Guard)}
+
+_shared: Dict[str, Any] = {}      # per-worker views into the shared block
+
+
+# ---------- grid ----------
+def _cast(name: str, raw: str):
+    kind = PARAM_FIELDS.get(name, GUARD_FIELDS.get(name))
+    if kind in (bool, "bool"):
+        return raw.strip().lower() in ("1", "true", "yes", "on")
+    if kind in (int, "int"):
+        return int(float(raw))
+    return float(raw)
+
+
+def parse_axis(spec: str) -> Tuple[str, List[Any]]:
+    """'rsi_buy=50:60:2' (inclusive range) or 'adx_min=20,23,26' -> (name, values)."""
+    name, _, values = spec.partition("=")
+    name = name.strip()
+    if name not in PARAM_FIELDS and name not in GUARD_FIELDS:
+        raise ValueError(f"unknown Params/Guard field: {name}")
+    if ":" in values:
+        start, stop, step = (float(v) for v in values.split(":"))
+        points = np.arange(start, stop + step / 2, step)
+        return name, [_cast(name, repr(round(float(v), 10))) for v in points]
+    return name, [_cast(name, v) for v in values.split(",")]
+
+
+def iter_grid(axes: List[Tuple[str, List[Any]]]) -> Iterator[Dict[str, Any]]:
+    names = [n for n, _ in axes]
+    for combo in itertools.product(*(v for _, v in axes)):
+        yield dict(zip(names, combo))
+
+
+def split_overrides(overrides: Dict[str, Any], base_params: Params = Params(), base_guard: Guard = Guard()):
+    p = replace(base_params, **{k: v for k, v in overrides.items() if k in PARAM_FIELDS})
+    g = replace(base_guard, **{k: v for k, v in overrides.items() if k in GUARD_FIELDS})
+    return p, g
+
+
+# ---------- shared memory ----------
+def share_arrays(arrays: Dict[str, np.ndarray]) -> Tuple[shared_memory.SharedMemory, Dict[str, Any]]:
+    """Copy equal-length 1-D arrays into one shared block; returns (block, layout for workers)."""
+    names = list(arrays)
+    n = len(next(iter(arrays.values())))
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(names) * n * 8))
+    block = np.ndarray((len(names), n), dtype=np.float64, buffer=shm.buf)
+    for i, name in enumerate(names):
+        block[i] = arrays[name]
+    return shm, {"name": shm.name, "columns": names, "length": n}
+
+
+def attach_arrays(layout: Dict[str, Any]) -> Tuple[shared_memory.SharedMemory, Dict[str, np.ndarray]]:
+    # workers share the parent's resource tracker, so attaching re-registers the same
+    # name and the parent's unlink() remains the single cleanup
+    shm = shared_memory.SharedMemory(name=layout["name"])
+    block = np.ndarray((len(layout["columns"]), layout["length"]), dtype=np.float64, buffer=shm.buf)
+    block.flags.writeable = False
+    return shm, {name: block[i] for i, name in enumerate(layout["columns"])}
+
+
+def _init_worker(layout: Dict[str, Any], candle_cols: List[str], config: BacktestConfig, interval: str):
+    shm, arrays = attach_arrays(layout)
+    _shared.update(shm=shm, config=config, interval=interval,
+                   candles={k: arrays[k] for k in candle_cols},
+                   features={k[2:]: v for k, v in arrays.items() if k.startswith("f:")})
+
+
+def _evaluate(task: Tuple[int, Dict[str, Any]]) -> Tuple[int, Dict[str, Any], Dict[str, Any]]:
+    index, overrides = task
+    p, g = split_overrides(overrides)
+    result = run_backtest(_shared["candles"], p, g, _shared["config"], _shared["interval"],
+                          features=_shared["features"])
+    return index, overrides, result["stats"]
+
+
+# ---------- ranking ----------
+class RankedTable:
+    """Best `top` results by one stats key, kept while results stream in."""
+
+    def __init__(self, rank_by: str = "return_pct", top: int = 20, min_trades: int = 1):
+        self.rank_by = rank_by; self.top = top; self.min_trades = min_trades
+        self._heap: List[Tuple[float, int, Dict[str, Any], Dict[str, Any]]] = []
+        self.seen = 0
+
+    def add(self, index: int, overrides: Dict[str, Any], stats: Dict[str, Any]):
+        self.seen += 1
+        if stats["trades"] < self.min_trades:
+            return
+        item = (float(stats[self.rank_by]), -index, overrides, stats)
+        if len(self._heap) < self.top:
+            heapq.heappush(self._heap, item)
+        elif item[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, item)
+
+    def rows(self) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        return [(o, s) for _, _, o, s in sorted(self._heap, key=lambda x: x[:2], reverse=True)]
+
+    def render(self, total: Optional[int] = None) -> str:
+        done = f"{self.seen}/{total}" if total else str(self.seen)
+        lines = [f"🏁 Top {self.top} by {self.rank_by} ({done} evaluated)"]
+        for rank, (overrides, stats) in enumerate(self.rows(), 1):
+            knobs = " ".join(f"{k}={v}" for k, v in overrides.items())
+            lines.append(f"{rank:>3}. {self.rank_by}={stats[self.rank_by]:.3f} trades={stats['trades']} "
+                         f"win={stats['win_rate']:.1f}% pf={stats['profit_factor']:.2f} "
+                         f"dd={stats['max_drawdown_pct']:.1f}% | {knobs}")
+        return "\n".join(lines)
+
+
+def run_sweep(candles: Dict[str, np.ndarray], axes: List[Tuple[str, List[Any]]],
+              config: Optional[BacktestConfig] = None, interval: str = "15m",
+              processes: Optional[int] = None, table: Optional[RankedTable] = None,
+              out_path: Optional[str] = None, report_every: int = 0) -> RankedTable:
+    """Evaluate every grid cell; results stream into `table` (and `out_path` CSV) as they finish."""
+    config = config or BacktestConfig()
+    table = table or RankedTable()
+    features = compute_features(candles)
+    columns = {k: np.asarray(v, dtype=float) for k, v in candles.items()}
+    columns.update({f"f:{k}": np.asarray(v, dtype=float) for k, v in features.items()})
+    shm, layout = share_arrays(columns)
+    total = int(np.prod([len(v) for _, v in axes])) if axes else 1
+    writer = out_file = None
+    try:
+        if out_path:
+            out_file = open(out_path, "w", newline="")
+            writer = csv.writer(out_file)
+        tasks = enumerate(iter_grid(axes))
+        processes = processes or os.cpu_count() or 1
+        chunksize = max(1, min(64, total // (processes * 8)))
+        with Pool(processes, initializer=_init_worker,
+                  initargs=(layout, list(candles), config, interval)) as pool:
+            for index, overrides, stats in pool.imap_unordered(_evaluate, tasks, chunksize):
+                table.add(index, overrides, stats)
+                if writer is not None:
+                    if table.seen == 1:
+                        writer.writerow(["index", *overrides, *stats])
+                    writer.writerow([index, *overrides.values(), *stats.values()])
+                if report_every and table.seen % report_every == 0:
+                    print(table.render(total), flush=True)
+    finally:
+        if out_file is not None:
+            out_file.close()
+        shm.close(); shm.unlink()
+    return table
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Grid-search Params/Guard over candle history")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("csv", nargs="?", help="candles CSV (see backtest.py)")
+    src.add_argument("--synthetic", type=int, metavar="BARS", help="use a random walk of BARS candles")
+    ap.add_argument("--grid", action="append", default=[], metavar="FIELD=SPEC",
+                    help="axis, e.g. rsi_buy=50:60:2 or adx_min=20,23,26 (repeatable)")
+    ap.add_argument("--interval", default="15m")
+    ap.add_argument("--rank", default="return_pct", help="stats key to rank by")
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--min-trades", type=int, default=10)
+    ap.add_argument("--processes", type=int, default=None)
+    ap.add_argument("--report-every", type=int, default=200)
+    ap.add_argument("--out", help="stream every result to this CSV")
+    args = ap.parse_args(argv)
+
+    candles = load_csv(args.csv) if args.csv else synthetic_candles(args.synthetic, args.interval)
+    axes = [parse_axis(spec) for spec in args.grid]
+    started = time.perf_counter()
+    table = run_sweep(candles, axes, interval=args.interval, processes=args.processes,
+                      table=RankedTable(args.rank, args.top, args.min_trades),
+                      out_path=args.out, report_every=args.report_every)
+    print(table.render())
+    print(f"⏱️ {table.seen} combinations in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
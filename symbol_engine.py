@@ -0,0 +1,482 @@
+# symbol_engine.py — one trading engine per symbol, many symbols in one process
+#
+# A SymbolEngine owns everything that main.py keeps in module globals for its
+# single SYMBOL: the kline buffer, running indicators, the order lifecycle
+# and the open position.  Engines never talk to the network directly; they
+# share one ExchangeClient (one keep-alive pool, one rate limiter), and a
+# MultiSymbolRunner steps all of them from a small shared thread pool, so
+# ten pairs cost ten small objects instead of ten interpreters.  Orders go
+# through the same OrderExecutor as main.py's single-symbol loop (execution.py),
+# and time is read through a clock (clock.py) so engines can run virtually.
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from clock import SystemClock
+from exchange_client import BalanceCache, ExchangeClient
+from execution import OrderExecutor, order_payload, fill_price, fill_quantity, exit_reason, realized_profit
+from indicator_engine import IndicatorEngine
+from kline_store import KlineStore, parse_kline_rows, sync_klines
+from order_lifecycle import PositionLifecycle, PENDING, FILLED, PROTECTED, CLOSING, CLOSED
+from strategy_upgrade import StrategyUpgrade, Params, Guard
+from timeframes import MultiTimeframe
+from trade_journal import TradeJournal
+from warm_start import load_snapshot, save_snapshot
+from trading_state import TradingState, StatePublisher
+
+
+def _num(snapshot: Dict[str, float], key: str, default: float = 0.0) -> float:
+    value = snapshot.get(key, default)
+    return default if value != value else value
+
+
+class SymbolEngine:
+    """Market data, indicators, decision and position state of one symbol."""
+
+    def __init__(self, symbol: str, client: ExchangeClient, interval: str = "15m",
+                 strategy: Optional[StrategyUpgrade] = None, leverage: float = 10,
+                 min_atr: float = 0.001, min_tp_percent: float = 0.75, tolerance: float = 0.0005,
+                 cooldown: float = 600, price_precision: int = 5, quantity_precision: int = 2,
+                 kline_window: int = 200, kline_capacity: int = 1000, fill_timeout: float = 2.0,
+                 close_retry: float = 5.0, journal: Optional[TradeJournal] = None, warm_path: Optional[str] = None,
+                 clock=None):
+        self.symbol = symbol
+        self.client = client
+        self.clock = clock or SystemClock()
+        self.orders = OrderExecutor(symbol, client.request, price_precision, log=self.log)
+        self.interval = interval
+        self.strategy = strategy or StrategyUpgrade(Params(), Guard())
+        self.leverage = leverage
+        self.min_atr = min_atr
+        self.min_tp_percent = min_tp_percent
+        self.tolerance = tolerance
+        self.cooldown = cooldown
+        self.price_precision = price_precision
+        self.quantity_precision = quantity_precision
+        self.kline_window = kline_window
+        self.fill_timeout = fill_timeout
+        self.close_retry = close_retry
+        self.journal = journal
+        self.warm_path = warm_path
+        self.balance_cache: Optional[BalanceCache] = None     # shared account balance, set by the runner
+        self.balance_settle = 10.0
+        self._warm_saved: Optional[float] = None
+
+        self.store = KlineStore(symbol, interval, capacity=kline_capacity)
+        self.indicators = IndicatorEngine()
+        self.timeframes = MultiTimeframe(symbol, interval)
+        self.lifecycle: Optional[PositionLifecycle] = None
+        self.snapshot: Dict[str, float] = {}
+
+        self.position_open = False
+        self.position_side: Optional[str] = None
+        self.entry_price = 0.0
+        self.tp_price = 0.0
+        self.sl_price = 0.0
+        self.quantity = 0.0
+        self.price = 0.0
+        self.atr = 0.0
+        self.pnl = 0.0
+        self.last_direction: Optional[str] = None
+        self.last_trade_time = 0.0
+
+        self.total_trades = 0
+        self.successful_trades = 0
+        self.failed_trades = 0
+        self.compound_profit = 0.0
+        self.trade_log = deque(maxlen=20)
+        self.state = StatePublisher(TradingState(symbol=symbol))
+
+    def log(self, message: str):
+        print(f"[{self.symbol}] {message}")
+
+    def clock_text(self) -> str:
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.clock.time()))
+
+    # ---- market data ----
+    def fetch_klines(self, limit, start_time=None, end_time=None):
+        params = {"symbol": self.symbol, "interval": self.interval, "limit": limit}
+        if start_time is not None:
+            params["startTime"] = int(start_time)
+        if end_time is not None:
+            params["endTime"] = int(end_time)
+        response = self.client.request("GET", "/openApi/swap/v2/quote/klines", params=params, signed=False)
+        if response is None:
+            return None
+        return parse_kline_rows(response.get("data", []))
+
+    def refresh(self) -> Optional[Dict[str, np.ndarray]]:
+        """Sync the kline buffer and indicators; returns views of the newest window."""
+        if not sync_klines(self.store, self.fetch_klines, initial_limit=self.kline_window):
+            return None
+        candles = self.store.view(self.kline_window)
+        if len(candles["close"]) < 50:
+            return None
+        self.snapshot = self.indicators.sync(candles["timestamp"], candles["high"], candles["low"], candles["close"])
+        self.timeframes.update(self.store.view())
+        if self.warm_path and self.indicators.last_timestamp != self._warm_saved:
+            if save_snapshot(self.warm_path, self.store, self.indicators):
+                self._warm_saved = self.indicators.last_timestamp
+        self.price = float(candles["close"][-1])
+        self.atr = _num(self.snapshot, "atr", self.min_atr)
+        return candles
+
+    # ---- decision ----
+    def tp_sl(self, entry_price: float, atr: float, side: str):
+        return self.orders.tp_sl(entry_price, atr, side)
+
+    def signal(self, close: np.ndarray) -> Optional[str]:
+        """Side to enter on this pass, or None; the same filters as main_bot_loop."""
+        s = self.snapshot
+        now = self.clock.time()
+        state = {
+            "price": self.price, "atr": self.atr, "ema200": _num(s, "ema200"), "rsi": _num(s, "rsi_prev"),
+            "adx": _num(s, "adx"), "range": _num(s, "range"),
+            "supertrend": 1 if _num(s, "supertrend_dir") > 0 else -1,
+            "sma3": _num(s, "sma3"), "sma5": _num(s, "sma5"), "sma7": _num(s, "sma7"),
+            "last_direction": self.last_direction,
+            "mins_since_last_trade": int((now - self.last_trade_time) / 60),
+            "spike": abs(close[-1] - close[-2]) > 1.8 * self.atr,
+            "h1_trend": self.timeframes.trend("1h"),
+        }
+        dec = self.strategy.decide(state)
+        ok_pre, _ = self.strategy.pre_trade({
+            **state, "prev": float(close[-2]),
+            "pct3": float((close[-1] - close[-4]) / close[-4] * 100) if len(close) >= 4 else 0.0,
+        }, dec["side"])
+        if not (dec["enter"] and ok_pre):
+            return None
+        side = dec["side"]
+        if now - self.last_trade_time < self.cooldown or state["spike"] or state["range"] <= 1.5:
+            return None
+        if state["adx"] < 20 or side == self.last_direction:
+            return None
+        tp, _ = self.tp_sl(self.price, max(self.atr, self.min_atr), side)
+        tp_percent = abs(tp - self.price) / self.price * 100
+        if tp_percent < self.min_tp_percent or dec["est_tp_percent"] < dec["min_tp_percent"]:
+            return None
+        return side
+
+    def step(self, trade_usdt: float, budget: Optional[Callable[[], float]] = None) -> bool:
+        """One loop pass: advance orders, refresh data, manage the position, maybe enter.
+
+        `trade_usdt` is the margin this engine may commit on a new entry, from
+        the cached balance; `budget()`, if given, recomputes it from a fresh
+        balance read just before an order is sent and can only shrink it.
+        Returns True when the pass completed with fresh market data.
+        """
+        try:
+            self.advance_orders()
+            candles = self.refresh()
+            if candles is None:
+                self.log("❌ Failed to get market data")
+                return False
+            self.check_position()
+            if self.position_open or self.entry_pending() or trade_usdt <= 0 or self.price <= 0:
+                return True
+            side = self.signal(candles["close"])
+            if side:
+                if budget is not None:
+                    trade_usdt = min(trade_usdt, budget())
+                step = 10 ** self.quantity_precision     # round down: the budget may be all the free margin
+                quantity = float(np.floor(trade_usdt * self.leverage / self.price * step) / step)
+                self.log(f"🚀 PRO SIGNAL {side}")
+                self.place_order(side, quantity)
+            return True
+        except Exception as e:
+            self.log(f"❌ Unexpected error: {e}")
+            return False
+        finally:
+            self.publish()
+
+    # ---- orders ----
+    def entry_pending(self) -> bool:
+        return self.lifecycle is not None and self.lifecycle.state == PENDING
+
+    def place_order(self, side: str, quantity: float) -> bool:
+        if self.position_open or self.entry_pending() or quantity <= 0:
+            return False
+        atr = max(self.atr, self.min_atr)
+        response = self.orders.market(side, quantity)
+        if not (response and response.get("code") == 0):
+            self.log(f"❌ Failed to place {side} order: {response.get('msg') if response else 'Unknown error'}")
+            return False
+        order_data = order_payload(response["data"])
+        lifecycle = PositionLifecycle(side, quantity, order_data.get("orderId"),
+                                      deadline=self.clock.time() + self.fill_timeout, clock=self.clock.time)
+        lifecycle.meta["atr"] = atr
+        self.lifecycle = lifecycle
+        if lifecycle.on_order_update(order_data) == FILLED or not order_data.get("orderId"):
+            return self.on_entry_filled(lifecycle, order_data)
+        self.log(f"⏳ {side} order {order_data.get('orderId')} sent — waiting for fill confirmation")
+        return True
+
+    def on_entry_filled(self, lifecycle: PositionLifecycle, order_data: Dict[str, Any]) -> bool:
+        if lifecycle.state == PENDING:
+            lifecycle.transition(FILLED, "fill assumed from order response")
+        price = fill_price(order_data)
+        self.entry_price = price if price is not None else self.price
+        filled = fill_quantity(order_data)
+        if filled is not None and filled != lifecycle.quantity:
+            self.log(f"⚠️ Filled {filled} of {lifecycle.quantity} — sizing TP/SL to the fill")
+            lifecycle.quantity = filled
+        self.position_side = lifecycle.side
+        self.quantity = lifecycle.quantity
+        self.position_open = True
+        self.tp_price, self.sl_price = self.tp_sl(self.entry_price, lifecycle.meta.get("atr", self.min_atr),
+                                                  lifecycle.side)
+        self.last_trade_time = lifecycle.created_at
+        if self.balance_cache is not None:
+            self.balance_cache.invalidate()
+        if self.journal is not None:
+            self.journal.record_entry(self.symbol, lifecycle.side, self.entry_price, self.quantity,
+                                      self.last_trade_time)
+        self.log(f"{'🟢 BUY' if lifecycle.side == 'BUY' else '🔴 SELL'} @ {self.entry_price} "
+                 f"| 🎯 TP {self.tp_price} | 🛑 SL {self.sl_price}")
+        if not self.protect():
+            self.log("🛑 Trade aborted - protection orders failed")
+            return False
+        lifecycle.transition(PROTECTED, "TP/SL placed")
+        return True
+
+    def protect(self) -> bool:
+        """Place TP and SL legs; if either is rejected the other is cancelled and the position closed.
+
+        A close that is not confirmed leaves the lifecycle CLOSING with a retry
+        deadline, and advance_orders closes it again once that passes.
+        """
+        failure = self.orders.bracket(self.position_side, self.quantity, self.tp_price, self.sl_price)
+        if failure is None:
+            return True
+        self.close_position(failure)
+        lifecycle = self.lifecycle
+        if self.position_open and lifecycle is not None and lifecycle.active:
+            self.log(f"⚠️ Close not confirmed — retrying every {self.close_retry:.0f}s")
+            lifecycle.meta["close_reason"] = failure
+            lifecycle.transition(CLOSING, "protection failed", deadline=self.clock.time() + self.close_retry)
+        return False
+
+    def advance_orders(self):
+        lifecycle = self.lifecycle
+        if lifecycle is not None and lifecycle.state == CLOSING and self.position_open:
+            if lifecycle.expired():
+                self.retry_close(lifecycle)
+            return
+        if lifecycle is None or lifecycle.state != PENDING:
+            return
+        outcome, order_data = self.orders.poll_entry(lifecycle)
+        if outcome == "filled":
+            self.on_entry_filled(lifecycle, order_data)
+        elif outcome == "not_filled":
+            self.log(f"❌ {lifecycle.side} order {lifecycle.order_id} was not filled")
+        elif outcome == "fill_timeout":
+            self.log(f"⚠️ {lifecycle.side} order {lifecycle.order_id} not filled in time — cancelled")
+
+    def retry_close(self, lifecycle: PositionLifecycle) -> bool:
+        """Close an unprotected position again, unless the exchange shows it is already gone."""
+        answered, position = self.orders.position()
+        if answered and (position is None or position["side"] != self.position_side):
+            self.log("⚠️ Unprotected position is no longer on the exchange — recording it as aborted")
+            if self.journal is not None:
+                self.journal.record_abort(self.symbol, self.position_side, self.entry_price, self.quantity,
+                                          "ABORTED", self.clock.time())
+            if self.balance_cache is not None:
+                self.balance_cache.invalidate(self.balance_settle)
+            self.position_open = False
+            self.position_side = None
+            self.entry_price = self.tp_price = self.sl_price = self.quantity = 0.0
+            lifecycle.transition(CLOSED, "ABORTED")
+            return True
+        if answered:
+            self.quantity = position["positionAmt"]
+            if self.close_position(lifecycle.meta.get("close_reason", "NO_PROTECTION")):
+                return True
+        lifecycle.deadline = self.clock.time() + self.close_retry
+        return False
+
+    def open_position(self) -> Optional[Dict[str, Any]]:
+        return self.orders.open_position()
+
+    def resume(self) -> bool:
+        """Adopt a position left open by a previous run and re-protect it."""
+        position = self.open_position()
+        if not position:
+            return False
+        self.position_side = position["side"]
+        self.entry_price = position["entryPrice"]
+        self.quantity = position["positionAmt"]
+        self.position_open = True
+        self.lifecycle = PositionLifecycle(self.position_side, self.quantity, state=FILLED, clock=self.clock.time)
+        self.tp_price, self.sl_price = self.tp_sl(self.entry_price, max(self.atr, self.min_atr), self.position_side)
+        self.log(f"▶️ Resuming {self.position_side} @ {self.entry_price}")
+        if self.protect():
+            self.lifecycle.transition(PROTECTED, "TP/SL placed on resume")
+        return True
+
+    def check_position(self):
+        if not self.position_open:
+            return
+        self.pnl = realized_profit(self.position_side, self.entry_price, self.price, self.quantity)
+        reason = exit_reason(self.position_side, self.price, self.tp_price, self.sl_price, self.tolerance)
+        if reason is not None:
+            self.log(f"{'✅' if reason == 'TP' else '🛑'} {reason} condition met at {self.price}")
+            self.close_position(reason)
+
+    def close_position(self, reason: str) -> bool:
+        if not self.position_open or self.position_side is None:
+            return False
+        lifecycle = self.lifecycle if self.lifecycle is not None and self.lifecycle.active else None
+        state_before = lifecycle.state if lifecycle is not None else None
+        if lifecycle is not None:
+            lifecycle.transition(CLOSING, reason)
+        response = self.orders.close(self.position_side, self.quantity)
+        if not (response and response.get("code") == 0):
+            self.log(f"❌ Failed to close position: {response.get('msg') if response else 'Unknown error'}")
+            if lifecycle is not None:
+                lifecycle.transition(state_before, "close rejected")
+            return False
+
+        exit_price = fill_price(order_payload(response["data"]))
+        if exit_price is None:
+            exit_price = self.price
+        profit = realized_profit(self.position_side, self.entry_price, exit_price, self.quantity)
+        self.compound_profit += profit
+        self.total_trades += 1
+        if reason == "TP":
+            self.successful_trades += 1
+        else:
+            self.failed_trades += 1
+        trade = {"side": self.position_side, "entry_price": self.entry_price, "exit_price": exit_price,
+                 "result": reason, "profit": profit, "time": self.clock_text()}
+        self.trade_log.appendleft(trade)
+        self.log(f"💼 Closed {self.position_side} @ {exit_price} | 📈 {profit:.4f} USDT | 🛑 {reason}")
+        self.last_direction = self.position_side
+        self.last_trade_time = self.clock.time()
+        if self.journal is not None:
+            self.journal.record_close(self.symbol, trade, self.quantity, self.last_trade_time)
+        if self.balance_cache is not None:
+            self.balance_cache.invalidate(self.balance_settle)
+        self.position_open = False
+        self.position_side = None
+        self.entry_price = self.tp_price = self.sl_price = self.quantity = 0.0
+        if lifecycle is not None:
+            lifecycle.transition(CLOSED, reason)
+        return True
+
+    def restore(self) -> bool:
+        """Reload the warm-start snapshot, then counters, recent trades and cooldown state from the journal."""
+        if self.warm_path and load_snapshot(self.warm_path, self.store, self.indicators):
+            self._warm_saved = self.indicators.last_timestamp
+            self.log(f"♨️ Warm start: {self.store.size} candles from {self.warm_path}")
+        if self.journal is None:
+            return False
+        saved = self.journal.recover(self.symbol, self.trade_log.maxlen)
+        self.total_trades = saved["total_trades"]
+        self.successful_trades = saved["successful_trades"]
+        self.failed_trades = saved["failed_trades"]
+        self.compound_profit = saved["compound_profit"]
+        self.last_direction = saved["last_direction"]
+        self.last_trade_time = saved["last_trade_time"]
+        self.trade_log.clear()
+        self.trade_log.extend(saved["trade_log"])
+        return True
+
+    def publish(self) -> TradingState:
+        """Publish this engine's values as one immutable snapshot for other threads."""
+        s = self.snapshot
+        return self.state.publish(
+            position_open=self.position_open, position_side=self.position_side, entry_price=self.entry_price,
+            tp_price=self.tp_price, sl_price=self.sl_price, quantity=self.quantity, pnl=self.pnl,
+            current_price=self.price, ema_200=_num(s, "ema200"), rsi=_num(s, "rsi_prev"), adx=_num(s, "adx"),
+            atr=self.atr, total_trades=self.total_trades, successful_trades=self.successful_trades,
+            failed_trades=self.failed_trades, compound_profit=self.compound_profit, trade_log=self.trade_log,
+            lifecycle_state=self.lifecycle.state if self.lifecycle is not None else None,
+            update_time=self.clock_text())
+
+    def status(self) -> Dict[str, Any]:
+        """Latest published snapshot as a dict; safe to call from any thread."""
+        return self.state.snapshot().as_dict()
+
+
+class MultiSymbolRunner:
+    """Steps many SymbolEngines over one client from a bounded worker pool.
+
+    The account balance is read once per pass and the trade portion is split
+    evenly between engines, so concurrent entries cannot over-commit margin.
+    """
+
+    def __init__(self, engines: List[SymbolEngine], client: ExchangeClient, trade_portion: float = 0.60,
+                 idle_seconds: float = 60, open_seconds: float = 15, fill_poll: float = 0.25,
+                 workers: Optional[int] = None, balance_ttl: float = 300, balance_settle: float = 10,
+                 clock=None):
+        self.engines = engines
+        self.client = client
+        self.clock = clock or SystemClock()
+        self.trade_portion = trade_portion
+        self.idle_seconds = idle_seconds
+        self.open_seconds = open_seconds
+        self.fill_poll = fill_poll
+        self.pool = ThreadPoolExecutor(max_workers=workers or min(8, len(engines)),
+                                       thread_name_prefix="engine")
+        self.initial_balance = 0.0
+        self.balance = 0.0
+        self.balance_cache = BalanceCache(client.usdt_balance, balance_ttl, clock=self.clock.time)
+        for engine in engines:
+            engine.balance_cache = self.balance_cache
+            engine.balance_settle = balance_settle
+
+    @property
+    def compound_profit(self) -> float:
+        return sum(e.compound_profit for e in self.engines)
+
+    def start(self) -> bool:
+        balance = self.balance_cache.refresh()
+        if not balance or balance <= 0:
+            print("❌ Error: Initial balance is not positive")
+            return False
+        self.initial_balance = self.balance = balance
+        for engine in self.engines:
+            engine.restore()
+        list(self.pool.map(lambda e: e.refresh() and e.resume(), self.engines))
+        return True
+
+    def share(self, balance: float) -> float:
+        """Margin one engine may commit: an even split of the compounding portion, capped by `balance`."""
+        total = self.initial_balance + self.compound_profit
+        return min(total * self.trade_portion, balance) / len(self.engines)
+
+    def entry_budget(self) -> float:
+        """Share from a fresh balance read, for an engine about to send an order."""
+        balance = self.balance_cache.refresh()
+        return self.share(balance) if balance is not None else 0.0
+
+    def run_once(self) -> List[bool]:
+        balance = self.balance_cache.get()
+        if balance is not None:
+            self.balance = balance
+        share = self.share(self.balance)
+        return list(self.pool.map(lambda e: e.step(share, self.entry_budget), self.engines))
+
+    def run_forever(self):
+        if not self.start():
+            return
+        print(f"🚀 Trading {', '.join(e.symbol for e in self.engines)} in one process")
+        while True:
+            self.run_once()
+            wait = self.open_seconds if any(e.position_open for e in self.engines) else self.idle_seconds
+            deadline = self.clock.time() + wait
+            while self.clock.time() < deadline:
+                pending = [e for e in self.engines if e.entry_pending()]
+                if pending:
+                    list(self.pool.map(SymbolEngine.advance_orders, pending))
+                    for engine in pending:
+                        engine.publish()
+                    self.clock.sleep(self.fill_poll)
+                else:
+                    self.clock.sleep(min(1.0, max(0.0, deadline - self.clock.time())))
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [e.status() for e in self.engines]
@@ -0,0 +1,79 @@
+# Tests import the flat modules at the repository root (main.py, market_stream.py, ...)
+import os
+import sys
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+import main  # noqa: E402
+from backtest import synthetic_candles  # noqa: E402
+from clock import VirtualClock  # noqa: E402
+from exchange_client import BalanceCache  # noqa: E402
+from exchange_sim import PaperClient, SimConfig, SimExchange  # noqa: E402
+from trade_journal import TradeJournal  # noqa: E402
+
+# main.py globals the order path reads or writes; restored after every test
+MAIN_STATE = ("exchange", "balance_cache", "journal", "clock", "trade_log", "position_open", "position_side",
+              "entry_price", "current_quantity", "tp_price", "sl_price", "current_price", "current_atr",
+              "adx_value", "position_lifecycle", "last_trade_time", "last_direction", "initial_balance",
+              "compound_profit", "total_trades", "successful_trades", "failed_trades", "kline_store",
+              "indicators", "timeframes", "warm_start_path", "warm_saved_timestamp", "USE_STREAM",
+              "market_stream", "stream_synced_generation")
+
+
+class RecordingClient(PaperClient):
+    """PaperClient that logs every call and can reject one order type."""
+
+    def __init__(self, sim, reject=None):
+        super().__init__(sim)
+        self.reject = reject
+        self.calls = []
+
+    def request(self, method, endpoint, params=None, **kwargs):
+        params = dict(params or {})
+        self.calls.append((method, params.get("type"), params.get("orderId"), params.get("quantity")))
+        if method == "POST" and params.get("type") == self.reject:
+            return {"code": 109400, "msg": "rejected", "data": {}}
+        return super().request(method, endpoint, params, **kwargs)
+
+    def orders(self, method, kind=None):
+        return [c for c in self.calls if c[0] == method and (kind is None or c[1] == kind)]
+
+    def resting(self):
+        """The simulator's resting orders by type."""
+        return {o["type"]: o for o in self.sim._resting()}
+
+
+@pytest.fixture
+def sim():
+    candles = synthetic_candles(400, "15m", seed=3)
+    clock = VirtualClock(candles["timestamp"][300] / 1000)
+    exchange = SimExchange(candles, SimConfig(symbol=main.SYMBOL), clock=clock.time)
+    exchange.virtual_clock = clock
+    return exchange
+
+
+@pytest.fixture
+def bot(monkeypatch, tmp_path, sim):
+    """main.py wired to the simulator through a RecordingClient, flat, with a fresh journal and clock."""
+    for name in MAIN_STATE:
+        monkeypatch.setattr(main, name, getattr(main, name))
+    client = RecordingClient(sim)
+    main.exchange = client
+    main.balance_cache = BalanceCache(client.usdt_balance, main.BALANCE_TTL, clock=sim.virtual_clock.time)
+    main.journal = TradeJournal(str(tmp_path / "trades.db"))
+    main.trade_log = deque(maxlen=20)
+    main.use_clock(sim.virtual_clock)
+    main.initial_balance = sim.config.balance
+    main.compound_profit = 0.0
+    main.total_trades = main.successful_trades = main.failed_trades = 0
+    main.position_open = False
+    main.position_lifecycle = None
+    main.last_trade_time = 0.0
+    main.last_direction = None
+    main.current_price = sim.price_at(sim.now_ms())
+    main.current_atr = main.current_price * 0.01
+    main.adx_value = 30.0
+    return client
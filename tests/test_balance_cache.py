@@ -0,0 +1,54 @@
+import main
+from clock import VirtualClock
+from exchange_client import BalanceCache
+
+
+def test_serves_cached_value_until_ttl():
+    clock = VirtualClock(1000)
+    answers = iter([100.0, 90.0])
+    cache = BalanceCache(lambda: next(answers), ttl=60, clock=clock.time)
+    assert cache.get() == 100.0 and cache.get() == 100.0
+    clock.advance(60)
+    assert cache.get() == 90.0 and cache.fetches == 2
+
+
+def test_invalidate_waits_for_the_settle_delay():
+    clock = VirtualClock(1000)
+    answers = iter([100.0, 80.0])
+    cache = BalanceCache(lambda: next(answers), ttl=300, clock=clock.time)
+    cache.get()
+    cache.invalidate(10)
+    assert cache.get() == 100.0
+    clock.advance(10)
+    assert cache.get() == 80.0
+
+
+def test_invalidate_during_a_fetch_keeps_the_cache_stale():
+    clock = VirtualClock(1000)
+    answers = iter([100.0, 70.0])
+
+    def fetch():
+        value = next(answers)
+        if value == 100.0:
+            cache.invalidate()          # a fill lands while the balance request is in flight
+        return value
+
+    cache = BalanceCache(fetch, ttl=300, clock=clock.time)
+    assert cache.refresh() == 100.0
+    assert cache.get() == 70.0          # the pre-fill answer was not trusted until the TTL
+    assert cache.get() == 70.0 and cache.fetches == 2
+
+
+def test_entry_size_is_capped_by_the_fresh_balance(bot, sim):
+    sim.wallet = 20.0
+    assert main.place_order("BUY", 10_000.0)
+    sent = bot.orders("POST", "MARKET")[0][3]
+    assert sent <= 20.0 * main.LEVERAGE / main.current_price and sim.position.qty == sent
+
+
+def test_entry_is_skipped_without_free_margin(bot, sim):
+    sim.wallet = 0.0
+    skipped = main.ORDERS.labels("BUY", "skipped_balance")
+    before = skipped.value
+    assert not main.place_order("BUY", 10_000.0)
+    assert not bot.orders("POST") and skipped.value == before + 1
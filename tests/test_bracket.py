@@ -0,0 +1,19 @@
+import pytest
+
+import main
+
+
+@pytest.mark.parametrize("rejected, accepted", [("STOP_MARKET", "TAKE_PROFIT_MARKET"),
+                                                 ("TAKE_PROFIT_MARKET", "STOP_MARKET")])
+def test_rejected_leg_cancels_the_accepted_one(bot, sim, rejected, accepted):
+    bot.reject = rejected
+    assert not main.place_order("BUY", 10_000.0)
+    leg = next(o for o in sim.orders.values() if o["type"] == accepted)
+    assert leg["status"] == "CANCELED"
+    deletes = bot.orders("DELETE")
+    assert [d[2] for d in deletes] == [leg["orderId"]]
+    # the leg is cancelled before the position is flattened
+    assert bot.calls.index(deletes[0]) < len(bot.calls) - 1 and bot.calls[-1][:2] == ("POST", "MARKET")
+    assert sim.position.qty == 0 and not main.position_open and not bot.resting()
+    assert main.total_trades == 1 and main.trade_log[0]["result"] == ("NO_SL" if rejected == "STOP_MARKET"
+                                                                      else "NO_TP")
@@ -0,0 +1,24 @@
+import pytest
+
+import main
+
+
+@pytest.fixture
+def client():
+    return main.app.test_client()
+
+
+def test_page_and_state_have_separate_tags(client):
+    page = client.get("/").headers["ETag"]
+    state = client.get("/api/state").headers["ETag"]
+    assert page != state
+    assert client.get("/", headers={"If-None-Match": page}).status_code == 304
+    assert client.get("/api/state", headers={"If-None-Match": page}).status_code == 200
+    assert client.get("/api/state", headers={"If-None-Match": state}).status_code == 304
+
+
+def test_tag_from_before_a_restart_does_not_match(client, monkeypatch):
+    page = client.get("/").headers["ETag"]
+    monkeypatch.setattr(main, "BOOT_ID", "rebooted")
+    response = client.get("/", headers={"If-None-Match": page})
+    assert response.status_code == 200 and response.headers["ETag"] != page
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+import pytest
+from ta.momentum import RSIIndicator
+from ta.volatility import AverageTrueRange
+
+import main
+from indicator_arrays import supertrend
+from indicator_engine import IndicatorEngine
+
+N = 700
+
+
+@pytest.fixture(scope="module")
+def candles():
+    rng = np.random.default_rng(1)
+    close = 0.2 * np.exp(np.cumsum(rng.normal(0, 0.004, N)))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.003, N))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.003, N))
+    return pd.DataFrame({"timestamp": np.arange(N) * 900_000.0, "open": open_, "high": high, "low": low,
+                         "close": close})
+
+
+def legacy_supertrend(df, period=10, multiplier=3):
+    """The original pandas/.iloc Supertrend of main.py, kept as the reference."""
+    high, low, close = df["high"], df["low"], df["close"]
+    hl2 = (high + low) / 2
+    atr = AverageTrueRange(high=high, low=low, close=close, window=period).average_true_range()
+    upper_band = hl2 + (multiplier * atr)
+    lower_band = hl2 - (multiplier * atr)
+    direction = pd.Series(np.ones(len(close)), index=close.index)
+    for i in range(1, len(close)):
+        if close.iloc[i] > upper_band.iloc[i - 1]:
+            direction.iloc[i] = 1
+        elif close.iloc[i] < lower_band.iloc[i - 1]:
+            direction.iloc[i] = -1
+        else:
+            direction.iloc[i] = direction.iloc[i - 1]
+            if direction.iloc[i] == 1 and lower_band.iloc[i] < lower_band.iloc[i - 1]:
+                lower_band.iloc[i] = lower_band.iloc[i - 1]
+            if direction.iloc[i] == -1 and upper_band.iloc[i] > upper_band.iloc[i - 1]:
+                upper_band.iloc[i] = upper_band.iloc[i - 1]
+    line = np.where(direction == 1, lower_band, upper_band)
+    return line, direction.to_numpy()
+
+
+def legacy_values(df):
+    """Indicator values for the last row of `df` from the pandas helpers the engine replaced."""
+    close = df["close"]
+    rsi = RSIIndicator(close, 14).rsi()
+    line, direction = legacy_supertrend(df)
+    values = {
+        "atr": AverageTrueRange(df["high"], df["low"], close, 14).average_true_range().iloc[-1],
+        "rsi": rsi.iloc[-1], "rsi_prev": rsi.iloc[-2],
+        "adx": main.calculate_adx(df).iloc[-1],
+        "supertrend": line[-1], "supertrend_dir": direction[-1],
+        "range": main.price_range_percent(df),
+    }
+    for period in (20, 50, 200):
+        values[f"ema{period}"] = main.calculate_ema(close, period).iloc[-1]
+    for period in (3, 5, 7, 10, 14):
+        values[f"sma{period}"] = main.calculate_sma(close, period).iloc[-1]
+    return values
+
+
+def assert_matches(snapshot, expected):
+    for key, value in expected.items():
+        assert snapshot[key] == pytest.approx(value, rel=1e-9, abs=1e-12), key
+
+
+def test_supertrend_kernel_matches_legacy_loop(candles):
+    line, direction = supertrend(candles["high"].to_numpy(), candles["low"].to_numpy(),
+                                 candles["close"].to_numpy(), 10, 3)
+    legacy_line, legacy_direction = legacy_supertrend(candles)
+    np.testing.assert_allclose(line, legacy_line, rtol=1e-12)
+    np.testing.assert_array_equal(direction, legacy_direction)
+
+
+def test_main_supertrend_wrapper_matches_legacy_loop(candles):
+    line, direction = main.calculate_supertrend(candles)
+    legacy_line, legacy_direction = legacy_supertrend(candles)
+    np.testing.assert_allclose(line.to_numpy(), legacy_line, rtol=1e-12)
+    np.testing.assert_array_equal(direction.to_numpy(), legacy_direction)
+    assert line.index.equals(candles.index)
+
+
+@pytest.mark.parametrize("end", [200, 201, 350, 512, N - 1])
+def test_streaming_engine_matches_pandas_helpers(candles, end):
+    engine = IndicatorEngine()
+    h, l, c, ts = (candles[k].to_numpy() for k in ("high", "low", "close", "timestamp"))
+    for i in range(end - 1):
+        engine.push(h[i], l[i], c[i], ts[i])
+    # the last row is the forming candle: previewed, not committed
+    assert_matches(engine.preview(h[end - 1], l[end - 1], c[end - 1]), legacy_values(candles.iloc[:end]))
+
+
+def test_sync_of_a_fresh_window_matches_pandas_helpers(candles):
+    window = candles.iloc[100:300]
+    snapshot = IndicatorEngine().sync(window["timestamp"].to_numpy(), window["high"].to_numpy(),
+                                      window["low"].to_numpy(), window["close"].to_numpy())
+    assert_matches(snapshot, legacy_values(window))
+
+
+def sync_window(engine, window):
+    return engine.sync(window["timestamp"].to_numpy(), window["high"].to_numpy(),
+                       window["low"].to_numpy(), window["close"].to_numpy())
+
+
+def test_sliding_sync_stays_equal_to_the_window(candles):
+    engine = IndicatorEngine()
+    for end in range(200, N):
+        snapshot = sync_window(engine, candles.iloc[end - 200:end])
+        if end in (201, 260, 450, N - 1):
+            # rebased onto every window, like the batch helpers the loop ran per pass
+            assert_matches(snapshot, legacy_values(candles.iloc[end - 200:end]))
+    assert engine.count == 199 and engine.first_timestamp == candles["timestamp"].iloc[N - 201]
+
+
+def test_growing_window_and_repolls_do_not_replay(candles, monkeypatch):
+    engine = IndicatorEngine()
+    sync_window(engine, candles.iloc[:50])
+    monkeypatch.setattr(engine, "seed", lambda *a: pytest.fail("window was replayed"))
+    for end in range(51, 200):
+        snapshot = sync_window(engine, candles.iloc[:end])
+    forming = candles.iloc[:200].copy()
+    for close in (0.1, 0.3):
+        forming.iloc[-1, forming.columns.get_loc("close")] = close
+        snapshot = sync_window(engine, forming)
+    assert engine.count == 199
+    assert_matches(snapshot, legacy_values(forming))
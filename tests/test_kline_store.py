@@ -0,0 +1,119 @@
+import numpy as np
+
+from kline_store import KlineStore, interval_to_ms, sync_klines
+
+STEP = interval_to_ms("15m")
+T0 = 1_699_999_200_000            # on a 15m boundary
+
+
+def candle(i, close=None):
+    close = 0.2 + 0.001 * i if close is None else close
+    return (float(T0 + i * STEP), close - 0.0005, close + 0.001, close - 0.001, close, 1000.0 + i)
+
+
+class FakeFetch:
+    """fetch(limit, start_time=None, end_time=None) over `rows`; open-ended pages leave out `holes`."""
+
+    def __init__(self, rows, holes=(), fail=False):
+        self.rows = list(rows)
+        self.holes = set(holes)
+        self.fail = fail
+        self.calls = []
+
+    def __call__(self, limit, start_time=None, end_time=None):
+        self.calls.append((limit, start_time, end_time))
+        if self.fail:
+            return None
+        rows = [r for r in self.rows if start_time is None or r[0] >= start_time]
+        if end_time is None:
+            rows = [r for r in rows if r[0] not in self.holes]
+        else:
+            rows = [r for r in rows if r[0] <= end_time]
+        return rows[:limit] if start_time is not None else rows[-limit:]
+
+
+def timestamps(store, n=None):
+    return list(store.view(n)["timestamp"])
+
+
+def test_ring_wraps_and_views_stay_contiguous():
+    store = KlineStore("DOGE-USDT", "15m", capacity=5)
+    for i in range(12):
+        store.append(candle(i))
+    assert store.size == 5 and store.last_timestamp == candle(11)[0]
+    assert timestamps(store) == [candle(i)[0] for i in range(7, 12)]
+    assert timestamps(store, 3) == [candle(i)[0] for i in range(9, 12)]
+    view = store.view()
+    assert all(np.shares_memory(col, store._buf) for col in view.values())
+    assert list(view["close"]) == [candle(i)[4] for i in range(7, 12)]
+
+
+def test_merge_updates_the_forming_candle_and_records_gaps():
+    store = KlineStore("DOGE-USDT", "15m", capacity=10)
+    assert store.merge([candle(0), candle(1)]) == 2
+    assert store.merge([candle(0, close=9.0), candle(1, close=0.5)]) == 0     # older ignored, last updated
+    assert store.view()["close"][-2:].tolist() == [candle(0)[4], 0.5]
+    assert store.merge([candle(4)]) == 1
+    assert store.gaps == [(candle(1)[0], candle(4)[0])]
+
+
+def test_first_sync_loads_the_initial_window():
+    fetch = FakeFetch(candle(i) for i in range(300))
+    store = KlineStore("DOGE-USDT", "15m", capacity=1000)
+    assert sync_klines(store, fetch, initial_limit=200)
+    assert fetch.calls == [(200, None, None)]
+    assert store.size == 200 and store.last_timestamp == candle(299)[0]
+
+
+def test_sync_pages_forward_from_the_forming_candle():
+    fetch = FakeFetch(candle(i) for i in range(200))
+    store = KlineStore("DOGE-USDT", "15m", capacity=1000)
+    sync_klines(store, fetch, initial_limit=200)
+    fetch.rows[-1] = candle(199, close=0.5)                 # the forming candle moved on
+    fetch.rows += [candle(i) for i in range(200, 450)]
+    assert sync_klines(store, fetch, page_limit=100)
+    assert [c[1] for c in fetch.calls[1:]] == [candle(i)[0] for i in (199, 298, 397)]
+    assert store.size == 450 and not store.gaps
+    assert timestamps(store) == [candle(i)[0] for i in range(450)]
+    assert store.view()["close"][199] == 0.5
+
+
+def test_holes_in_a_page_are_backfilled_with_a_range_request():
+    fetch = FakeFetch(candle(i) for i in range(100))
+    store = KlineStore("DOGE-USDT", "15m", capacity=1000)
+    sync_klines(store, fetch, initial_limit=100)
+    fetch.rows += [candle(i) for i in range(100, 130)]
+    fetch.holes = {candle(i)[0] for i in (100, 101, 115)}  # the open-ended page skips these
+    assert sync_klines(store, fetch, page_limit=100)
+    ranges = [c for c in fetch.calls if c[2] is not None]
+    assert ranges == [(2, candle(100)[0], candle(102)[0] - 1), (1, candle(115)[0], candle(116)[0] - 1)]
+    assert timestamps(store) == [candle(i)[0] for i in range(130)] and not store.gaps
+
+
+def test_a_hole_the_exchange_cannot_fill_is_recorded():
+    fetch = FakeFetch(candle(i) for i in range(50))
+    store = KlineStore("DOGE-USDT", "15m", capacity=1000)
+    sync_klines(store, fetch, initial_limit=50)
+    fetch.rows += [candle(i) for i in range(53, 60)]          # 50..52 never existed
+    assert sync_klines(store, fetch)
+    assert store.gaps == [(candle(49)[0], candle(53)[0])] and store.size == 57
+
+
+def test_too_far_behind_reloads_the_initial_window():
+    fetch = FakeFetch(candle(i) for i in range(100))
+    store = KlineStore("DOGE-USDT", "15m", capacity=300)
+    sync_klines(store, fetch, initial_limit=100)
+    fetch.rows += [candle(i) for i in range(100, 1000)]
+    assert sync_klines(store, fetch, initial_limit=100, page_limit=100)
+    assert len([c for c in fetch.calls if c[1] is not None]) == 300 // 100 + 1
+    assert fetch.calls[-1] == (100, None, None)
+    assert timestamps(store) == [candle(i)[0] for i in range(900, 1000)]
+
+
+def test_failed_fetch_leaves_the_store_alone():
+    fetch = FakeFetch(candle(i) for i in range(50))
+    store = KlineStore("DOGE-USDT", "15m", capacity=1000)
+    sync_klines(store, fetch, initial_limit=50)
+    fetch.fail = True
+    assert not sync_klines(store, fetch)
+    assert store.size == 50 and store.last_timestamp == candle(49)[0]
@@ -0,0 +1,209 @@
+import socket
+import threading
+import time
+
+import pytest
+
+import main
+import market_stream
+from kline_store import KlineStore, interval_to_ms
+from market_stream import LocalFeedServer, MarketStream
+
+SYMBOL = "DOGE-USDT"
+INTERVAL = "15m"
+STEP = interval_to_ms(INTERVAL)
+T0 = 1_700_000_100_000 - 1_700_000_100_000 % STEP
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def candle(i, close=None):
+    close = 0.2 + 0.001 * i if close is None else close
+    return (float(T0 + i * STEP), close - 0.0005, close + 0.001, close - 0.001, close, 1000.0 + i)
+
+
+def kline_push(row):
+    return {"T": row[0], "o": f"{row[1]}", "h": f"{row[2]}", "l": f"{row[3]}", "c": f"{row[4]}", "v": f"{row[5]}"}
+
+
+class FakeRest:
+    """fetch_klines stand-in serving `rows` the way sync_klines asks for them."""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.calls = []
+
+    def __call__(self, limit, start_time=None, end_time=None):
+        self.calls.append((limit, start_time, end_time))
+        rows = self.rows
+        if start_time is not None:
+            rows = [r for r in rows if r[0] >= start_time]
+        if end_time is not None:
+            rows = [r for r in rows if r[0] <= end_time]
+        return rows[:limit] if start_time is not None else rows[-limit:]
+
+
+@pytest.fixture
+def fast_backoff(monkeypatch):
+    # the reconnect delay is backoff * uniform(0.5, 1.0); keep the tests quick
+    monkeypatch.setattr(market_stream.random, "uniform", lambda a, b: 0.01)
+
+
+@pytest.fixture
+def feed():
+    server = LocalFeedServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def stream(feed, fast_backoff):
+    s = MarketStream(feed.url, SYMBOL, INTERVAL)
+    s.start()
+    assert wait_until(lambda: s.live and feed.subscriptions == 2)
+    assert s.wait(5)                                    # consume the wake-up of the connect itself
+    yield s
+    s.stop()
+
+
+def push_and_wait(feed, stream, topic, data):
+    assert feed.push(topic, data) == 1
+    assert stream.wait(5)
+
+
+def test_subscribes_to_kline_and_mark_price(feed, stream):
+    assert stream.generation == 1
+    assert feed.subscriptions == 2
+    assert feed.push(stream.kline_topic, kline_push(candle(0))) == 1
+    assert feed.push(stream.mark_topic, {"p": "0.25"}) == 1
+
+
+def test_resubscribes_after_a_dropped_connection(feed, stream):
+    feed.drop_clients()
+    assert wait_until(lambda: stream.generation == 2 and stream.live)
+    assert stream.reconnects == 1
+    assert wait_until(lambda: feed.subscriptions == 4)
+    assert feed.push(stream.mark_topic, {"p": "0.31"}) == 1
+    assert wait_until(lambda: stream.price == pytest.approx(0.31))
+
+
+def test_answers_exchange_ping_and_stays_connected(feed, stream):
+    feed.ping()
+    push_and_wait(feed, stream, stream.mark_topic, {"p": "0.27"})
+    assert stream.generation == 1 and stream.reconnects == 0
+
+
+class RecordingStop(threading.Event):
+    """_stop stand-in that records reconnect delays instead of sleeping through them."""
+
+    def __init__(self, attempts):
+        super().__init__()
+        self.attempts = attempts
+        self.delays = []
+
+    def wait(self, timeout=None):
+        self.delays.append(timeout)
+        if len(self.delays) >= self.attempts:
+            self.set()
+        return self.is_set()
+
+
+def closed_port_url():
+    probe = socket.create_server(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return f"ws://127.0.0.1:{port}/swap-market"
+
+
+def test_reconnect_backoff_doubles_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(market_stream.random, "uniform", lambda a, b: b)
+    s = MarketStream(closed_port_url(), SYMBOL, INTERVAL, max_backoff=8.0)
+    s._stop = RecordingStop(attempts=6)
+    s._run()
+    assert s._stop.delays == [1.0, 2.0, 4.0, 8.0, 8.0, 8.0]
+    assert s.reconnects == 6 and s.generation == 0 and not s.live
+
+
+def test_backoff_resets_after_a_successful_connect(feed, monkeypatch):
+    monkeypatch.setattr(market_stream.random, "uniform", lambda a, b: b)
+    s = MarketStream(feed.url, SYMBOL, INTERVAL)
+    s._stop = RecordingStop(attempts=2)
+    runner = threading.Thread(target=s._run, daemon=True)
+    runner.start()
+    for generation in (1, 2):
+        assert wait_until(lambda: s.generation == generation and s.live)
+        feed.drop_clients()
+    runner.join(5)
+    assert s._stop.delays == [1.0, 1.0]
+
+
+def test_kline_and_price_pushes_reach_the_store(feed, stream, monkeypatch):
+    rest = FakeRest(candle(i) for i in range(60))
+    store = KlineStore(SYMBOL, INTERVAL, capacity=500)
+    monkeypatch.setattr(main, "kline_store", store)
+    monkeypatch.setattr(main, "market_stream", stream)
+    monkeypatch.setattr(main, "stream_synced_generation", 0)
+    monkeypatch.setattr(main, "fetch_klines", rest)
+
+    view = main.get_candles()
+    assert len(rest.calls) == 1 and len(view["close"]) == 60
+
+    # the forming candle updates in place, the next one is appended; no REST call
+    push_and_wait(feed, stream, stream.kline_topic, kline_push(candle(59, close=0.31)))
+    push_and_wait(feed, stream, stream.kline_topic, kline_push(candle(60)))
+    assert stream.pop_candle_closed()
+    assert not stream.pop_candle_closed()
+    view = main.get_candles()
+    assert len(rest.calls) == 1
+    assert store.size == 61 and store.last_timestamp == candle(60)[0]
+    assert view["close"][-2] == pytest.approx(0.31)
+    assert stream.price == pytest.approx(0.31)         # kline close stands in until a mark price arrives
+
+    push_and_wait(feed, stream, stream.mark_topic, {"p": "0.4242"})
+    assert stream.price == pytest.approx(0.4242)
+
+
+def test_gap_in_pushed_klines_triggers_rest_resync(feed, stream, monkeypatch):
+    rest = FakeRest(candle(i) for i in range(60))
+    store = KlineStore(SYMBOL, INTERVAL, capacity=500)
+    monkeypatch.setattr(main, "kline_store", store)
+    monkeypatch.setattr(main, "market_stream", stream)
+    monkeypatch.setattr(main, "stream_synced_generation", 0)
+    monkeypatch.setattr(main, "fetch_klines", rest)
+    main.get_candles()
+
+    # candle 60 never arrives over the stream; 61 skips it
+    rest.rows += [candle(60), candle(61)]
+    push_and_wait(feed, stream, stream.kline_topic, kline_push(candle(61)))
+    main.get_candles()
+    assert len(rest.calls) > 1 and rest.calls[1][1] == candle(59)[0]
+    assert store.size == 62 and not store.gaps
+    assert list(store.view()["timestamp"][-3:]) == [candle(i)[0] for i in (59, 60, 61)]
+
+
+def test_reconnect_triggers_rest_resync(feed, stream, monkeypatch):
+    rest = FakeRest(candle(i) for i in range(60))
+    store = KlineStore(SYMBOL, INTERVAL, capacity=500)
+    monkeypatch.setattr(main, "kline_store", store)
+    monkeypatch.setattr(main, "market_stream", stream)
+    monkeypatch.setattr(main, "stream_synced_generation", 0)
+    monkeypatch.setattr(main, "fetch_klines", rest)
+    main.get_candles()
+    assert main.stream_synced_generation == 1
+
+    # pushes may have been missed while disconnected, even without a visible gap
+    rest.rows.append(candle(60))
+    feed.drop_clients()
+    assert wait_until(lambda: stream.generation == 2 and stream.live)
+    calls = len(rest.calls)
+    main.get_candles()
+    assert len(rest.calls) > calls
+    assert main.stream_synced_generation == 2
+    assert store.last_timestamp == candle(60)[0]
@@ -0,0 +1,78 @@
+import pytest
+
+import main
+
+
+def test_entry_is_filled_and_protected_on_the_exchange(bot, sim):
+    assert main.place_order("BUY", 10_000.0)
+    assert main.position_open and main.position_lifecycle.state == "PROTECTED"
+    assert sim.position.qty == pytest.approx(main.current_quantity)
+    legs = bot.resting()
+    assert set(legs) == {"TAKE_PROFIT_MARKET", "STOP_MARKET"}
+    assert legs["TAKE_PROFIT_MARKET"]["stopPrice"] == pytest.approx(main.tp_price)
+    assert legs["STOP_MARKET"]["stopPrice"] == pytest.approx(main.sl_price)
+
+
+def test_close_flattens_the_exchange_position_and_journals_it(bot, sim):
+    main.place_order("SELL", 10_000.0)
+    assert main.close_position("SL", main.current_price)
+    assert sim.position.qty == 0 and not main.position_open
+    assert main.position_lifecycle.state == "CLOSED"
+    main.journal.flush(timeout=5)
+    saved = main.journal.recover(main.SYMBOL)
+    assert saved["total_trades"] == 1 and saved["last_direction"] == "SELL"
+
+
+def test_fill_found_after_the_deadline_is_sized_from_the_position(bot, sim):
+    # the entry order's status never arrives, but the exchange holds a smaller position than requested
+    assert main.executor.market("BUY", 60.0)["code"] == 0
+    lifecycle = main.PositionLifecycle("BUY", 100.0, order_id="lost", deadline=sim.virtual_clock.time() - 1,
+                                       clock=sim.virtual_clock.time)
+    main.position_lifecycle = lifecycle
+    main.advance_orders()
+    assert lifecycle.state == "PROTECTED" and main.current_quantity == 60.0
+    assert {o["origQty"] for o in bot.resting().values()} == {60.0}
+    main.journal.flush(timeout=5)
+    entry = main.journal._reader().execute("SELECT quantity FROM journal WHERE kind = 'entry'").fetchone()
+    assert entry == (60.0,)
+
+
+REJECTED = {"code": 109400, "msg": "rejected", "data": {}}
+
+
+def test_unconfirmed_close_is_retried_until_it_goes_through(bot, sim, monkeypatch):
+    bot.reject = "STOP_MARKET"
+    close = main.executor.close
+    monkeypatch.setattr(main.executor, "close", lambda side, quantity: REJECTED)
+    assert not main.place_order("BUY", 10_000.0)
+    lifecycle = main.position_lifecycle
+    # still open and unprotected on the exchange: tracked as closing, not flat
+    assert main.position_open and lifecycle.state == "CLOSING" and sim.position.qty > 0
+    main.advance_orders()
+    sim.virtual_clock.advance(main.CLOSE_RETRY_INTERVAL)
+    main.advance_orders()
+    assert main.position_open and lifecycle.state == "CLOSING" and not lifecycle.expired()
+    monkeypatch.setattr(main.executor, "close", close)
+    main.advance_orders()
+    assert main.position_open
+    sim.virtual_clock.advance(main.CLOSE_RETRY_INTERVAL)
+    main.advance_orders()
+    assert sim.position.qty == 0 and not main.position_open and lifecycle.state == "CLOSED"
+    assert main.total_trades == 1 and main.trade_log[0]["result"] == "NO_SL"
+    main.journal.flush(timeout=5)
+    assert main.journal.recover(main.SYMBOL)["total_trades"] == 1
+
+
+def test_position_gone_before_the_retry_is_journaled_as_aborted(bot, sim, monkeypatch):
+    bot.reject = "STOP_MARKET"
+    monkeypatch.setattr(main.executor, "close", lambda side, quantity: REJECTED)
+    main.place_order("BUY", 10_000.0)
+    # the first close went through after all (or the position was liquidated)
+    assert main.executor.market("SELL", sim.position.qty)["code"] == 0
+    sim.virtual_clock.advance(main.CLOSE_RETRY_INTERVAL)
+    main.advance_orders()
+    assert not main.position_open and main.position_lifecycle.state == "CLOSED"
+    assert main.total_trades == 0 and sim.position.qty == 0
+    main.journal.flush(timeout=5)
+    rows = main.journal._reader().execute("SELECT kind, result, profit FROM journal ORDER BY id").fetchall()
+    assert rows == [("entry", None, None), ("abort", "ABORTED", None)]
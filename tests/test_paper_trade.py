@@ -0,0 +1,23 @@
+import pytest
+
+import main
+import paper_trade
+from backtest import synthetic_candles
+from indicator_engine import IndicatorEngine
+from kline_store import KlineStore
+from timeframes import MultiTimeframe
+
+
+def test_paper_replay_books_every_exchange_close(bot, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "kline_store", KlineStore(main.SYMBOL, main.INTERVAL, capacity=main.KLINE_CAPACITY))
+    monkeypatch.setattr(main, "indicators", IndicatorEngine(atr_period=main.ATR_PERIOD))
+    monkeypatch.setattr(main, "timeframes", MultiTimeframe(main.SYMBOL, main.INTERVAL, main.HIGHER_TIMEFRAMES))
+    candles = synthetic_candles(300 + 96 * 4, main.INTERVAL, seed=0)
+    summary = paper_trade.run_paper(candles, journal_path=str(tmp_path / "paper.db"))
+
+    assert summary["virtual_days"] == pytest.approx(4, abs=0.1)
+    assert summary["trades"] > 0
+    saved = main.journal.recover(main.SYMBOL)
+    assert saved["total_trades"] == summary["trades"]
+    assert saved["compound_profit"] == pytest.approx(summary["bot_profit"])
+    assert main.position_open == bool(summary["open_position"]["qty"])
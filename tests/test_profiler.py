@@ -0,0 +1,70 @@
+import os
+import sys
+
+import pytest
+
+import main
+from profiler import ProfileCapture
+
+
+def busy():
+    return sum(i * i for i in range(20_000))
+
+
+def test_capture_writes_after_the_armed_passes(tmp_path):
+    capture = ProfileCapture(str(tmp_path))
+    capture.arm(2)
+    for _ in range(2):
+        capture.begin(); busy(); capture.end()
+    assert not capture.armed
+    assert capture.last_path.endswith(".prof") and os.path.exists(capture.last_path)
+    assert sys.getprofile() is None
+
+
+def test_arming_mid_pass_waits_for_the_next_pass(tmp_path):
+    capture = ProfileCapture(str(tmp_path))
+    capture.begin()
+    capture.arm(1)
+    capture.end()
+    assert capture.remaining == 1 and capture.last_path is None
+    capture.begin(); busy(); capture.end()
+    assert capture.remaining == 0 and capture.last_path is not None
+
+
+def test_mode_change_mid_capture_writes_both_collectors(tmp_path):
+    capture = ProfileCapture(str(tmp_path))
+    capture.arm(2, "cprofile")
+    capture.begin()
+    capture.arm(2, "sample")
+    busy()
+    capture.end()
+    assert capture.remaining == 1
+    capture.begin(); busy(); capture.end()
+    capture.end()                               # a stray second end() is ignored
+    assert capture.remaining == 0
+    names = sorted(os.listdir(tmp_path))
+    assert any(n.endswith(".prof") for n in names) and any(n.endswith(".folded") for n in names)
+    assert capture._profiler is None and capture._sampler is None
+    assert sys.getprofile() is None
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "profile_capture", ProfileCapture(str(tmp_path)))
+    return main.app.test_client()
+
+
+def test_profile_get_never_arms_a_capture(client):
+    response = client.get("/debug/profile?iterations=3")
+    assert response.status_code == 200 and not response.get_json()["armed"]
+    assert not main.profile_capture.armed
+
+
+def test_profile_arming_needs_a_configured_token(client, monkeypatch):
+    monkeypatch.setattr(main, "PROFILE_TOKEN", None)
+    assert client.post("/debug/profile?iterations=3").status_code == 403
+    monkeypatch.setattr(main, "PROFILE_TOKEN", "secret")
+    assert client.post("/debug/profile?iterations=3&token=wrong").status_code == 403
+    assert not main.profile_capture.armed
+    assert client.post("/debug/profile?iterations=3&token=secret").status_code == 200
+    assert main.profile_capture.remaining == 3
@@ -0,0 +1,147 @@
+import threading
+import time
+
+import pytest
+
+from clock import VirtualClock
+from exchange_client import ACCOUNT, CLOSE, MARKET, ExchangeClient, RequestScheduler
+
+TRADE = "/openApi/swap/v2/trade/order"
+KLINES = "/openApi/swap/v2/quote/klines"
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return condition()
+
+
+class Requests:
+    """Runs acquire() calls on threads and records the order they are granted in."""
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.granted = []
+        self.threads = []
+
+    def start(self, name, endpoint, priority):
+        def run():
+            self.scheduler.acquire(endpoint, priority)
+            self.granted.append(name)
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def waiting(self, n):
+        return wait_until(lambda: self.scheduler.stats()["waiting"] == n)
+
+    def join(self):
+        for thread in self.threads:
+            thread.join(5)
+        return not any(t.is_alive() for t in self.threads)
+
+
+@pytest.fixture
+def clock():
+    return VirtualClock(1000.0)
+
+
+def test_close_goes_out_ahead_of_queued_market_requests(clock):
+    scheduler = RequestScheduler(rate=20, burst=4, reserve=(0, 0, 0, 0),
+                                 class_limits={"": (1000, 1000)}, clock=clock.time)
+    for _ in range(4):
+        scheduler.acquire(KLINES, MARKET)             # the budget is used up by a market-data burst
+    calls = Requests(scheduler)
+    for _ in range(3):
+        calls.start("market", KLINES, MARKET)
+    assert calls.waiting(3)
+    calls.start("close", TRADE, CLOSE)
+    assert calls.waiting(4)
+
+    clock.advance(0.06)                               # one token: the close arrived last but gets it
+    assert wait_until(lambda: calls.granted == ["close"])
+    time.sleep(0.1)
+    assert calls.granted == ["close"] and scheduler.stats()["waiting"] == 3
+
+    clock.advance(1.0)
+    assert calls.join()
+    assert calls.granted == ["close", "market", "market", "market"]
+
+
+def test_market_data_leaves_the_reserve_for_a_close(clock):
+    scheduler = RequestScheduler(rate=20, burst=4, class_limits={"": (1000, 1000)}, clock=clock.time)
+    scheduler.acquire(KLINES, MARKET)                 # needs 1 + 3 reserved tokens; leaves 3
+    calls = Requests(scheduler)
+    calls.start("market", KLINES, MARKET)
+    assert calls.waiting(1)
+    scheduler.acquire(KLINES, ACCOUNT)
+    scheduler.acquire(TRADE, CLOSE)
+    scheduler.acquire(TRADE, CLOSE)                   # the last global token
+    assert calls.granted == [] and scheduler.stats()["waiting"] == 1
+    clock.advance(1.0)
+    assert calls.join() and calls.granted == ["market"]
+
+
+def test_rate_limit_feedback_halves_and_pauses_the_class(clock):
+    scheduler = RequestScheduler(class_limits={"": (5, 5), "/openApi/swap/v2/trade/": (4, 4)},
+                                 clock=clock.time)
+    trade = scheduler.classes["/openApi/swap/v2/trade/"]
+    scheduler.feedback(TRADE, 429, {"Retry-After": "0.2"})
+    assert trade.rate == 2.0 and trade.tokens == 0 and scheduler.throttled == 1
+    assert scheduler.classes[""].rate == 5.0
+
+    calls = Requests(scheduler)
+    calls.start("close", TRADE, CLOSE)
+    assert calls.waiting(1)
+    clock.advance(0.2)                                # paused: nothing accrued during Retry-After
+    time.sleep(0.1)
+    assert calls.granted == []
+    clock.advance(0.5)                                # one token at the halved rate
+    assert calls.join() and calls.granted == ["close"]
+
+    scheduler.feedback(TRADE, 200, code=100410)
+    scheduler.feedback(TRADE, 200, code=100410)
+    assert trade.rate == scheduler.min_rate == 0.5
+
+
+def test_successful_calls_restore_the_rate_step_by_step(clock):
+    scheduler = RequestScheduler(class_limits={"": (5, 5), "/openApi/swap/v2/trade/": (4, 4)},
+                                 clock=clock.time)
+    trade = scheduler.classes["/openApi/swap/v2/trade/"]
+    scheduler.feedback(TRADE, 429)
+    scheduler.feedback(TRADE, 200, code=0)
+    assert trade.rate == pytest.approx(2.2)
+    for _ in range(20):
+        scheduler.feedback(TRADE, 200, code=0)
+    assert trade.rate == 4.0
+
+
+def test_remaining_header_caps_the_class_tokens(clock):
+    scheduler = RequestScheduler(class_limits={"": (5, 5)}, clock=clock.time)
+    scheduler.feedback("/x", 200, {"X-RateLimit-Remaining": "1"})
+    assert scheduler.classes[""].tokens == 1
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+        self.text = str(body)
+
+    def json(self):
+        return self.body
+
+
+@pytest.mark.parametrize("response", [FakeResponse(429, headers={"Retry-After": "1"}),
+                                      FakeResponse(200, {"code": 100410, "msg": "frequency limit"})])
+def test_client_reports_rate_limits_to_the_scheduler(clock, monkeypatch, response):
+    scheduler = RequestScheduler(class_limits={"": (5, 5), "/openApi/swap/v2/trade/": (4, 4)},
+                                 clock=clock.time)
+    client = ExchangeClient("https://exchange.test", "key", "secret", max_retries=0, rate_limiter=scheduler)
+    monkeypatch.setattr(client.session, "request", lambda *a, **k: response)
+    client.request("POST", TRADE, params={"symbol": "DOGE-USDT"})
+    assert scheduler.classes["/openApi/swap/v2/trade/"].rate == 2.0 and scheduler.throttled == 1
@@ -0,0 +1,157 @@
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pytest
+
+from strategy_upgrade import SIDE_CODES, SIDES, Guard, Params, StrategyUpgrade
+
+
+def legacy_decide(p: Params, s: Dict[str, Any]) -> Dict[str, Any]:
+    """The original per-tick StrategyUpgrade.decide, kept as the reference."""
+    r: List[str] = []
+    price=s["price"]; atr=s["atr"]; ema200=s["ema200"]; rsi=s["rsi"]; adx=s["adx"]
+    st = 1 if int(s.get("supertrend", 1))>0 else -1
+    sma3, sma5, sma7 = s["sma3"], s["sma5"], s["sma7"]
+    prange = s["range"]; last_dir=s.get("last_direction")
+    mins = int(s.get("mins_since_last_trade", 9_999)); spike=bool(s.get("spike", False))
+
+    ok=True
+    if prange < p.range_min_pct: ok=False; r.append(f"Range<{p.range_min_pct}%")
+    if adx < p.adx_min:          ok=False; r.append(f"ADX<{p.adx_min}")
+    if spike:                    ok=False; r.append("Spike bar")
+
+    bull = (price>ema200 and st>0 and sma3>sma5> sma7 and rsi>=p.rsi_buy)
+    bear = (price<ema200 and st<0 and sma3<sma5<sma7 and rsi<=p.rsi_sell)
+
+    if last_dir and mins < p.block_same_dir_minutes:
+        if (last_dir=="BUY" and bull) or (last_dir=="SELL" and bear):
+            ok=False; r.append(f"SameDir<{p.block_same_dir_minutes}m")
+
+    side = "BUY" if (ok and bull) else ("SELL" if (ok and bear) else None)
+    tp_mult = 1.8 if adx>=p.adx_strong else 1.3
+    est_tp_pct = (tp_mult*atr/price*100) if (atr>0 and price>0) else 0.0
+    return {"enter": bool(side) and ok, "side": side, "reasons": r if not side else [],
+            "est_tp_percent": est_tp_pct, "min_tp_percent": p.min_tp_percent, "tp_mult": tp_mult}
+
+
+def legacy_pre_trade(g: Guard, s: Dict[str, Any], side: Optional[str]):
+    """The original per-tick StrategyUpgrade.pre_trade, kept as the reference."""
+    ok=True; r=[]
+    price=s["price"]; prev=s.get("prev", price); atr=s["atr"]; pct3=float(s.get("pct3", 0.0))
+    if atr>0 and abs(price-prev)>g.spike_1bar_atr*atr: ok=False; r.append(f"1bar spike>{g.spike_1bar_atr}*ATR")
+    if abs(pct3)>g.move_3bars_pct: ok=False; r.append(f"3bars>{g.move_3bars_pct}%")
+    adx=s.get("adx",0.0); ema200=s.get("ema200",0.0); st=1 if int(s.get("supertrend",1))>0 else -1
+    if side=="BUY" and adx>=28.0 and not(price>ema200 and st>0): ok=False; r.append("Counter-trend (strong ADX)")
+    if side=="SELL" and adx>=28.0 and not(price<ema200 and st<0): ok=False; r.append("Counter-trend (strong ADX)")
+    return ok, r
+
+
+def pick(rng, values, n):
+    return [values[i] for i in rng.integers(0, len(values), n)]
+
+
+def with_nans(rng, values, share=0.08):
+    return np.where(rng.random(len(values)) < share, np.nan, values)
+
+
+def random_states(n: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """States clustered on the rule thresholds, with NaN indicators (no history yet) mixed in."""
+    rng = np.random.default_rng(seed)
+    price = 0.2 + rng.normal(0, 0.002, n)
+    cols = {
+        "price": with_nans(rng, price),
+        "ema200": with_nans(rng, np.where(rng.random(n) < 0.05, price, price + rng.normal(0, 0.002, n))),
+        "atr": with_nans(rng, np.array(pick(rng, [0.0, -0.001, 0.0008, 0.002, 0.004], n))),
+        "rsi": with_nans(rng, np.array(pick(rng, [45.0, 55.0, 44.9, 55.1, 30.0, 50.0, 70.0], n))),
+        "adx": with_nans(rng, np.array(pick(rng, [23.0, 28.0, 22.9, 27.9, 15.0, 35.0], n))),
+        "range": with_nans(rng, np.array(pick(rng, [1.0, 0.99, 0.5, 2.5], n))),
+        "pct3": with_nans(rng, rng.normal(0, 2.5, n)),
+        "prev": with_nans(rng, price + rng.normal(0, 0.004, n)),
+    }
+    base = price + rng.normal(0, 0.001, n)
+    order = rng.integers(0, 3, n)   # rising, falling or mixed SMAs
+    step = np.where(order == 0, 0.0005, np.where(order == 1, -0.0005, 0.0))
+    cols["sma3"] = with_nans(rng, base + step)
+    cols["sma5"] = with_nans(rng, base + np.where(order == 2, 2 * step + 0.0007, 0.0))
+    cols["sma7"] = with_nans(rng, base - step)
+    supertrend = pick(rng, [1, -1, 1.0, -1.0, 0, 0.5, -0.5, 2], n)
+    spike = pick(rng, [False, False, False, True], n)
+    last_direction = pick(rng, ["BUY", "SELL", None, ""], n)
+    mins = pick(rng, [0, 10, 44, 44.9, 45, 45.5, 46, 9_999], n)
+    states = []
+    for i in range(n):
+        s = {k: float(v[i]) for k, v in cols.items()}
+        s.update(supertrend=supertrend[i], spike=spike[i], last_direction=last_direction[i],
+                 mins_since_last_trade=mins[i])
+        states.append(s)
+    return states
+
+
+STATES = random_states(3000)
+
+
+def assert_same_decision(got, want):
+    assert got["enter"] == want["enter"] and got["side"] == want["side"]
+    assert got["reasons"] == want["reasons"]
+    assert got["tp_mult"] == want["tp_mult"] and got["min_tp_percent"] == want["min_tp_percent"]
+    assert got["est_tp_percent"] == pytest.approx(want["est_tp_percent"], rel=1e-12, abs=0)
+
+
+def test_states_reach_every_branch():
+    p = Params()
+    decisions = [legacy_decide(p, s) for s in STATES]
+    reasons = {r for d in decisions for r in d["reasons"]}
+    assert {d["side"] for d in decisions} == {"BUY", "SELL", None}
+    assert reasons == {"Range<1.0%", "ADX<23.0", "Spike bar", "SameDir<45m"}
+    assert any(math.isnan(s["adx"]) for s in STATES)
+    guard_reasons = {r for s in STATES for side in ("BUY", "SELL") for r in legacy_pre_trade(Guard(), s, side)[1]}
+    assert len(guard_reasons) == 3
+
+
+def test_decide_matches_the_legacy_rules():
+    strategy = StrategyUpgrade()
+    for s in STATES:
+        assert_same_decision(strategy.decide(s), legacy_decide(strategy.p, s))
+
+
+@pytest.mark.parametrize("as_codes", [False, True])
+def test_decide_many_matches_the_legacy_rules(as_codes):
+    strategy = StrategyUpgrade()
+    cols = {k: [s[k] for s in STATES] for k in STATES[0]}
+    if as_codes:
+        cols["last_direction"] = np.array([SIDE_CODES[d or None] for d in cols["last_direction"]], dtype=np.int8)
+    d = strategy.decide_many(cols)
+    for i, s in enumerate(STATES):
+        got = {"enter": bool(d["enter"][i]), "side": SIDES[int(d["side"][i])],
+               "reasons": strategy.reason_text(d["reasons"][i]), "tp_mult": float(d["tp_mult"][i]),
+               "est_tp_percent": float(d["est_tp_percent"][i]), "min_tp_percent": strategy.p.min_tp_percent}
+        assert_same_decision(got, legacy_decide(strategy.p, s))
+
+
+@pytest.mark.parametrize("mins, blocked", [(44, True), (44.9, True), (45, False), (45.5, False)])
+def test_same_direction_block_ends_at_45_minutes(mins, blocked):
+    strategy = StrategyUpgrade()
+    s = {"price": 0.21, "ema200": 0.2, "atr": 0.002, "rsi": 60.0, "adx": 30.0, "range": 2.0,
+         "sma3": 0.209, "sma5": 0.208, "sma7": 0.207, "supertrend": 1,
+         "last_direction": "BUY", "mins_since_last_trade": mins}
+    want = legacy_decide(strategy.p, s)
+    assert want["enter"] is not blocked
+    assert_same_decision(strategy.decide(s), want)
+
+
+@pytest.mark.parametrize("side", ["BUY", "SELL", None])
+def test_pre_trade_matches_the_legacy_rules(side):
+    strategy = StrategyUpgrade()
+    for s in STATES:
+        assert strategy.pre_trade(s, side) == legacy_pre_trade(strategy.g, s, side)
+
+
+def test_pre_trade_many_takes_side_codes_or_strings():
+    strategy = StrategyUpgrade()
+    sides = [("BUY", "SELL", None)[i % 3] for i in range(len(STATES))]
+    cols = {k: [s[k] for s in STATES] for k in ("price", "atr", "prev", "pct3", "adx", "ema200", "supertrend")}
+    for given in (sides, np.array([SIDE_CODES[x] for x in sides])):
+        ok, bits = strategy.pre_trade_many(cols, given)
+        for i, s in enumerate(STATES):
+            assert (bool(ok[i]), strategy.reason_text(bits[i], pre=True)) == legacy_pre_trade(strategy.g, s, sides[i])
@@ -0,0 +1,33 @@
+import main
+from conftest import RecordingClient
+from symbol_engine import SymbolEngine
+
+
+def test_engine_rejected_leg_cancels_the_accepted_one(sim):
+    client = RecordingClient(sim, reject="STOP_MARKET")
+    engine = SymbolEngine(main.SYMBOL, client, clock=sim.virtual_clock)
+    engine.price = sim.price_at(sim.now_ms())
+    engine.atr = engine.price * 0.01
+    assert not engine.place_order("BUY", 1000.0)
+    tp = next(o for o in sim.orders.values() if o["type"] == "TAKE_PROFIT_MARKET")
+    assert tp["status"] == "CANCELED" and [d[2] for d in client.orders("DELETE")] == [tp["orderId"]]
+    assert sim.position.qty == 0 and not engine.position_open
+    assert engine.trade_log[0]["result"] == "NO_SL"
+
+
+def test_engine_retries_a_close_that_was_not_confirmed(sim, monkeypatch):
+    client = RecordingClient(sim, reject="STOP_MARKET")
+    engine = SymbolEngine(main.SYMBOL, client, clock=sim.virtual_clock)
+    engine.price = sim.price_at(sim.now_ms())
+    engine.atr = engine.price * 0.01
+    close = engine.orders.close
+    monkeypatch.setattr(engine.orders, "close", lambda side, quantity: {"code": 109400, "msg": "rejected"})
+    assert not engine.place_order("BUY", 1000.0)
+    assert engine.position_open and engine.lifecycle.state == "CLOSING" and sim.position.qty > 0
+    monkeypatch.setattr(engine.orders, "close", close)
+    engine.advance_orders()
+    assert engine.position_open
+    sim.virtual_clock.advance(engine.close_retry)
+    engine.advance_orders()
+    assert sim.position.qty == 0 and not engine.position_open and engine.lifecycle.state == "CLOSED"
+    assert engine.trade_log[0]["result"] == "NO_SL"
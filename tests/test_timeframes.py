@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicator_arrays as ia
+from backtest import synthetic_candles
+from kline_store import interval_to_ms
+from timeframes import MultiTimeframe, Resampler, trend_series
+
+DAY = 86_400_000
+MIDNIGHT = 1_699_920_000_000                       # 2023-11-14 00:00 UTC
+STEP = interval_to_ms("15m")
+
+
+def candles(days, offset_ms=0, seed=4):
+    return synthetic_candles(96 * days, "15m", seed=seed, start_ms=MIDNIGHT + offset_ms)
+
+
+def pandas_bars(c, interval):
+    """OHLCV of `interval` buckets via pandas resample, without a bucket the data only partly covers."""
+    df = pd.DataFrame({k: c[k] for k in ("open", "high", "low", "close", "volume")},
+                      index=pd.to_datetime(c["timestamp"], unit="ms", utc=True))
+    bars = df.resample(pd.Timedelta(milliseconds=interval_to_ms(interval))).agg(
+        {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"})
+    bars.insert(0, "timestamp", (bars.index - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(milliseconds=1))
+    if c["timestamp"][0] % interval_to_ms(interval):
+        bars = bars.iloc[1:]
+    return bars.reset_index(drop=True)
+
+
+def reference_trend(c, interval):
+    """Supertrend direction of the resampled bars, the last one cut off at each base candle's close."""
+    ms = interval_to_ms(interval)
+    ts = c["timestamp"]
+    closed = pandas_bars(c, interval)
+    out = np.zeros(len(ts), dtype=np.int8)
+    for i in range(len(ts)):
+        bucket = ts[i] - ts[i] % ms
+        done = closed[closed["timestamp"] < bucket]
+        if done.empty and ts[0] > bucket:
+            continue                                    # the partly covered first bucket
+        part = slice(np.searchsorted(ts, bucket), i + 1)
+        high = np.append(done["high"].to_numpy(), c["high"][part].max())
+        low = np.append(done["low"].to_numpy(), c["low"][part].min())
+        close = np.append(done["close"].to_numpy(), c["close"][i])
+        if len(close) >= 20:
+            _, direction = ia.supertrend(high, low, close, 10, 3)
+            out[i] = 1 if direction[-1] > 0 else -1
+    return out
+
+
+@pytest.mark.parametrize("interval, days, offset", [("1h", 4, 0), ("1h", 4, 30 * 60_000),
+                                                    ("4h", 6, 5 * 3_600_000), ("1d", 24, 13 * 3_600_000)])
+def test_trend_series_matches_pandas_resample(interval, days, offset):
+    c = candles(days, offset)
+    got = trend_series(c, "15m", interval)
+    want = reference_trend(c, interval)
+    assert (want != 0).sum() > 0
+    np.testing.assert_array_equal(got, want)
+
+
+@pytest.mark.parametrize("interval", ["1h", "4h", "1d"])
+def test_closed_bars_match_pandas_resample(interval):
+    c = candles(6, offset_ms=7 * 3_600_000 + 30 * 60_000)   # starts mid-bucket for every interval
+    r = Resampler("DOGE-USDT", "15m", interval)
+    r.update(c["timestamp"], c["open"], c["high"], c["low"], c["close"], c["volume"])
+    want = pandas_bars(c, interval)
+    got = r.store.view()
+    assert got["timestamp"][0] % interval_to_ms(interval) == 0 and got["timestamp"][0] > c["timestamp"][0]
+    for key in ("timestamp", "open", "high", "low", "close", "volume"):
+        np.testing.assert_allclose(got[key], want[key].to_numpy(), rtol=1e-12, err_msg=key)
+
+
+def test_partial_first_bucket_is_skipped():
+    c = candles(1, offset_ms=30 * 60_000)                   # 00:30 UTC: the first hour is half missing
+    r = Resampler("DOGE-USDT", "15m", "1h")
+    n = 6                                                   # 00:30 .. 01:45, 01:45 still forming
+    r.update(*(c[k][:n] for k in ("timestamp", "open", "high", "low", "close", "volume")))
+    assert r.store.size == 1 and r.store.last_timestamp == MIDNIGHT + 3_600_000
+    assert r.indicators.count == 0 and r._bar[0] == MIDNIGHT + 3_600_000
+
+
+def test_day_bar_closes_at_the_utc_boundary():
+    c = candles(3, offset_ms=0)
+    cols = ("timestamp", "open", "high", "low", "close", "volume")
+    r = Resampler("DOGE-USDT", "15m", "1d")
+    end = 96 + 1                                            # day 1 00:00 is forming: day 0 just closed
+    r.update(*(c[k][:end] for k in cols))
+    assert r.indicators.count == 1 and r.indicators.last_timestamp == MIDNIGHT
+    assert r._bar is None and r.last_base_ts == MIDNIGHT + DAY - STEP
+    day0 = pandas_bars({k: c[k][:96] for k in cols}, "1d").iloc[0]
+    assert r.store.view()["close"][0] == day0["close"] and r.store.view()["volume"][0] == pytest.approx(day0["volume"])
+    assert r.snapshot["timestamp"] == MIDNIGHT + DAY      # the forming bar of the next day
+
+    r.update(*(c[k][:end + 1] for k in cols))              # 00:00 closes, 00:15 forming: no new day bar
+    assert r.indicators.count == 1 and r._bar[0] == MIDNIGHT + DAY
+
+
+def test_multitimeframe_feeds_every_resampler_from_one_window():
+    c = candles(2)
+    mtf = MultiTimeframe("DOGE-USDT")
+    mtf.update(c)
+    assert {iv: r.indicators.count for iv, r in mtf.resamplers.items()} == {"1h": 47, "4h": 11, "1d": 1}
@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import main
+from trade_journal import TradeJournal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+T0 = 1_700_000_000.0
+
+# entry/close pairs as the bot journals them: (side, entry, exit, result, profit)
+TRADES = [("BUY", 0.20, 0.21, "TP", 0.5), ("SELL", 0.21, 0.215, "SL", -0.25), ("BUY", 0.19, 0.2, "TP", 0.4)]
+
+
+def write_then_crash(path, open_entry):
+    """Journal TRADES (and maybe one more entry) in a child process that dies without flush or close."""
+    script = textwrap.dedent(f"""
+        import os, time
+        from trade_journal import TradeJournal
+        journal = TradeJournal({path!r}, flush_interval=0.01)
+        rows = 0
+        for i, (side, entry, exit_, result, profit) in enumerate({TRADES!r}):
+            journal.record_entry("DOGE-USDT", side, entry, 100.0, ts={T0} + i * 3600)
+            journal.record_close("DOGE-USDT", {{"side": side, "entry_price": entry, "exit_price": exit_,
+                                               "result": result, "profit": profit, "time": "t"}},
+                                 100.0, ts={T0} + i * 3600 + 600)
+            rows += 2
+        if {open_entry!r}:
+            journal.record_entry("DOGE-USDT", "SELL", 0.2, 100.0, ts={T0} + 10 * 3600)
+            rows += 1
+        journal.record_close("XRP-USDT", {{"side": "SELL", "entry_price": 1.0, "exit_price": 0.9,
+                                          "result": "TP", "profit": 9.0, "time": "t"}}, 100.0, ts={T0})
+        rows += 1
+        deadline = time.monotonic() + 10
+        while journal.written < rows and time.monotonic() < deadline:
+            time.sleep(0.005)
+        os._exit(3 if journal.written == rows else 4)   # no flush(), no close, no WAL checkpoint
+    """)
+    done = subprocess.run([sys.executable, "-c", script], cwd=ROOT, timeout=60)
+    assert done.returncode == 3
+    assert os.path.getsize(path + "-wal") > 0     # the commits were never checkpointed into the db file
+
+
+@pytest.mark.parametrize("open_entry", [False, True])
+def test_recover_after_a_crash(tmp_path, open_entry):
+    path = str(tmp_path / "trades.db")
+    write_then_crash(path, open_entry)
+    saved = TradeJournal(path).recover("DOGE-USDT")
+    assert saved["total_trades"] == 3 and saved["successful_trades"] == 2 and saved["failed_trades"] == 1
+    assert saved["compound_profit"] == pytest.approx(0.65)
+    assert saved["last_direction"] == "BUY"
+    assert saved["last_trade_time"] == (T0 + 10 * 3600 if open_entry else T0 + 2 * 3600 + 600)
+    assert [t["result"] for t in saved["trade_log"]] == ["TP", "SL", "TP"]
+
+
+def test_main_restores_its_counters_from_the_journal(bot, tmp_path):
+    path = str(tmp_path / "crashed.db")
+    write_then_crash(path, open_entry=False)
+    main.journal = TradeJournal(path)
+    assert main.restore_trade_history()
+    assert (main.total_trades, main.successful_trades, main.failed_trades) == (3, 2, 1)
+    assert main.compound_profit == pytest.approx(0.65)
+    assert main.last_direction == "BUY" and main.last_trade_time == T0 + 2 * 3600 + 600
+    assert [t["profit"] for t in main.trade_log] == [0.4, -0.25, 0.5]
+
+
+def test_history_pages_back_by_row_id(tmp_path):
+    path = str(tmp_path / "trades.db")
+    write_then_crash(path, open_entry=True)
+    journal = TradeJournal(path)
+    first = journal.history("DOGE-USDT", limit=2)
+    assert [t["profit"] for t in first["trades"]] == [0.4, -0.25]
+    rest = journal.history("DOGE-USDT", limit=2, before=first["next_before"])
+    assert [t["profit"] for t in rest["trades"]] == [0.5] and rest["next_before"] is None
+    assert len(journal.history(limit=10)["trades"]) == 4
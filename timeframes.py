@@ -0,0 +1,172 @@
+# timeframes.py — 1h/4h/1d candles and indicators derived from the 15m buffer (no API calls)
+#
+# A Resampler folds each newly closed base candle into the current
+# higher-timeframe bar (open kept, high/low widened, close replaced, volume
+# added) and hands the bar to its own IndicatorEngine once the last base
+# candle of the bucket has closed.  The still-forming base candle is laid on
+# top of that partial bar for a preview, so the forming 1h/4h/1d bar is
+# updated in place on every poll and nothing is fetched from the exchange.
+#
+# Buckets are aligned to UTC epoch multiples of the interval, like the
+# exchange's own candles.  A bucket the buffer only partly covers at start-up
+# is skipped rather than reported with a wrong open.
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from indicator_engine import IndicatorEngine
+from kline_store import KlineStore, interval_to_ms
+
+DEFAULT_INTERVALS = ("1h", "4h", "1d")
+
+
+def _trend(snapshot: Dict[str, Any]) -> int:
+    """+1/-1 from the Supertrend direction, 0 while there is not enough history."""
+    direction = snapshot.get("supertrend_dir", float("nan"))
+    if direction != direction:
+        return 0
+    return 1 if direction > 0 else -1
+
+
+class Resampler:
+    """One higher timeframe built from closed base candles, plus its running indicators."""
+
+    def __init__(self, symbol: str, base_interval: str, interval: str, capacity: int = 500):
+        self.base_ms = interval_to_ms(base_interval)
+        self.interval_ms = interval_to_ms(interval)
+        if self.interval_ms <= self.base_ms or self.interval_ms % self.base_ms:
+            raise ValueError(f"{interval} is not a multiple of {base_interval}")
+        self.interval = interval
+        self.store = KlineStore(symbol, interval, capacity=capacity)
+        self.indicators = IndicatorEngine()
+        self.reset()
+
+    def reset(self):
+        self.store.clear()
+        self.indicators.reset()
+        self.last_base_ts: Optional[float] = None
+        self._bar: Optional[list] = None        # [ts, open, high, low, close, volume] of closed base candles
+        self._started = False
+        self.snapshot: Dict[str, Any] = {}
+
+    def _bucket(self, ts: float) -> float:
+        return ts - ts % self.interval_ms
+
+    def _commit(self, ts: float, o: float, h: float, l: float, c: float, v: float):
+        """Fold one closed base candle in; close the bar when its last base candle is in."""
+        bucket = self._bucket(ts)
+        bar = self._bar
+        if bar is not None and bar[0] != bucket:
+            self._close_bar()                   # the rest of the bucket is missing from the feed
+            bar = None
+        if bar is None:
+            if not self._started and ts - bucket >= self.base_ms:
+                self.last_base_ts = ts
+                return
+            self._started = True
+            self._bar = [bucket, o, h, l, c, v]
+        else:
+            bar[2] = max(bar[2], h); bar[3] = min(bar[3], l); bar[4] = c; bar[5] += v
+        self.last_base_ts = ts
+        if ts + self.base_ms >= bucket + self.interval_ms:
+            self._close_bar()
+
+    def _close_bar(self):
+        bar = self._bar
+        self.store.merge([tuple(bar)])
+        self.indicators.push(bar[2], bar[3], bar[4], bar[0])
+        self._bar = None
+
+    def _forming(self, ts: float, o: float, h: float, l: float, c: float, v: float) -> Optional[tuple]:
+        """The current higher-timeframe bar with the forming base candle laid on top."""
+        bar = self._bar
+        bucket = self._bucket(ts)
+        if bar is not None and bar[0] == bucket:
+            return bar[0], bar[1], max(bar[2], h), min(bar[3], l), c, bar[5] + v
+        if self._started or ts - bucket < self.base_ms:
+            return bucket, o, h, l, c, v
+        return None
+
+    def update(self, timestamps: Sequence[float], opens: Sequence[float], highs: Sequence[float],
+               lows: Sequence[float], closes: Sequence[float], volumes: Sequence[float]) -> Dict[str, Any]:
+        """Consume base candles up to the window's last (forming) one and return this timeframe's values.
+
+        All rows but the last are treated as closed.  Rows already folded in
+        are skipped by timestamp; if the window no longer overlaps what was
+        seen (first call, reload, or a gap wider than the window) everything
+        is rebuilt from the window.
+        """
+        n = len(closes)
+        if n == 0:
+            return self.snapshot
+        closed = n - 1
+        start = self._resume_index(timestamps, closed)
+        if start is None:
+            self.reset()
+            start = 0
+        for i in range(start, closed):
+            self._commit(float(timestamps[i]), float(opens[i]), float(highs[i]), float(lows[i]),
+                         float(closes[i]), float(volumes[i]))
+
+        forming = self._forming(float(timestamps[-1]), float(opens[-1]), float(highs[-1]), float(lows[-1]),
+                                float(closes[-1]), float(volumes[-1]))
+        if forming is None:
+            snapshot = dict(self.indicators.last)
+        else:
+            self.store.merge([forming])
+            snapshot = self.indicators.preview(forming[2], forming[3], forming[4])
+            snapshot["timestamp"] = forming[0]
+        snapshot["trend"] = _trend(snapshot)
+        self.snapshot = snapshot
+        return snapshot
+
+    def _resume_index(self, timestamps, closed: int) -> Optional[int]:
+        last = self.last_base_ts
+        if last is None:
+            return None
+        for i in range(closed - 1, -1, -1):
+            ts = timestamps[i]
+            if ts == last:
+                return i + 1
+            if ts < last:
+                return None
+        return 0 if closed == 0 else None
+
+
+class MultiTimeframe:
+    """Resamplers for several higher timeframes of one symbol, fed from the same base window."""
+
+    def __init__(self, symbol: str, base_interval: str = "15m", intervals: Sequence[str] = DEFAULT_INTERVALS,
+                 capacity: int = 500):
+        self.base_interval = base_interval
+        self.resamplers = {iv: Resampler(symbol, base_interval, iv, capacity) for iv in intervals}
+
+    def update(self, candles: Dict[str, np.ndarray]) -> Dict[str, Dict[str, Any]]:
+        """Advance every timeframe from kline store views; returns {interval: indicator values}."""
+        cols = (candles["timestamp"], candles["open"], candles["high"], candles["low"],
+                candles["close"], candles["volume"])
+        return {iv: r.update(*cols) for iv, r in self.resamplers.items()}
+
+    def trend(self, interval: str) -> int:
+        r = self.resamplers.get(interval)
+        return r.snapshot.get("trend", 0) if r is not None else 0
+
+    def reset(self):
+        for r in self.resamplers.values():
+            r.reset()
+
+
+def trend_series(candles: Dict[str, np.ndarray], base_interval: str, interval: str) -> np.ndarray:
+    """The higher-timeframe trend the live loop would see at each base candle's close (backtests)."""
+    r = Resampler("", base_interval, interval)
+    ts, o, h, l, c, v = (np.asarray(candles[k], dtype=float)
+                         for k in ("timestamp", "open", "high", "low", "close", "volume"))
+    out = np.zeros(len(c), dtype=np.int8)
+    for i in range(len(c)):
+        r._commit(ts[i], o[i], h[i], l[i], c[i], v[i])
+        if r._bar is not None:
+            bar = r._bar
+            out[i] = _trend(r.indicators.preview(bar[2], bar[3], bar[4]))
+        else:
+            out[i] = _trend(r.indicators.last)
+    return out
@@ -0,0 +1,167 @@
+# trade_journal.py — append-only SQLite (WAL) journal of fills and closed trades (no API calls)
+#
+# The trading thread only puts small tuples on a queue; one writer thread
+# drains it and commits whole batches in a single transaction, so a slow disk
+# never delays an order.  On start-up `recover(symbol)` rebuilds the P&L
+# counters, the last 20 trades and the cooldown inputs (last direction, last
+# trade time) with a handful of indexed queries, and `history()` serves older
+# trades page by page using the row id as cursor.
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol      TEXT    NOT NULL,
+    kind        TEXT    NOT NULL,          -- 'entry', 'close', or 'abort' (position gone, P&L unknown)
+    side        TEXT    NOT NULL,
+    entry_price REAL    NOT NULL,
+    exit_price  REAL,
+    quantity    REAL    NOT NULL,
+    result      TEXT,
+    profit      REAL,
+    ts          REAL    NOT NULL,          -- unix seconds
+    time        TEXT    NOT NULL           -- local time as shown on the dashboard
+);
+CREATE INDEX IF NOT EXISTS journal_symbol_kind ON journal (symbol, kind, id);
+"""
+
+INSERT = ("INSERT INTO journal (symbol, kind, side, entry_price, exit_price, quantity, result, profit, ts, time) "
+          "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+TRADE_COLUMNS = "id, symbol, side, entry_price, exit_price, quantity, result, profit, ts, time"
+TRADE_LOG_FIELDS = ("side", "entry_price", "exit_price", "result", "profit", "time")
+
+
+def _trade(row) -> Dict[str, Any]:
+    """A close row in the shape of main.py's trade_log entries (plus id/symbol/quantity/ts)."""
+    return {"id": row[0], "symbol": row[1], "side": row[2], "entry_price": row[3], "exit_price": row[4],
+            "quantity": row[5], "result": row[6], "profit": row[7], "ts": row[8], "time": row[9]}
+
+
+class TradeJournal:
+    """Durable trade history with batched writes from a background thread."""
+
+    def __init__(self, path: str = "trades.db", batch_size: int = 64, flush_interval: float = 0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._local = threading.local()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    # ---- connections ----
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")   # WAL + NORMAL survives a process crash
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            conn.executescript(SCHEMA)
+        return conn
+
+    # ---- writes (trading thread) ----
+    def record_entry(self, symbol: str, side: str, price: float, quantity: float, ts: Optional[float] = None):
+        ts = time.time() if ts is None else ts
+        self._put((symbol, "entry", side, float(price), None, float(quantity), None, None, ts,
+                   time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))))
+
+    def record_close(self, symbol: str, trade: Dict[str, Any], quantity: float, ts: Optional[float] = None):
+        """`trade` is a trade_log entry: side, entry_price, exit_price, result, profit, time."""
+        ts = time.time() if ts is None else ts
+        self._put((symbol, "close", trade["side"], float(trade["entry_price"]), float(trade["exit_price"]),
+                   float(quantity), trade["result"], float(trade["profit"]), ts, trade["time"]))
+
+    def record_abort(self, symbol: str, side: str, entry_price: float, quantity: float, result: str,
+                     ts: Optional[float] = None):
+        """An entry that ended without a close of ours; not counted as a trade."""
+        ts = time.time() if ts is None else ts
+        self._put((symbol, "abort", side, float(entry_price), None, float(quantity), result, None, ts,
+                   time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))))
+
+    def _put(self, row):
+        self._ensure_writer()
+        with self._idle:
+            self._pending += 1
+        self._queue.put(row)
+
+    def _ensure_writer(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trade-journal", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            while True:
+                try:
+                    with conn:
+                        conn.execute("BEGIN")
+                        conn.executemany(INSERT, batch)
+                    break
+                except sqlite3.Error as e:
+                    print(f"❌ Trade journal write failed ({e}), retrying")
+                    time.sleep(1.0)
+            self.written += len(batch)
+            with self._idle:
+                self._pending -= len(batch)
+                self._idle.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued record is committed; False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    # ---- reads (any thread) ----
+    def recover(self, symbol: str, recent: int = 20) -> Dict[str, Any]:
+        """Counters, recent trade_log entries (newest first) and cooldown inputs for `symbol`."""
+        conn = self._reader()
+        total, wins, profit = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(result = 'TP'), 0), COALESCE(SUM(profit), 0.0) "
+            "FROM journal WHERE symbol = ? AND kind = 'close'", (symbol,)).fetchone()
+        trades = [_trade(r) for r in conn.execute(
+            f"SELECT {TRADE_COLUMNS} FROM journal WHERE symbol = ? AND kind = 'close' "
+            "ORDER BY id DESC LIMIT ?", (symbol, recent))]
+        last_entry = conn.execute("SELECT ts FROM journal WHERE symbol = ? AND kind = 'entry' "
+                                  "ORDER BY id DESC LIMIT 1", (symbol,)).fetchone()
+        last_ts = max(last_entry[0] if last_entry else 0.0, trades[0]["ts"] if trades else 0.0)
+        return {"total_trades": total, "successful_trades": wins, "failed_trades": total - wins,
+                "compound_profit": profit, "trade_log": [{k: t[k] for k in TRADE_LOG_FIELDS} for t in trades],
+                "last_direction": trades[0]["side"] if trades else None,
+                "last_trade_time": last_ts}
+
+    def history(self, symbol: Optional[str] = None, limit: int = 50,
+                before: Optional[int] = None) -> Dict[str, Any]:
+        """One page of closed trades, newest first; pass `next_before` back for the next page."""
+        limit = max(1, min(int(limit), 500))
+        where, args = ["kind = 'close'"], []
+        if symbol:
+            where.append("symbol = ?"); args.append(symbol)
+        if before is not None:
+            where.append("id < ?"); args.append(int(before))
+        rows = self._reader().execute(
+            f"SELECT {TRADE_COLUMNS} FROM journal WHERE {' AND '.join(where)} ORDER BY id DESC LIMIT ?",
+            (*args, limit + 1)).fetchall()
+        trades = [_trade(r) for r in rows[:limit]]
+        return {"trades": trades, "next_before": trades[-1]["id"] if len(rows) > limit else None}
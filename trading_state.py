@@ -0,0 +1,81 @@
+# trading_state.py — immutable trading-state snapshots published copy-on-write (no API calls)
+#
+# The trading thread keeps working on its own variables and, once a group of
+# changes is complete (a fill, a close, a loop pass), publishes a new frozen
+# TradingState.  Publication is a single reference swap, so readers such as
+# the dashboard take `publisher.snapshot()` without a lock and always see one
+# consistent state — never an open position with an entry of 0.
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class TradingState:
+    """One consistent, read-only view of the bot; build new ones with `replace`."""
+    __slots__ = ("symbol", "position_open", "position_side", "entry_price", "tp_price", "sl_price",
+                 "quantity", "pnl", "current_price", "ema_200", "rsi", "adx", "atr",
+                 "total_trades", "successful_trades", "failed_trades", "compound_profit",
+                 "trade_log", "lifecycle_state", "update_time", "version", "published_at")
+
+    _DEFAULTS = {"symbol": "", "position_open": False, "position_side": None, "entry_price": 0.0,
+                 "tp_price": 0.0, "sl_price": 0.0, "quantity": 0.0, "pnl": 0.0, "current_price": 0.0,
+                 "ema_200": 0.0, "rsi": 0.0, "adx": 0.0, "atr": 0.0, "total_trades": 0,
+                 "successful_trades": 0, "failed_trades": 0, "compound_profit": 0.0, "trade_log": (),
+                 "lifecycle_state": None, "update_time": "", "version": 0, "published_at": 0.0}
+
+    def __init__(self, **fields):
+        unknown = set(fields) - set(self.__slots__)
+        if unknown:
+            raise TypeError(f"unknown TradingState fields: {sorted(unknown)}")
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields.get(name, self._DEFAULTS[name]))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TradingState is immutable; publish a replacement")
+
+    def replace(self, **changes) -> "TradingState":
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return TradingState(**fields)
+
+    def as_dict(self) -> Dict[str, Any]:
+        out = {name: getattr(self, name) for name in self.__slots__}
+        out["trade_log"] = [dict(t) for t in self.trade_log]
+        return out
+
+    def __repr__(self):
+        return f"TradingState(v{self.version} {self.symbol} open={self.position_open} side={self.position_side})"
+
+
+class StatePublisher:
+    """Double-buffered holder: writers swap in a new TradingState, readers never block."""
+
+    def __init__(self, initial: TradingState = None):
+        self._current = initial or TradingState()
+        self._write_lock = threading.Lock()     # orders writers only; readers never take it
+        self._changed = threading.Condition()   # for readers that want to sleep until the next publish
+
+    def snapshot(self) -> TradingState:
+        return self._current
+
+    def publish(self, **changes) -> TradingState:
+        """Copy the current state with `changes` applied and make it visible atomically."""
+        if "trade_log" in changes:
+            changes["trade_log"] = tuple(changes["trade_log"])
+        with self._write_lock:
+            current = self._current
+            state = current.replace(version=current.version + 1, published_at=time.time(), **changes)
+            self._current = state
+        with self._changed:
+            self._changed.notify_all()
+        return state
+
+    def wait_newer(self, version: int, timeout: Optional[float] = None) -> TradingState:
+        """Block until a state newer than `version` is published (or `timeout`); returns the latest."""
+        with self._changed:
+            self._changed.wait_for(lambda: self._current.version > version, timeout)
+        return self._current
+
+    @property
+    def version(self) -> int:
+        return self._current.version
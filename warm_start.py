@@ -0,0 +1,84 @@
+# warm_start.py — local snapshot of the kline buffer and running indicators (no API calls)
+#
+# After every newly closed candle the bot writes its KlineStore contents and
+# IndicatorEngine state to one small file (atomically, via rename).  On start
+# the snapshot is loaded back before the first market-data request, so
+# sync_klines only fetches the candles missed while the process was down, and
+# a restart within the same candle resumes the indicators without a replay.
+#
+# Snapshots are pickles written by this bot for itself; never point the path
+# at files from anywhere else.
+import os
+import pickle
+import time
+from typing import Optional
+
+import numpy as np
+
+from indicator_engine import IndicatorEngine
+from kline_store import COLUMNS, KlineStore
+
+FORMAT_VERSION = 1
+ENGINE_SETTINGS = ("atr_period", "rsi_period", "adx_period", "supertrend_period", "supertrend_multiplier",
+                   "ema_periods", "sma_periods", "range_lookback")
+
+
+def snapshot_path(directory: str, symbol: str, interval: str) -> str:
+    return os.path.join(directory, f"{symbol}-{interval}.pkl")
+
+
+def save_snapshot(path: str, store: KlineStore, engine: IndicatorEngine) -> bool:
+    """Write the store and indicator state for `store.symbol`; False (and a log line) on failure."""
+    view = store.view()
+    payload = {
+        "format": FORMAT_VERSION,
+        "symbol": store.symbol,
+        "interval": store.interval,
+        "saved_at": time.time(),
+        "candles": np.vstack([view[name] for name in COLUMNS]),
+        "engine": {name: getattr(engine, name) for name in ENGINE_SETTINGS},
+        "state": engine.__dict__,
+    }
+    tmp = f"{path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(tmp, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        return True
+    except OSError as e:
+        print(f"⚠️ Could not write warm-start snapshot {path}: {e}")
+        return False
+
+
+def load_snapshot(path: str, store: KlineStore, engine: IndicatorEngine,
+                  max_age: Optional[float] = None) -> bool:
+    """Fill an empty `store` and `engine` from `path` if it matches them and is recent enough.
+
+    `max_age` defaults to the time the store's capacity covers: past that the
+    REST sync would discard the candles anyway.
+    """
+    try:
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        print(f"⚠️ Ignoring unreadable warm-start snapshot {path}: {e}")
+        return False
+
+    if (payload.get("format") != FORMAT_VERSION or payload.get("symbol") != store.symbol
+            or payload.get("interval") != store.interval
+            or payload.get("engine") != {name: getattr(engine, name) for name in ENGINE_SETTINGS}):
+        return False
+    candles = payload["candles"]
+    if not candles.shape[1]:
+        return False
+    max_age = store.capacity * store.interval_ms / 1000 if max_age is None else max_age
+    if time.time() - candles[0, -1] / 1000 > max_age:
+        return False
+
+    store.clear()
+    store.merge(candles[:, -store.capacity:].T.tolist())
+    engine.__dict__.update(payload["state"])
+    return True